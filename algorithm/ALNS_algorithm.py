@@ -4,30 +4,103 @@ from alns.select import AlphaUCB
 from alns.stop import MaxIterations
 
 import numpy.random as rnd
+from dataclasses import dataclass, field
 
 from data_preprocessing.objective_functions import objectiveFunctionPriority, objectiveFunctionImageQuality
 from scheduling_model import OH, SP, GSTW, OT, BT, DT, TTW
-from algorithm.operators import repairOperator, destroyOperator, RepairType, DestroyType
+from algorithm.operators import repairOperator, destroyOperator, RepairType, DestroyType, SortKeyCache
 from transmission_scheduling.input_parameters import TransmissionParams
 
 
+@dataclass(frozen=True)
+class ProblemContext:
+    """
+    Data of the problem that is shared by all solutions and never changed by the destroy and repair operators,
+    apart from the cache of sort keys that is filled as the operators sort new TTWs and OTs.
+    Copies of a solution share the same context, also when they are deep copied.
+    """
+    gstwList: list[GSTW]
+    oh: OH
+    destructionNumber: int
+    schedulingParameters: SP
+    transmissionParameters: TransmissionParams
+    maxSizeTabooBank: int
+    isTabooBankFIFO: bool
+    maxCapturePriority: float
+    sortKeyCache: SortKeyCache = field(default_factory=SortKeyCache, compare=False, repr=False)
+
+    def __deepcopy__(self, memo):
+        return self
+
+
 class ProblemState:
-    def __init__(self, otList, btList, dtList, ttwList, gstwList, oh, destructionNumber, schedulingParameters, transmissionParameters,
-                 maxSizeTabooBank, isTabooBankFIFO):
+    """
+    Solution of the problem, the schedule, the order of the target time windows, the taboo bank and the objective
+    values belong to the solution, everything else is in the shared ProblemContext.
+    """
+    def __init__(self, otList, btList, dtList, ttwList, context: ProblemContext):
         self.otList: list[OT] = otList
         self.btList: list[BT] = btList
         self.dtList: list[DT] = dtList
         self.ttwList: list[TTW] = ttwList
-        self.gstwList: list[GSTW] = gstwList
-        self.oh = oh
-        self.destructionNumber = destructionNumber
-        self.schedulingParameters = schedulingParameters
-        self.transmissionParameters = transmissionParameters
+        self.context = context
         self.tabooBank = []
-        self.maxSizeTabooBank = maxSizeTabooBank
-        self.isTabooBankFIFO = isTabooBankFIFO
         self.objectiveValues = [0, 0] # Summed priority score and average image quality
-        self.maxCapturePriority = max([ttw.GT.priority for ttw in ttwList])
+
+    @classmethod
+    def create(cls, otList, btList, dtList, ttwList, gstwList, oh, destructionNumber, schedulingParameters,
+               transmissionParameters, maxSizeTabooBank, isTabooBankFIFO) -> "ProblemState":
+        """ Creates the first solution of a run together with a new context """
+        context = ProblemContext(gstwList, oh, destructionNumber, schedulingParameters, transmissionParameters,
+                                 maxSizeTabooBank, isTabooBankFIFO, max([ttw.GT.priority for ttw in ttwList]))
+        return cls(otList, btList, dtList, ttwList, context)
+
+    def clone(self) -> "ProblemState":
+        """
+        Copy the solution, the lists are copied but the tasks and time windows in them are immutable and shared,
+        as is the context.
+        """
+        cloned = ProblemState(self.otList.copy(), self.btList.copy(), self.dtList.copy(), self.ttwList.copy(),
+                              self.context)
+        cloned.tabooBank = self.tabooBank.copy()
+        cloned.objectiveValues = self.objectiveValues.copy()
+        return cloned
+
+    @property
+    def gstwList(self) -> list[GSTW]:
+        return self.context.gstwList
+
+    @property
+    def oh(self) -> OH:
+        return self.context.oh
+
+    @property
+    def destructionNumber(self) -> int:
+        return self.context.destructionNumber
+
+    @property
+    def schedulingParameters(self) -> SP:
+        return self.context.schedulingParameters
+
+    @property
+    def transmissionParameters(self) -> TransmissionParams:
+        return self.context.transmissionParameters
+
+    @property
+    def maxSizeTabooBank(self) -> int:
+        return self.context.maxSizeTabooBank
+
+    @property
+    def isTabooBankFIFO(self) -> bool:
+        return self.context.isTabooBankFIFO
+
+    @property
+    def maxCapturePriority(self) -> float:
+        return self.context.maxCapturePriority
+
+    @property
+    def sortKeyCache(self) -> SortKeyCache:
+        return self.context.sortKeyCache
 
     def objective(self) -> float:
         """
@@ -70,8 +143,8 @@ def initial_state(otList: list, ttwList: list, gstwList: list[GSTW], schedulingP
         oh,
         True)
     
-    state = ProblemState(otListAdjusted, btList, dtList, ttwListResorted, gstwList, oh, destructionNumber, schedulingParameters,
-                         transmissionParams, maxSizeTabooBank, isTabooBankFIFO)
+    state = ProblemState.create(otListAdjusted, btList, dtList, ttwListResorted, gstwList, oh, destructionNumber,
+                                schedulingParameters, transmissionParams, maxSizeTabooBank, isTabooBankFIFO)
     state.objectiveValues = objectiveValues
     return state
 def createInitialSolution(ttwList: list, gstwList: list[GSTW], schedulingParameters: SP,
@@ -106,8 +179,8 @@ def createGreedyInitialSolution(ttwList: list, gstwList: list[GSTW], schedulingP
         oh,
         True)
     
-    state = ProblemState(otListAdjusted, btList, dtList, ttwListResorted, gstwList, oh, destructionNumber, schedulingParameters,
-                         transmissionParams, maxSizeTabooBank, isTabooBankFIFO)
+    state = ProblemState.create(otListAdjusted, btList, dtList, ttwListResorted, gstwList, oh, destructionNumber,
+                                schedulingParameters, transmissionParams, maxSizeTabooBank, isTabooBankFIFO)
     state.objectiveValues = objectiveValues
 
     return state
@@ -152,13 +225,11 @@ def destroyRandom(current: ProblemState, rng: rnd.Generator) -> ProblemState:
         numberOfTargetsToRemove, 
         DestroyType.RANDOM,
         current.oh,
-        current.schedulingParameters.hypsoNr)
+        current.schedulingParameters.hypsoNr,
+        current.sortKeyCache)
 
-    destroyed = ProblemState(otList, current.btList, current.dtList, current.ttwList, current.gstwList, current.oh,
-                 current.destructionNumber, current.schedulingParameters,
-                 current.transmissionParameters, current.maxSizeTabooBank, current.isTabooBankFIFO)
-
-    destroyed.objectiveValues = current.objectiveValues.copy()
+    destroyed = current.clone()
+    destroyed.otList = otList
     destroyed.tabooBank = newTabooBank
     destroyed.tabooBank.extend(removedTargetsIdList)
     return destroyed
@@ -180,13 +251,11 @@ def destroyGreedyPriority(current: ProblemState, rng: rnd.Generator) -> ProblemS
         numberOfTargetsToRemove,
         DestroyType.GREEDY_P,
         current.oh,
-        current.schedulingParameters.hypsoNr)
-
-    destroyed = ProblemState(otList, current.btList, current.dtList, current.ttwList, current.gstwList, current.oh,
-                             current.destructionNumber, current.schedulingParameters,
-                             current.transmissionParameters, current.maxSizeTabooBank, current.isTabooBankFIFO)
+        current.schedulingParameters.hypsoNr,
+        current.sortKeyCache)
 
-    destroyed.objectiveValues = current.objectiveValues.copy()
+    destroyed = current.clone()
+    destroyed.otList = otList
     destroyed.tabooBank = newTabooBank
     destroyed.tabooBank.extend(removedTargetsIdList)
     return destroyed
@@ -208,13 +277,11 @@ def destroyGreedyImageQuality(current: ProblemState, rng: rnd.Generator) -> Prob
         numberOfTargetsToRemove,
         DestroyType.GREEDY_IQ,
         current.oh,
-        current.schedulingParameters.hypsoNr)
+        current.schedulingParameters.hypsoNr,
+        current.sortKeyCache)
 
-    destroyed = ProblemState(otList, current.btList, current.dtList, current.ttwList, current.gstwList, current.oh,
-                             current.destructionNumber, current.schedulingParameters,
-                             current.transmissionParameters, current.maxSizeTabooBank, current.isTabooBankFIFO)
-
-    destroyed.objectiveValues = current.objectiveValues.copy()
+    destroyed = current.clone()
+    destroyed.otList = otList
     destroyed.tabooBank = newTabooBank
     destroyed.tabooBank.extend(removedTargetsIdList)
     return destroyed
@@ -236,13 +303,11 @@ def destroyCongestion(current: ProblemState, rng: rnd.Generator) -> ProblemState
         numberOfTargetsToRemove,
         DestroyType.CONGESTION,
         current.oh,
-        current.schedulingParameters.hypsoNr)
-
-    destroyed = ProblemState(otList, current.btList, current.dtList, current.ttwList, current.gstwList, current.oh,
-                             current.destructionNumber, current.schedulingParameters,
-                             current.transmissionParameters, current.maxSizeTabooBank, current.isTabooBankFIFO)
+        current.schedulingParameters.hypsoNr,
+        current.sortKeyCache)
 
-    destroyed.objectiveValues = current.objectiveValues.copy()
+    destroyed = current.clone()
+    destroyed.otList = otList
     destroyed.tabooBank = newTabooBank
     destroyed.tabooBank.extend(removedTargetsIdList)
     return destroyed
@@ -257,12 +322,12 @@ def repairRandom(current: ProblemState, rng: rnd.Generator) -> ProblemState:
         RepairType.RANDOM, 
         current.schedulingParameters,
         current.transmissionParameters,
-        current.oh)
-
-    repaired = ProblemState(otList, btList, dtList, ttwList, current.gstwList, current.oh,
-                 current.destructionNumber, current.schedulingParameters,
-                 current.transmissionParameters, current.maxSizeTabooBank, current.isTabooBankFIFO)
+        current.oh,
+        btList=current.btList,
+        dtList=current.dtList,
+        sortKeyCache=current.sortKeyCache)
 
+    repaired = ProblemState(otList, btList, dtList, ttwList, current.context)
     repaired.tabooBank = current.tabooBank.copy()
     repaired.objectiveValues = objectiveValues
     return repaired
@@ -277,12 +342,12 @@ def repairGreedy(current: ProblemState, rng: rnd.Generator) -> ProblemState:
         RepairType.GREEDY,
         current.schedulingParameters,
         current.transmissionParameters,
-        current.oh)
-
-    repaired = ProblemState(otList, btList, dtList, ttwList, current.gstwList, current.oh,
-                 current.destructionNumber, current.schedulingParameters,
-                 current.transmissionParameters, current.maxSizeTabooBank, current.isTabooBankFIFO)
+        current.oh,
+        btList=current.btList,
+        dtList=current.dtList,
+        sortKeyCache=current.sortKeyCache)
 
+    repaired = ProblemState(otList, btList, dtList, ttwList, current.context)
     repaired.tabooBank = current.tabooBank.copy()
     repaired.objectiveValues = objectiveValues
     return repaired
@@ -297,12 +362,12 @@ def repairSmallTW(current: ProblemState, rng: rnd.Generator) -> ProblemState:
         RepairType.SMALL_TW,
         current.schedulingParameters,
         current.transmissionParameters,
-        current.oh)
-
-    repaired = ProblemState(otList, btList, dtList, ttwList, current.gstwList, current.oh,
-                 current.destructionNumber, current.schedulingParameters,
-                 current.transmissionParameters, current.maxSizeTabooBank, current.isTabooBankFIFO)
+        current.oh,
+        btList=current.btList,
+        dtList=current.dtList,
+        sortKeyCache=current.sortKeyCache)
 
+    repaired = ProblemState(otList, btList, dtList, ttwList, current.context)
     repaired.tabooBank = current.tabooBank.copy()
     repaired.objectiveValues = objectiveValues
     return repaired
@@ -317,12 +382,12 @@ def repairCongestion(current: ProblemState, rng: rnd.Generator) -> ProblemState:
         RepairType.CONGESTION,
         current.schedulingParameters,
         current.transmissionParameters,
-        current.oh)
-
-    repaired = ProblemState(otList, btList, dtList, ttwList, current.gstwList, current.oh,
-                            current.destructionNumber, current.schedulingParameters,
-                            current.transmissionParameters, current.maxSizeTabooBank, current.isTabooBankFIFO)
+        current.oh,
+        btList=current.btList,
+        dtList=current.dtList,
+        sortKeyCache=current.sortKeyCache)
 
+    repaired = ProblemState(otList, btList, dtList, ttwList, current.context)
     repaired.tabooBank = current.tabooBank.copy()
     repaired.objectiveValues = objectiveValues
     return repaired
@@ -330,8 +395,10 @@ def repairCongestion(current: ProblemState, rng: rnd.Generator) -> ProblemState:
 
 ### Function to run ALNS algorithm
 
-def runALNS(initialState: ProblemState, maxItr: int):
+def runALNS(initialState: ProblemState, maxItr: int, rng: rnd.Generator = None):
     """ Runs the ALNS algorithm to find a good heuristic solution
+    Input:
+    - rng: random generator used by the ALNS algorithm, if not given it is initialized without a seed
     Output:
     - result: the result object from the ALNS run, containing the best solution found
     - state: the final ProblemState object of the problem after the ALNS run
@@ -342,7 +409,7 @@ def runALNS(initialState: ProblemState, maxItr: int):
                                                          initialState.schedulingParameters.hypsoNr)]
 
     # Create ALNS and add one or more destroy and repair operators
-    alns = ALNS() # Initialize without a random seed
+    alns = ALNS(rng) if rng is not None else ALNS() # Initialize without a random seed if no generator is given
     alns.add_destroy_operator(destroyRandom)
     alns.add_destroy_operator(destroyGreedyPriority)
     # alns.add_destroy_operator(destroyGreedyImageQuality)
@@ -1,18 +1,55 @@
 from types import NoneType
-import copy
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import math
+import os
+import random
 from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
 from pymoo.operators.survival.rank_and_crowding.metrics import get_crowding_function
 from pymoo.mcdm.high_tradeoff import HighTradeoffPoints
 from collections import namedtuple
 
-from algorithm.ALNS_algorithm import runALNS, createInitialSolution, createGreedyInitialSolution
+from algorithm.ALNS_algorithm import ProblemState, runALNS, createInitialSolution, createGreedyInitialSolution
 from scheduling_model import SP, OH, GSTW, OT, BT, DT
 from transmission_scheduling.input_parameters import TransmissionParams
+from transmission_scheduling.gs_timeline import GSTimeline, getGSTimeline
+from data_preprocessing.elevation_table import elevationTableIndex
 
 INDIVIDUAL = namedtuple("INDIVIDUAL", ["id", "solutionState"])
 
+def createOffspring(
+            parentState: ProblemState | None,
+            alnsRuns: int,
+            seedSequence: np.random.SeedSequence,
+            ttwList: list,
+            gstwList: GSTimeline,
+            schedulingParameters: SP,
+            transmissionParameters: TransmissionParams,
+            oh: OH,
+            destructionNumber: int,
+            maxSizeTabooBank: int,
+            isTabooBankFIFO: bool) -> ProblemState:
+    """ Creates one offspring by running ALNS on a mutation of the parent, or on a new initial solution if no parent
+    is given. The random generators are seeded from the seed sequence, so the offspring does not depend on the
+    process it is created in or on the other offsprings.
+    Output:
+    - the best ProblemState found by the ALNS run
+    """
+    random.seed(int(seedSequence.generate_state(1)[0]))
+    rng = np.random.default_rng(seedSequence)
+    # A process that was not forked from the main process starts without the elevation tables, these are only
+    # created for the time windows that are not covered yet
+    elevationTableIndex.addTTWList(ttwList, oh, schedulingParameters.hypsoNr)
+
+    if parentState is None:
+        initialState = createInitialSolution(ttwList.copy(), gstwList, schedulingParameters, transmissionParameters,
+                                             oh, destructionNumber, maxSizeTabooBank, isTabooBankFIFO)
+    else:
+        initialState = parentState.clone()
+
+    return runALNS(initialState, alnsRuns, rng).best_state
+
+
 def findKneePoint(fronts, objectiveSpace):
         """ Finds the knee point in the Pareto front using the HighTradeoffPoints method
         Output:
@@ -54,11 +91,52 @@ def findKneePoint(fronts, objectiveSpace):
 
         return bestSolution, bestIndex
 
+def createOffsprings(
+            parentStates: list[ProblemState],
+            nrOfOffsprings: int,
+            offspringSeeds: list[np.random.SeedSequence],
+            workers: int,
+            alnsRuns: int,
+            offspringArgs: tuple) -> list[ProblemState]:
+    """ Creates the offsprings of a generation with createOffspring, in a process pool if workers > 1.
+    Offspring i is a mutation of individual i of the population, where the offsprings are appended to the population
+    as they are created. So if there are more offsprings than individuals, the last offsprings are mutations of the
+    first offsprings, these are created in a next round. An empty population gives only new initial solutions.
+    Output:
+    - the offspring states, in the same order as they would be created one by one
+    """
+    offspringStates: list[ProblemState] = []
+    executor = ProcessPoolExecutor(max_workers=min(workers, nrOfOffsprings)) if workers > 1 and nrOfOffsprings > 1 else None
+    try:
+        while len(offspringStates) < nrOfOffsprings:
+            first = len(offspringStates)
+            if not parentStates:
+                roundParents = [None] * nrOfOffsprings
+            else:
+                # Parents can be individuals of the population or offsprings created in an earlier round
+                candidateParents = parentStates + offspringStates
+                roundParents = candidateParents[first:nrOfOffsprings]
+            roundSeeds = offspringSeeds[first:first + len(roundParents)]
+
+            if executor is not None and len(roundParents) > 1:
+                # map returns the offsprings in the order they were submitted
+                roundCount = len(roundParents)
+                offspringStates += executor.map(createOffspring, roundParents, [alnsRuns] * roundCount, roundSeeds,
+                                                *[[arg] * roundCount for arg in offspringArgs])
+            else:
+                offspringStates += [createOffspring(parent, alnsRuns, seed, *offspringArgs)
+                                    for parent, seed in zip(roundParents, roundSeeds)]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return offspringStates
+
 def runNSGA(
             populationSize: int, 
             nsga2Runs: int,
             ttwList: list,
-            gstwList: list[GSTW],
+            gstwList: list[GSTW] | GSTimeline,
             schedulingParameters: SP,
             transmissionParameters: TransmissionParams,
             oh: OH,
@@ -68,9 +146,17 @@ def runNSGA(
             destructionNumber: int,
             maxSizeTabooBank: int,
             greedyAlgorithm: bool=False,
-            optimalTermination: bool=False) -> tuple[list[OT], list[BT], list[DT], list, list, list, list]:
+            optimalTermination: bool=False,
+            parallel: bool=False,
+            workers: int=None,
+            seed: int=None) -> tuple[list[OT], list[BT], list[DT], list, list, list, list]:
     
     """ Runs the NSGA2 algorithm to optimize the observation schedule
+    Input:
+    - parallel: create the offsprings of each generation in a process pool
+    - workers: number of processes in the pool, defaults to the number of CPU cores
+    - seed: seed of the random generators, each offspring gets its own generators spawned from this seed.
+      With a seed the result is reproducible and does not depend on the number of workers
     Output:
     - bestSchedule: the schedule of the best solution found
     - iterationData: list with data from each iteration (fronts, objectiveSpace, selectedobjective values)
@@ -79,6 +165,13 @@ def runNSGA(
     - oldPopulation: the final population of solutions
     """
 
+    # The ground station passes are shared by all solutions, so the timeline is only created once
+    gstwList = getGSTimeline(gstwList)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    seedSequence = np.random.SeedSequence(seed) if parallel or seed is not None else None
+
     iterationData = []
     population = []
     individualID = 0
@@ -118,6 +211,21 @@ def runNSGA(
         #### Creating offsprings using ALNS
 
         nrOfOffsprings = populationSize - len(population)
+        if seedSequence is not None:
+            offspringStates = createOffsprings(
+                [individual.solutionState for individual in population],
+                nrOfOffsprings,
+                seedSequence.spawn(nrOfOffsprings),
+                workers if parallel else 1,
+                alnsRuns,
+                (ttwList, gstwList, schedulingParameters, transmissionParameters, oh, destructionNumber,
+                 maxSizeTabooBank, isTabooBankFIFO))
+
+            for best in offspringStates:
+                population.append(INDIVIDUAL(individualID , best))
+                individualID += 1
+            nrOfOffsprings = 0
+
         for i in range(nrOfOffsprings):
             # Create mutation of the individual population[i], or create initial population
 
@@ -127,7 +235,7 @@ def runNSGA(
                                          oh, destructionNumber, maxSizeTabooBank, isTabooBankFIFO)
             else:
                 # create mutation
-                initialState = copy.deepcopy(population[i].solutionState)
+                initialState = population[i].solutionState.clone()
 
             newIndividual = runALNS(
                 initialState,
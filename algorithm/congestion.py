@@ -0,0 +1,86 @@
+import numpy as np
+
+from scheduling_model import TTW
+
+
+class CongestionIndex:
+    """ Congestion levels of a set of TTWs, used by congestionSort.
+    The congestion level of a TTW is the sum of the time differences between the middle of each of its time windows
+    and the middle of every time window of the other TTWs.
+
+    The middle times of all time windows are kept sorted together with their prefix sums, so the sum of the
+    differences to one time is found with a binary search. The TTWs are stored by object, a TTW can be removed from
+    the index and the congestion levels of the remaining TTWs are recalculated the next time they are needed.
+    """
+
+    def __init__(self, ttwList: list[TTW]):
+        self._ttws: dict[int, TTW] = {}
+        self._middleTimes: dict[int, np.ndarray] = {}
+        for ttw in ttwList:
+            self._ttws[id(ttw)] = ttw
+            self._middleTimes[id(ttw)] = np.array([tw.start + (tw.end - tw.start) / 2 for tw in ttw.TWs], dtype=float)
+
+        allMiddleTimes = [middleTimes for middleTimes in self._middleTimes.values()]
+        self._sortedMiddleTimes = np.sort(np.concatenate(allMiddleTimes)) if allMiddleTimes else np.empty(0)
+        self._congestionLevels: dict[int, float] = None
+
+    def __len__(self):
+        return len(self._ttws)
+
+    def getTTWList(self) -> list[TTW]:
+        return list(self._ttws.values())
+
+    def contains(self, ttw: TTW) -> bool:
+        return self._ttws.get(id(ttw)) is ttw
+
+    def remove(self, ttw: TTW):
+        """ Remove a TTW, its time windows no longer add to the congestion of the other TTWs """
+        if not self.contains(ttw):
+            raise ValueError(f"Target {ttw.GT.id} is not in the congestion index")
+        middleTimes = self._middleTimes.pop(id(ttw))
+        del self._ttws[id(ttw)]
+        middleTimes = np.sort(middleTimes)
+        # Equal middle times are interchangeable, so each one removes the next occurrence of its time
+        positions = (np.searchsorted(self._sortedMiddleTimes, middleTimes, side='left')
+                     + np.arange(len(middleTimes)) - np.searchsorted(middleTimes, middleTimes, side='left'))
+        self._sortedMiddleTimes = np.delete(self._sortedMiddleTimes, positions)
+        self._congestionLevels = None
+
+    def getCongestionLevels(self, ttwList: list[TTW]) -> list[float]:
+        """
+        Output:
+        - The congestion level of each TTW in the list, all TTWs have to be in the index
+        """
+        self._update()
+        return [self._congestionLevels[id(ttw)] for ttw in ttwList]
+
+    def _update(self):
+        if self._congestionLevels is not None:
+            return
+
+        keys = list(self._middleTimes)
+        lengths = np.array([len(self._middleTimes[key]) for key in keys], dtype=int)
+        owners = np.repeat(np.arange(len(keys)), lengths)
+        middleTimes = np.concatenate([self._middleTimes[key] for key in keys]) if keys else np.empty(0)
+
+        # Sum of the differences from each middle time to all middle times
+        differenceSums = getDifferenceSums(middleTimes, self._sortedMiddleTimes)
+
+        # The time windows of the TTW itself do not count, so the sums within each TTW are subtracted
+        ownDifferenceSums = np.array([getDifferenceSums(self._middleTimes[key], np.sort(self._middleTimes[key])).sum()
+                                      for key in keys], dtype=float)
+
+        congestionLevels = np.bincount(owners, weights=differenceSums, minlength=len(keys)) - ownDifferenceSums
+        # The levels are rounded to a millisecond, so TTWs with the same congestion are equal regardless of the order
+        # the differences were summed in
+        self._congestionLevels = {key: round(float(level), 3) for key, level in zip(keys, congestionLevels)}
+
+
+def getDifferenceSums(times: np.ndarray, sortedTimes: np.ndarray) -> np.ndarray:
+    """ For each time, get the sum of the absolute differences to all the sorted times.
+    Output:
+    - Array with the sum of the differences for each time
+    """
+    prefixSums = np.concatenate(([0.0], np.cumsum(sortedTimes)))
+    before = np.searchsorted(sortedTimes, times, side='right')
+    return (times * before - prefixSums[before]) + ((prefixSums[-1] - prefixSums[before]) - times * (len(sortedTimes) - before))
@@ -1,11 +1,13 @@
 import random
+from collections import OrderedDict
 from enum import Enum
 
+from algorithm.congestion import CongestionIndex
 from algorithm.rhga import RHGA
 from scheduling_model import OH, SP, GSTW, TTW, BT, DT, OT
 from transmission_scheduling.input_parameters import TransmissionParams
-from transmission_scheduling.two_stage_transmission_insert import twoStageTransmissionScheduling
-from data_preprocessing.objective_functions import objectiveFunctionPriority, objectiveFunctionImageQuality
+from transmission_scheduling.two_stage_transmission_insert import twoStageTransmissionScheduling, keptTasksLost
+from data_preprocessing.objective_functions import objectiveFunctionPriority, objectiveFunctionImageQuality, getElevationsFromOTList
 
 
 class DestroyType(Enum):
@@ -35,98 +37,121 @@ def randomSort(ttwListOriginal: list):
     return ttwListSorted
 
 
-def greedyPrioritySort(ttwListOriginal: list):
-    """ Sort TTW list so high priority GT are first"""
-    ttwList = ttwListOriginal.copy()
-    ttwListSorted = []
-
-    # Find element in ttwList with highest priority, remove from ttwList and add to ttwListSorted
-    while ttwList:
-        maxPriority = 0
-        maxIndex = 0
-        for j in range(len(ttwList)):
-            if ttwList[j].GT.priority > maxPriority:
-                maxPriority = ttwList[j].GT.priority
-                maxIndex = j
-        ttwListSorted.append(ttwList.pop(maxIndex))
-    return ttwListSorted
+class SortKeyCache:
+    """ Cache of the sort keys, shared by all solutions of one problem.
+    The smallest time window length is stored per TTW object and the image quality per OT, so they are only calculated
+    the first time a TTW or OT is sorted. The congestion index of the last sorted TTW list is kept, as the congestion
+    of a TTW depends on all the other TTWs.
+    Every shifted start time gives a new OT, so the number of stored TTWs and OTs is bounded, the least recently
+    sorted ones are evicted first.
+    """
 
-def greedyImageQualitySort(otListOriginal: list, oh: OH, hypsoNr):
-    """ Sort OT list so GT with the highest image quality are first"""
-    otList = otListOriginal.copy()
-    otListSorted = []
-
-    while otList:
-        maxImageQuality = 0
-        maxIndex = 0
-        for j in range(len(otList)):
-            imageQuality = objectiveFunctionImageQuality([otList[j]], oh, hypsoNr)
-            if imageQuality > maxImageQuality:
-                maxImageQuality = imageQuality
-                maxIndex = j
-        otListSorted.append(otList.pop(maxIndex))
-    return otListSorted
-
-
-def smallTWSort(ttwListOriginal: list):
-    """ Sort TTW list so GT with small TWs are first"""
-    ttwList = ttwListOriginal.copy()
-    ttwListSorted = []
+    def __init__(self, maxEntries: int = 20000):
+        self.maxEntries = maxEntries
+        self._smallestTWLengths: OrderedDict[int, tuple[TTW, float]] = OrderedDict()
+        self._imageQualities: OrderedDict[OT, float] = OrderedDict()
+        self._congestionIndex: CongestionIndex = None
+
+    def __getstate__(self):
+        # The TTWs are stored by object id, which is not valid in another process, so the cache is not copied
+        return {"maxEntries": self.maxEntries}
+
+    def __setstate__(self, state):
+        self.__init__(state["maxEntries"])
+
+    def getSmallestTWLengths(self, ttwList: list[TTW]) -> list[float]:
+        lengths = []
+        for ttw in ttwList:
+            entry = self._smallestTWLengths.get(id(ttw))
+            if entry is None or entry[0] is not ttw:
+                entry = (ttw, getSmallestTWLength(ttw))
+                self._smallestTWLengths[id(ttw)] = entry
+            self._smallestTWLengths.move_to_end(id(ttw))
+            lengths.append(entry[1])
+        self._evict(self._smallestTWLengths)
+        return lengths
+
+    def getCongestionIndex(self, ttwList: list[TTW]) -> CongestionIndex:
+        """ Get the congestion index of the TTWs, TTWs that are no longer in the list are removed from the index """
+        index = self._congestionIndex
+        if index is None or len(index) < len(ttwList) or not all(index.contains(ttw) for ttw in ttwList):
+            index = CongestionIndex(ttwList)
+        elif len(index) > len(ttwList):
+            ttwIds = {id(ttw) for ttw in ttwList}
+            for ttw in index.getTTWList():
+                if id(ttw) not in ttwIds:
+                    index.remove(ttw)
+        self._congestionIndex = index
+        return index
+
+    def getImageQualities(self, otList: list[OT], oh: OH, hypsoNr: int) -> list[float]:
+        otListNew = list({ot: None for ot in otList if ot not in self._imageQualities})
+        if otListNew:
+            for ot, imageQuality in zip(otListNew, getElevationsFromOTList(otListNew, oh, hypsoNr)):
+                self._imageQualities[ot] = float(imageQuality)
+        imageQualities = []
+        for ot in otList:
+            self._imageQualities.move_to_end(ot)
+            imageQualities.append(self._imageQualities[ot])
+        self._evict(self._imageQualities)
+        return imageQualities
+
+    def _evict(self, entries: OrderedDict):
+        """ Remove the least recently used entries until the size limit is met """
+        while len(entries) > self.maxEntries:
+            entries.popitem(last=False)
+
+
+def getSmallestTWLength(ttw: TTW) -> float:
+    return min((tw.end - tw.start for tw in ttw.TWs), default=float("Infinity"))
 
-    # Find element in ttwList with shortest tw, remove from ttwList and add to ttwListSorted
-    while ttwList:
-        minTW = ttwList[0].TWs[0].end - ttwList[0].TWs[0].start
-        maxIndex = 0
-        for j in range(len(ttwList)):
-            for k in range(len(ttwList[j].TWs)):
-                if ttwList[j].TWs[k].end - ttwList[j].TWs[k].start < minTW:
-                    minTW = ttwList[j].TWs[k].end - ttwList[j].TWs[k].start
-                    maxIndex = j
-        ttwListSorted.append(ttwList.pop(maxIndex))
 
-    return ttwListSorted
+def greedyPrioritySort(ttwListOriginal: list):
+    """ Sort TTW (or OT) list so high priority GT are first"""
+    # Stable sort, so GT with the same priority keep their order. Priorities of 0 or less are never preferred.
+    return sorted(ttwListOriginal, key=lambda x: max(x.GT.priority, 0), reverse=True)
 
+def greedyImageQualitySort(otListOriginal: list, oh: OH, hypsoNr, sortKeyCache: SortKeyCache = None):
+    """ Sort OT list so GT with the highest image quality are first"""
+    # Calculate the image quality of all OTs in one batch, the stable sort keeps the original order for equal quality
+    if sortKeyCache is not None:
+        imageQualities = sortKeyCache.getImageQualities(otListOriginal, oh, hypsoNr)
+    else:
+        imageQualities = getElevationsFromOTList(otListOriginal, oh, hypsoNr)
+    sortedIndices = sorted(range(len(otListOriginal)), key=lambda j: imageQualities[j], reverse=True)
+    return [otListOriginal[j] for j in sortedIndices]
 
 
-def congestionSort(ttwListOriginal: list):
-    """ Sort TTW list so GT with little congestion are first"""
-    ttwList = ttwListOriginal.copy()
-    congestionLevelsList = []
+def smallTWSort(ttwListOriginal: list, sortKeyCache: SortKeyCache = None):
+    """ Sort TTW list so GT with small TWs are first"""
+    # Each TTW is ranked by its smallest time window, the stable sort keeps the original order for equal lengths
+    if sortKeyCache is not None:
+        smallestTWLengths = sortKeyCache.getSmallestTWLengths(ttwListOriginal)
+    else:
+        smallestTWLengths = [getSmallestTWLength(ttw) for ttw in ttwListOriginal]
+    sortedIndices = sorted(range(len(ttwListOriginal)), key=lambda j: smallestTWLengths[j])
+    return [ttwListOriginal[j] for j in sortedIndices]
 
-    #Calculate the congestion level assosiated with each element in ttwList
-    for i in range(len(ttwList)):
-        congestionLevel = 0
 
-        # Find the sum of the difference in time between all tw of this gt and all other gt.tw
-        for tw_i in ttwList[i].TWs:
-            twMiddelTime_i = tw_i.start + (tw_i.end - tw_i.start)/2
-            for j in range(len(ttwList)):
-                if i == j:
-                    continue
-                for tw_j in ttwList[j].TWs:
-                    twMiddelTime_j = tw_j.start + (tw_j.end - tw_j.start)/2
-                    congestionLevel += abs(twMiddelTime_i - twMiddelTime_j)
 
-        congestionLevelsList.append(congestionLevel)
+def congestionSort(ttwListOriginal: list, sortKeyCache: SortKeyCache = None):
+    """ Sort TTW list so GT with little congestion are first"""
+    # The congestion level of a TTW is the sum of the difference in time between all its tw and all other gt.tw
+    if sortKeyCache is not None:
+        congestionIndex = sortKeyCache.getCongestionIndex(ttwListOriginal)
+    else:
+        congestionIndex = CongestionIndex(ttwListOriginal)
+    congestionLevelsList = congestionIndex.getCongestionLevels(ttwListOriginal)
 
-    ttwListSorted = []
-    # Find element in ttwList with highest congestion level, remove from ttwList and add to ttwListSorted
-    while ttwList:
-        minCongestion = congestionLevelsList[0]
-        maxIndex = 0
-        for j in range(len(congestionLevelsList)):
-            if congestionLevelsList[j] < minCongestion:
-                minCongestion = congestionLevelsList[j]
-                maxIndex = j
-        ttwListSorted.append(ttwList.pop(maxIndex))
-        congestionLevelsList.pop(maxIndex)
-    
-    return ttwListSorted
+    # Stable sort on the congestion level, so the first of the TTWs with equal congestion is kept first
+    sortedIndices = sorted(range(len(ttwListOriginal)), key=lambda j: congestionLevelsList[j])
+    return [ttwListOriginal[j] for j in sortedIndices]
 
 
 #### Destroy operator
 
-def destroyOperator(otList: list, ttwList: list, destroyNumber: int, destroyType: DestroyType, oh: OH, hypsoNr: int):
+def destroyOperator(otList: list, ttwList: list, destroyNumber: int, destroyType: DestroyType, oh: OH, hypsoNr: int,
+                    sortKeyCache: SortKeyCache = None):
     """ Takes in a list of OT and removes destroyNumber of them. Selects which ones to remove based on destroyType.
     destroyTypes: random, greedy_priority, greedy_imageQuality, congestion. \n
     Output:
@@ -148,14 +173,15 @@ def destroyOperator(otList: list, ttwList: list, destroyNumber: int, destroyType
     elif destroyType == DestroyType.GREEDY_P:
         otListSorted = greedyPrioritySort(otListCopy)
     elif destroyType == DestroyType.GREEDY_IQ:
-        otListSorted = greedyImageQualitySort(otListCopy, oh, hypsoNr)
+        otListSorted = greedyImageQualitySort(otListCopy, oh, hypsoNr, sortKeyCache)
     elif destroyType == DestroyType.CONGESTION:
-        ttwListSorted = congestionSort(ttwList)
+        ttwListSorted = congestionSort(ttwList, sortKeyCache)
+        otsOfTarget: dict[str, list[OT]] = {}
+        for ot in otListCopy:
+            otsOfTarget.setdefault(ot.GT.id, []).append(ot)
         otListSorted = []
-        for ttw in ttwListSorted:         
-            for ot in otListCopy:
-                if ot.GT.id == ttw.GT.id:
-                    otListSorted.append(ot)
+        for ttw in ttwListSorted:
+            otListSorted.extend(otsOfTarget.get(ttw.GT.id, []))
 
     else:
         print("Destroy type not found")
@@ -169,10 +195,17 @@ def destroyOperator(otList: list, ttwList: list, destroyNumber: int, destroyType
 
 def repairOperator(ttwList: list, otList: list, gstwList: list[GSTW], unfeasibleTargetsIdList: list,
                    repairType: RepairType, schedulingParameters: SP, transmissionParams: TransmissionParams, oh: OH,
-                   fullReinsert = False) -> tuple[list[TTW], list[OT], list[BT], list[DT], list]:
+                   fullReinsert = False, btList: list[BT] = None,
+                   dtList: list[DT] = None,
+                   sortKeyCache: SortKeyCache = None) -> tuple[list[TTW], list[OT], list[BT], list[DT], list]:
     """ Takes in a list of OTs and inserts new OTs until no more feasible insertions can be performed. Selects which ones to insert based on repairType.
     After inserting all new OTs, the scheduled is adjusted to fulfill downlink/buffering requirements.
     repairType: random, greedy, smallTW, congestion.\n
+    If the buffering and downlink tasks of the schedule are given in btList and dtList, the repair is incremental:
+    the tasks of OTs that are still in otList are kept, the tasks of removed OTs are freed and transmissions are
+    scheduled for the new OTs in priority order. New OTs that do not fit are dropped or re-inserted in the same way as
+    when the whole schedule is created. Only if a kept OT would lose its transmission, the transmissions of all OTs
+    are scheduled from scratch instead.\n
     Output:
     - otList: list of OTs with new OTs inserted
     """
@@ -190,9 +223,9 @@ def repairOperator(ttwList: list, otList: list, gstwList: list[GSTW], unfeasible
     elif repairType == RepairType.GREEDY:
         ttwListSorted = greedyPrioritySort(ttwList)
     elif repairType == RepairType.SMALL_TW:
-        ttwListSorted = smallTWSort(ttwList)
+        ttwListSorted = smallTWSort(ttwList, sortKeyCache)
     elif repairType == RepairType.CONGESTION:
-        ttwListSorted = congestionSort(ttwList)
+        ttwListSorted = congestionSort(ttwList, sortKeyCache)
     else:
         raise Exception("The repair operator type could not be found")
 
@@ -200,9 +233,28 @@ def repairOperator(ttwList: list, otList: list, gstwList: list[GSTW], unfeasible
     otListRepaired = RHGA(ttwListSorted, otListCopy, unfeasibleTargetsIdList, schedulingParameters, oh, greedyMode, randomMode)
 
     ### Downlink/buffer scheduling
-    # Adjust the imaging schedule such that the buffer and downlink tasks fit
-    btList, dtList, otListAdjusted = twoStageTransmissionScheduling(otListRepaired, ttwList, gstwList, transmissionParams,
-                                                             True, fullReinsert)
+    incrementalScheduleFound = False
+    if btList is not None and dtList is not None:
+        # Free the buffer and downlink tasks of the OTs that were removed by the destroy operator
+        keptTaskIDs = {ot.taskID for ot in otList}
+        existingBTList = [bt for bt in btList if bt.OTTaskID in keptTaskIDs]
+        bufferedTaskIDs = {bt.OTTaskID for bt in existingBTList}
+        existingDTList = [dt for dt in dtList if dt.OTTaskID in bufferedTaskIDs]
+
+        # Only the new OTs, and any kept OT without a buffer task, need to be scheduled
+        existingOTList = [ot for ot in otList if ot.taskID in bufferedTaskIDs]
+        otListNew = [ot for ot in otListRepaired if ot.taskID not in bufferedTaskIDs]
+        btList, dtList, otListAdjusted = twoStageTransmissionScheduling(otListNew, ttwList, gstwList,
+                                                                        transmissionParams, True, fullReinsert,
+                                                                        existingOTList, existingBTList, existingDTList,
+                                                                        keepExisting=True)
+        incrementalScheduleFound = not keptTasksLost(bufferedTaskIDs, otListAdjusted)
+
+    if not incrementalScheduleFound:
+        # Adjust the imaging schedule such that the buffer and downlink tasks fit
+        btList, dtList, otListAdjusted = twoStageTransmissionScheduling(otListRepaired, ttwList, gstwList,
+                                                                        transmissionParams, True, fullReinsert)
+
     # Calculate the objective values of the adjusted schedule
     objectiveValuesList = [objectiveFunctionPriority(otListAdjusted),
                            objectiveFunctionImageQuality(otListAdjusted, oh, schedulingParameters.hypsoNr)]
@@ -1,6 +1,43 @@
-from scheduling_model import OH, OT, SP, generateTaskID
+from bisect import bisect_left, bisect_right
 import random
 
+from scheduling_model import OH, OT, SP, generateTaskID
+
+
+class BlockedIntervals:
+    """ Sorted, disjoint open intervals of start times that are blocked by already scheduled observation tasks.
+    A new observation task cannot start within captureDuration + transitionTime before a scheduled task, or before
+    transitionTime has passed after it. Overlapping intervals are merged, so the first free start time at or after
+    a given time is found with one binary search.
+    """
+
+    def __init__(self, otList: list[OT], schedulingParameters: SP):
+        self.bufferTime = schedulingParameters.captureDuration + schedulingParameters.transitionTime
+        self.transitionTime = schedulingParameters.transitionTime
+        self._starts: list[float] = []
+        self._ends: list[float] = []
+        for ot in otList:
+            self.addOT(ot)
+
+    def addOT(self, ot: OT):
+        start = ot.start - self.bufferTime
+        end = ot.end + self.transitionTime
+        # Merge with the intervals that overlap, intervals that only touch are kept apart
+        first = bisect_right(self._ends, start)
+        last = bisect_left(self._starts, end)
+        if first < last:
+            start = min(start, self._starts[first])
+            end = max(end, self._ends[last - 1])
+        self._starts[first:last] = [start]
+        self._ends[first:last] = [end]
+
+    def getFirstFreeStart(self, startTime: float) -> float:
+        """ Get the first start time at or after startTime that is not blocked by any scheduled observation task """
+        i = bisect_left(self._starts, startTime) - 1
+        if i >= 0 and self._ends[i] > startTime:
+            return self._ends[i]
+        return startTime
+
 
 def RHGA(ttwList: list, otList: list, unfeasibleTargetsIdList: list, schedulingParameters: SP, oh: OH, greedyMode: bool, randomtwDistrobution = True):
     """
@@ -14,6 +51,8 @@ def RHGA(ttwList: list, otList: list, unfeasibleTargetsIdList: list, schedulingP
     - otList: scheduled observation tasks
     - objectiveValues: objective values [priority, image quality]
     """
+    bufferTime = schedulingParameters.captureDuration + schedulingParameters.transitionTime
+    blockedIntervals = BlockedIntervals(otList, schedulingParameters)
 
     # Loop through the targets
     for ttw in ttwList:
@@ -24,8 +63,6 @@ def RHGA(ttwList: list, otList: list, unfeasibleTargetsIdList: list, schedulingP
             # Target is maked unfeasible, skip to next target
             continue
 
-        bufferTime = schedulingParameters.captureDuration + schedulingParameters.transitionTime
-
         # Loop through a target's time windows
         for tw in ttw.TWs:   
             newObservationStart = tw.start
@@ -39,33 +76,25 @@ def RHGA(ttwList: list, otList: list, unfeasibleTargetsIdList: list, schedulingP
                 # Randomly select a time within the time window
                 newObservationStart = random.uniform(tw.start, tw.end - schedulingParameters.captureDuration)
 
-            solutionIsFeasible = True
-
             # Find an observation time within tw that does not collide with already scheduled observation tasks
-            for ot in otList:
-
-                if ot.start > newObservationStart + bufferTime or ot.end + schedulingParameters.transitionTime < newObservationStart:
-                    # No collision with current ot, continue to check next ot
-                    continue
-                elif ot.start + bufferTime*2 < tw.end:
-                    # The target can be observed after the current ot, continue to check the next ot with updated newObservationStart
-                    newObservationStart = ot.start + bufferTime
-                    continue
-                else:
+            freeObservationStart = blockedIntervals.getFirstFreeStart(newObservationStart)
+            if freeObservationStart != newObservationStart:
+                if freeObservationStart + bufferTime >= tw.end:
                     # Collision is inevitable, check the next time window
-                    solutionIsFeasible = False
-                    break
-
-            if solutionIsFeasible:
-                # Solution is feasible, add the observation task to the schedule
-                newOT = OT(
-                    generateTaskID(ttw.GT.id, newObservationStart),
-                    ttw.GT,
-                    newObservationStart,
-                    newObservationStart + schedulingParameters.captureDuration
-                )
-                otList.append(newOT)
-                break
+                    continue
+                # The target can be observed after the colliding observation tasks
+                newObservationStart = freeObservationStart
+
+            # Solution is feasible, add the observation task to the schedule
+            newOT = OT(
+                generateTaskID(ttw.GT.id, newObservationStart),
+                ttw.GT,
+                newObservationStart,
+                newObservationStart + schedulingParameters.captureDuration
+            )
+            otList.append(newOT)
+            blockedIntervals.addOT(newOT)
+            break
         
 
     # Check for duplicates
@@ -1,57 +1,241 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+import json
+import os
+import threading
+
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 
+MET_FORECAST_URL = "https://api.met.no/weatherapi/locationforecast/2.0/compact"
 
-def getForecast(lat: float, lon: float) -> dict:
-    """ Get the forecast for a specific location
 
-    :param lat: Latitude of the location
-    :param lon: Longitude of the location
-    :return: Forecast data as a dict
+@dataclass
+class CachedForecast:
+    data: dict
+    issueTime: datetime  # Time the forecast was issued, from the meta data of the forecast
+    expires: datetime
+    lastModified: str = None
+
+
+class ForecastFetcher:
+    """ Fetches location forecasts from the MET API with a pooled session and a bounded number of concurrent requests.
+    Forecasts are cached per location, coordinates are rounded to 4 decimals as requested by the MET API terms.
+    A cached forecast is reused until its Expires time, after that it is revalidated with If-Modified-Since and only
+    replaced by a forecast with the same or a later issue time.
+    Set baseUrl to use a local stub server, or fixtureDirectory to read forecasts from files named "<lat>_<lon>.json".
     """
-    url = f"https://api.met.no/weatherapi/locationforecast/2.0/compact?lat={lat}&lon={lon}"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36'}
 
-    r = requests.get(url.strip(), headers=headers, timeout=10)
-    if r.status_code != 200:
-        raise print("Error: " + str(r.status_code))
+    def __init__(self, baseUrl: str = MET_FORECAST_URL, fixtureDirectory: str = None, maxWorkers: int = 8,
+                 timeout: float = 10):
+        """
+        :param baseUrl: URL of the compact location forecast endpoint
+        :param fixtureDirectory: Directory with forecast files, if given no requests are made
+        :param maxWorkers: Maximum number of concurrent requests
+        :param timeout: Timeout of a request in seconds
+        """
+        self.baseUrl = baseUrl
+        self.fixtureDirectory = fixtureDirectory
+        self.maxWorkers = maxWorkers
+        self.timeout = timeout
 
-    return r.json()
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=maxWorkers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
 
-def getCloudData(lat: float, lon: float, startTime, endTime) -> dict:
-    """ Get the cloud data for at target for every hour within the time horizon
+        self._cache: dict[tuple[float, float], CachedForecast] = {}
+        self._lock = threading.Lock()
 
-    :param lat: Latitude of the location
-    :param lon: Longitude of the location
-    :param start_time: Start time of the time horizon
-    :param end_time: End time of the time horizon
-
-    :return: Cloud data as a dict, 
-    to extract a given datetime object from the dict, write:
-            timeStr = '2025-02-13 09:00:00+00:00'
-            storeThisKey = datetime.datetime.fromisoformat(timeStr)
-            print(cloud_data[storeThisKey])
+    @staticmethod
+    def getLocationKey(lat: float, lon: float) -> tuple[float, float]:
+        return round(float(lat), 4), round(float(lon), 4)
+
+    def getForecast(self, lat: float, lon: float) -> dict:
+        """ Get the forecast for a specific location
+
+        :param lat: Latitude of the location
+        :param lon: Longitude of the location
+        :return: Forecast data as a dict
+        """
+        key = self.getLocationKey(lat, lon)
+        with self._lock:
+            cached = self._cache.get(key)
+        now = datetime.now(timezone.utc)
+        if cached is not None and cached.expires > now:
+            return cached.data
+
+        if self.fixtureDirectory is not None:
+            # Fixture forecasts do not change, so they are read once and never expire
+            with open(os.path.join(self.fixtureDirectory, f"{key[0]}_{key[1]}.json"), "r") as f:
+                data = json.load(f)
+            forecast = CachedForecast(data, self._getIssueTime(data), datetime.max.replace(tzinfo=timezone.utc))
+            with self._lock:
+                self._cache[key] = forecast
+            return data
+
+        # Only revalidate when there is a cached forecast to fall back on
+        headers = {}
+        if cached is not None and cached.lastModified is not None:
+            headers['If-Modified-Since'] = cached.lastModified
+        r = self._session.get(self.baseUrl, params={'lat': key[0], 'lon': key[1]}, headers=headers, timeout=self.timeout)
+        if r.status_code == 304 and cached is None:
+            # A 304 without a cached forecast has no data, e.g. from a proxy, so it is fetched again as a miss
+            r = self._session.get(self.baseUrl, params={'lat': key[0], 'lon': key[1]},
+                                  headers={'Cache-Control': 'no-cache'}, timeout=self.timeout)
+            if r.status_code == 304:
+                raise requests.HTTPError(f"Got 304 Not Modified for the uncached forecast of {key}", response=r)
+
+        if r.status_code == 304:
+            # The forecast has not been updated since it was cached
+            data = cached.data
+        else:
+            r.raise_for_status()
+            data = r.json()
+
+        forecast = CachedForecast(
+            data = data,
+            issueTime = self._getIssueTime(data),
+            expires = self._parseHttpDate(r.headers.get('Expires'), now),
+            lastModified = r.headers.get('Last-Modified', cached.lastModified if cached is not None else None)
+        )
+        if (cached is not None and cached.issueTime is not None and forecast.issueTime is not None
+                and forecast.issueTime < cached.issueTime):
+            # A response issued before the cached forecast does not replace it, only its expiry time is used
+            forecast.data, forecast.issueTime, forecast.lastModified = cached.data, cached.issueTime, cached.lastModified
+        with self._lock:
+            self._cache[key] = forecast
+        return forecast.data
+
+    def getForecasts(self, locations: list[tuple[float, float]]) -> list[dict]:
+        """ Get the forecasts for many locations concurrently
+
+        :param locations: List of (latitude, longitude) tuples
+        :return: List with the forecast data of each location, in the same order as the locations
+        """
+        uniqueKeys = list(dict.fromkeys(self.getLocationKey(lat, lon) for lat, lon in locations))
+        if len(uniqueKeys) <= 1 or self.maxWorkers <= 1:
+            forecasts = [self.getForecast(lat, lon) for lat, lon in uniqueKeys]
+        else:
+            with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+                forecasts = list(executor.map(lambda key: self.getForecast(*key), uniqueKeys))
+
+        forecastOfKey = dict(zip(uniqueKeys, forecasts))
+        return [forecastOfKey[self.getLocationKey(lat, lon)] for lat, lon in locations]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    @staticmethod
+    def _getIssueTime(data: dict) -> datetime:
+        """ Get the time the forecast was issued, None if the forecast has no valid issue time """
+        issueTime = data.get("properties", {}).get("meta", {}).get("updated_at")
+        try:
+            return datetime.fromisoformat(issueTime.replace('Z', '+00:00'))
+        except (AttributeError, ValueError):
+            return None
+
+    @staticmethod
+    def _parseHttpDate(value: str, default: datetime) -> datetime:
+        """ Parse the date of an http header, a missing or invalid date gives the default """
+        if value is None:
+            return default
+        try:
+            return parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return default
+
+
+@dataclass
+class CloudSeries:
+    """ Cloud area fraction of a forecast tile, one element per forecast time """
+    unixTimes: np.ndarray
+    cloudAreaFractions: np.ndarray
+
+    def getNearest(self, unixTimes, startTime: datetime = None, endTime: datetime = None) -> np.ndarray:
+        """ Get the cloud area fraction of the forecast time closest to each of the given times.
+        Only forecast times within startTime and endTime are used, if two forecast times are equally close the
+        earliest is used.
+
+        :param unixTimes: Times to look up as seconds since 1970-01-01
+        :return: Array of cloud area fractions, empty if no forecast time is within the time horizon
+        """
+        forecastTimes, fractions = self.unixTimes, self.cloudAreaFractions
+        if startTime is not None and endTime is not None:
+            inHorizon = (forecastTimes >= startTime.timestamp()) & (forecastTimes <= endTime.timestamp())
+            forecastTimes, fractions = forecastTimes[inHorizon], fractions[inHorizon]
+        if len(forecastTimes) == 0:
+            return np.empty(0)
+
+        times = np.asarray(unixTimes, dtype=float)
+        after = np.clip(np.searchsorted(forecastTimes, times, side='left'), 0, len(forecastTimes) - 1)
+        before = np.clip(after - 1, 0, len(forecastTimes) - 1)
+        useAfter = np.abs(forecastTimes[after] - times) < np.abs(times - forecastTimes[before])
+        return np.where(useAfter, fractions[after], fractions[before])
+
+
+class CloudTileLayer:
+    """ Shares forecasts between nearby targets by snapping the targets to a grid of forecast tiles.
+    The MET forecasts for the nordic area come from a model with a 2.5 km grid, so targets within the same tile get
+    the same forecast. Every tile is fetched once, and its cloud cover is stored as a NumPy array indexed by hour.
     """
 
-    data = getForecast(lat,lon)
-    # Navigate to the timeseries data
-    timeseries = data["properties"]["timeseries"]
+    def __init__(self, resolution: float = 0.025, fetcher: ForecastFetcher = None):
+        """
+        :param resolution: Size of a tile in degrees of latitude and longitude
+        :param fetcher: Fetcher used to get the forecasts, defaults to the module fetcher set with setForecastFetcher
+        """
+        self.resolution = resolution
+        self.fetcher = fetcher
+
+    def getTileKey(self, lat: float, lon: float) -> tuple[float, float]:
+        """ Get the center of the tile the location is in """
+        return (round(round(float(lat) / self.resolution) * self.resolution, 4),
+                round(round(float(lon) / self.resolution) * self.resolution, 4))
 
-    # Dictionary to store time and cloud area fraction
-    cloudData = {}
+    def getCloudSeries(self, locations: list[tuple[float, float]]) -> list[CloudSeries]:
+        """ Get the cloud series of the tile of each location, each tile is only fetched once
 
-    # Process the timeseries data
-    for entry in timeseries:
-        time_str = entry["time"]  # Extract the timestamp as a string
-        time = datetime.fromisoformat(time_str.replace('Z', '+00:00'))  # Convert to datetime object
-        cloudAreaFraction = entry["data"]["instant"]["details"]["cloud_area_fraction"]
-        
-        # Extract the data within start_time and end_time
-        if time <= endTime and time >= startTime:
-            # Store the extracted details in the dictionary
-            cloudData[time] = cloudAreaFraction
+        :param locations: List of (latitude, longitude) tuples
+        :return: List with the cloud series of each location, in the same order as the locations
+        """
+        fetcher = self.fetcher if self.fetcher is not None else forecastFetcher
+        tileKeys = [self.getTileKey(lat, lon) for lat, lon in locations]
+        uniqueTileKeys = list(dict.fromkeys(tileKeys))
+        forecasts = fetcher.getForecasts(uniqueTileKeys)
 
-    return cloudData
+        seriesOfTile = {key: self.createCloudSeries(data) for key, data in zip(uniqueTileKeys, forecasts)}
+        return [seriesOfTile[key] for key in tileKeys]
 
+    @staticmethod
+    def createCloudSeries(data: dict) -> CloudSeries:
+        timeseries = data["properties"]["timeseries"]
+        unixTimes = np.array([datetime.fromisoformat(entry["time"].replace('Z', '+00:00')).timestamp()
+                              for entry in timeseries], dtype=float)
+        fractions = np.array([entry["data"]["instant"]["details"]["cloud_area_fraction"]
+                              for entry in timeseries], dtype=float)
+        order = np.argsort(unixTimes, kind='stable')
+        return CloudSeries(unixTimes[order], fractions[order])
 
+
+# Fetcher used by getForecast and CloudTileLayer, replace with setForecastFetcher to use another source
+forecastFetcher = ForecastFetcher()
+
+def setForecastFetcher(fetcher: ForecastFetcher):
+    """ Set the fetcher used to get the forecasts, e.g. one that reads from a fixture directory """
+    global forecastFetcher
+    forecastFetcher = fetcher
+
+def getForecast(lat: float, lon: float) -> dict:
+    """ Get the forecast for a specific location
+
+    :param lat: Latitude of the location
+    :param lon: Longitude of the location
+    :return: Forecast data as a dict
+    """
+    return forecastFetcher.getForecast(lat, lon)
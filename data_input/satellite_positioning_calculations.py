@@ -1,17 +1,36 @@
 import skyfield.api as skf
 from skyfield import almanac
+from skyfield.framelib import itrs
+from skyfield.sgp4lib import theta_GMST1982
 import datetime 
 import os
+from enum import Enum
+import numpy as np
 import requests
 
+# Skyfield timescale and planetary ephemeris shared by all calculations in this process
 ts = skf.load.timescale()
+_ephemeris = None
+
+def getEphemeris():
+    """ Get the de421 planetary ephemeris, the file is only loaded the first time it is requested """
+    global _ephemeris
+    if _ephemeris is None:
+        _ephemeris = skf.load('de421.bsp')
+    return _ephemeris
+
+class PassBackend(Enum):
+    SKYFIELD = 1  # Root search with EarthSatellite.find_events for each target
+    BATCHED = 2  # One propagation of the satellite on a coarse grid for all targets, see findSatelliteTargetPassesBatch
+
+# Parsed satellite objects, keyed by (HYPSO number, modification time of the TLE file)
+satelliteRegistry: dict[tuple[int, float], skf.EarthSatellite] = {}
 
 def updateTLE (HYPSOnr: int):
     url = f'https://celestrak.com/NORAD/elements/gp.php?NAME=HYPSO-{HYPSOnr}&FORMAT=TLE'
-    filename = os.path.join(os.path.dirname(__file__), f"HYPSO_data/HYPSO-{HYPSOnr}_TLE.txt")
+    filename = getTLEFilePath(HYPSOnr)
 
-    skf_hypso = skf.load.tle_file(url, filename=filename, reload=False)[0]
-    ts = skf.load.timescale()
+    skf_hypso = createSatelliteObject(HYPSOnr)
     TLE_age = ts.now().utc_datetime() - skf_hypso.epoch.utc_datetime()
 
     TLE_age_hours = TLE_age.days*24 + TLE_age.seconds/3600.0
@@ -27,34 +46,70 @@ def updateTLE (HYPSOnr: int):
                 print('TLE update successful\n')
         except:
             print('Error. TLE Update not successful')
+        finally:
+            # The cached satellite object might be based on the old TLE
+            clearSatelliteRegistry(HYPSOnr)
     else:
         # print(f'Skipping TLE update, current TLE is only {TLE_age_hours:7.4f} hours old')
         return
 
+def getTLEFilePath(HYPSOnr: int) -> str:
+    """ Get the path of the file where the TLE of the given HYPSO satellite is stored """
+    return os.path.join(os.path.dirname(__file__), f"HYPSO_data/HYPSO-{HYPSOnr}_TLE.txt")
+
+def clearSatelliteRegistry(HYPSOnr: int = None):
+    """ Remove the cached satellite objects of the given HYPSO satellite, or of all satellites if HYPSOnr is None """
+    for key in list(satelliteRegistry.keys()):
+        if HYPSOnr is None or key[0] == HYPSOnr:
+            del satelliteRegistry[key]
+
 def createSatelliteObject(HYPSOnr: int) -> skf.EarthSatellite:
     """ Create a satellite object for a given HYPSO satellite number
+    The TLE file is only parsed the first time a satellite is requested, after that the object is served from
+    satelliteRegistry until the TLE file is modified.
     Input: 
     - 1 for HYPSO 1
     - 2 for HYPSO 2
     """
 
+    if HYPSOnr != 1 and HYPSOnr != 2:
+        raise ValueError("The HYPSO number is not valid")
+
     # HYPSO 1 data
     hypsoTleUrl = f'https://celestrak.com/NORAD/elements/gp.php?NAME=HYPSO-{HYPSOnr}&FORMAT=TLE'
-    hypsoTlePath = os.path.join(os.path.dirname(__file__), f"HYPSO_data/HYPSO-{HYPSOnr}_TLE.txt")
+    hypsoTlePath = getTLEFilePath(HYPSOnr)
 
-    if HYPSOnr == 1 or HYPSOnr == 2:
-        # The skyfield API function to create an "EarthSatellite" object.
-        skfH1 = skf.load.tle_file(hypsoTleUrl, filename=hypsoTlePath, reload=False)[0]
-        return skfH1
-    else:
-        raise ValueError("The HYPSO number is not valid")
+    # The modification time of the TLE file identifies the version of the TLE that is cached
+    tleModifiedTime = os.path.getmtime(hypsoTlePath) if os.path.exists(hypsoTlePath) else None
+    skfSat = satelliteRegistry.get((HYPSOnr, tleModifiedTime))
+    if skfSat is not None:
+        return skfSat
+
+    # The skyfield API function to create an "EarthSatellite" object.
+    skfSat = skf.load.tle_file(hypsoTleUrl, filename=hypsoTlePath, reload=False)[0]
+
+    # Replace any outdated object of this satellite in the registry
+    clearSatelliteRegistry(HYPSOnr)
+    satelliteRegistry[(HYPSOnr, os.path.getmtime(hypsoTlePath))] = skfSat
+    return skfSat
+
+def getTLEEpoch(HYPSOnr: int) -> float:
+    """ Get the epoch of the TLE currently used for the given HYPSO satellite
+    Output:
+    - Epoch as Julian date
+    """
+    skfSat = createSatelliteObject(HYPSOnr)
+    return float(skfSat.model.jdsatepoch + skfSat.model.jdsatepochF)
     
 
-def findSatelliteTargetPasses(targetLat: float, targetLong: float, targetElevation: float, startTime: datetime.datetime, endTime: datetime.datetime, hypsoNr: int) -> list:
+def findSatelliteTargetPasses(targetLat: float, targetLong: float, targetElevation: float, startTime: datetime.datetime, endTime: datetime.datetime, hypsoNr: int,
+                              backend: PassBackend = PassBackend.SKYFIELD) -> list:
     """ Find the passes of a satellite over a target location within a given time window
     Output:
     - List of tuples: (datetime, 'rise'/'culminate'/'set')
     """
+    if backend == PassBackend.BATCHED:
+        return findSatelliteTargetPassesBatch([targetLat], [targetLong], [targetElevation], startTime, endTime, hypsoNr)[0]
     
     # Create a skyfield "EarthSatellite" object..
     skfSat = createSatelliteObject(hypsoNr)
@@ -63,7 +118,6 @@ def findSatelliteTargetPasses(targetLat: float, targetLong: float, targetElevati
     target_location = skf.wgs84.latlon(targetLat * skf.N, targetLong * skf.E, 100.0)
 
     # Timestamps also require a skyfield type
-    ts = skf.load.timescale()
     t0 = ts.utc(startTime.year, startTime.month, startTime.day, startTime.hour, startTime.minute, startTime.second)
     t1 = ts.utc(endTime.year, endTime.month, endTime.day, endTime.hour, endTime.minute, endTime.second)
 
@@ -100,16 +154,239 @@ def findSatelliteTargetElevation(targetLat: float, targetLong: float, time: date
 
     return elevation.degrees
 
+def findSatelliteTargetElevations(targetLats, targetLongs, unixTimes, hypsoNr: int) -> np.ndarray:
+    """ Find the elevation of the satellite at many target locations and times in one vectorized evaluation.
+    Element i of the output is the elevation seen from (targetLats[i], targetLongs[i]) at unixTimes[i].
+    Input:
+    - targetLats, targetLongs: latitudes and longitudes of the targets in degrees
+    - unixTimes: UTC times as seconds since 1970-01-01
+    Output:
+    - Array of elevations in degrees
+    """
+    lats, longs, times = np.broadcast_arrays(np.asarray(targetLats, dtype=float),
+                                             np.asarray(targetLongs, dtype=float),
+                                             np.asarray(unixTimes, dtype=float))
+    if times.size == 0:
+        return np.empty(0)
+
+    satellitePositions = getSatellitePositions(times, hypsoNr)
+    targetPositions, normals = getTargetPositions(lats, longs)
+
+    # The elevation is the angle between the line of sight and the local horizontal plane,
+    # which is perpendicular to the geodetic normal at the target
+    lineOfSight = satellitePositions - targetPositions
+    sinElevation = np.sum(lineOfSight * normals, axis=0) / np.linalg.norm(lineOfSight, axis=0)
+
+    return np.degrees(np.arcsin(np.clip(sinElevation, -1.0, 1.0)))
+
+def findSatelliteTargetElevationMatrix(targetLats, targetLongs, unixTimes, hypsoNr: int) -> np.ndarray:
+    """ Find the elevation of the satellite at every target location for every time.
+    The satellite is only propagated once for each time, and all targets are evaluated with matrix products.
+    Output:
+    - Array with shape (number of targets, number of times) of elevations in degrees
+    """
+    satellitePositions = getSatellitePositions(np.asarray(unixTimes, dtype=float), hypsoNr)
+    targetPositions, normals = getTargetPositions(np.asarray(targetLats, dtype=float), np.asarray(targetLongs, dtype=float))
+
+    # Line of sight from target i to the satellite at time j is s_j - p_i
+    heightAboveHorizon = normals.T @ satellitePositions - np.sum(normals * targetPositions, axis=0)[:, None]
+    distanceSquared = (np.sum(satellitePositions ** 2, axis=0)[None, :]
+                       - 2 * targetPositions.T @ satellitePositions
+                       + np.sum(targetPositions ** 2, axis=0)[:, None])
+    sinElevation = heightAboveHorizon / np.sqrt(distanceSquared)
+
+    return np.degrees(np.arcsin(np.clip(sinElevation, -1.0, 1.0)))
+
+def getSatellitePositions(unixTimes: np.ndarray, hypsoNr: int) -> np.ndarray:
+    """ Propagate the satellite to all times at once
+    The SGP4 positions are rotated directly from the TEME frame to the earth fixed frame with the sidereal time,
+    this avoids evaluating the nutation model for each time.
+    Output:
+    - Array with shape (3, number of times) of positions in the earth fixed ITRS frame in km
+    """
+    skfSat = createSatelliteObject(hypsoNr)
+    shape = np.shape(unixTimes)
+
+    # Unix time has no leap seconds, so the day number and the seconds into the day are given separately
+    days, secondsOfDay = np.divmod(np.ravel(unixTimes), 86400)
+    t = ts.utc(1970, 1, 1 + days, 0, 0, secondsOfDay)
+
+    # SGP4 expects the time as UTC julian date
+    _, positionsTEME, _ = skfSat.model.sgp4_array(2440587.5 + days, secondsOfDay / 86400)
+    theta, _ = theta_GMST1982(t.whole, t.ut1_fraction)
+    cosTheta, sinTheta = np.cos(theta), np.sin(theta)
+    positions = np.array([cosTheta * positionsTEME[:, 0] + sinTheta * positionsTEME[:, 1],
+                          -sinTheta * positionsTEME[:, 0] + cosTheta * positionsTEME[:, 1],
+                          positionsTEME[:, 2]])
+    return positions.reshape((3,) + shape)
+
+def getTargetPositions(lats: np.ndarray, longs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Get the positions of the targets in the earth fixed ITRS frame
+    Output:
+    - Array with shape (3, number of targets) of positions in km
+    - Array with shape (3, number of targets) of unit vectors along the geodetic normal at each target
+    """
+    # Same target height as findSatelliteTargetElevation
+    targetPositions = skf.wgs84.latlon(lats, longs, 100.0).itrs_xyz.km
+
+    latRad = np.radians(lats)
+    longRad = np.radians(longs)
+    normals = np.array([np.cos(latRad) * np.cos(longRad), np.cos(latRad) * np.sin(longRad), np.sin(latRad)])
+    return targetPositions, normals
+
+def findSatelliteTargetPassesBatch(targetLats, targetLongs, targetElevations, startTime: datetime.datetime,
+                                   endTime: datetime.datetime, hypsoNr: int, step: float = 10.0) -> list:
+    """ Find the passes of a satellite over many targets within a given time window.
+    The elevation of all targets is evaluated on a coarse time grid, and the culminations and the crossings of the
+    minimum elevation are only refined where the grid shows a pass. The events match the events of
+    findSatelliteTargetPasses within a fraction of a second.
+    Input:
+    - targetLats, targetLongs: latitudes and longitudes of the targets in degrees
+    - targetElevations: minimum elevation of each target in degrees
+    - step: time between the samples of the coarse grid in seconds
+    Output:
+    - List with a list of tuples (datetime, 'rise'/'culminate'/'set') for each target
+    """
+    lats = np.asarray(targetLats, dtype=float)
+    longs = np.asarray(targetLongs, dtype=float)
+    minElevations = np.asarray(targetElevations, dtype=float)
+    passes = [[] for _ in range(len(lats))]
+    if len(lats) == 0:
+        return passes
+
+    # Coarse grid including the end of the time window
+    startUnix = startTime.timestamp() if startTime.tzinfo is not None else startTime.replace(tzinfo=datetime.timezone.utc).timestamp()
+    endUnix = endTime.timestamp() if endTime.tzinfo is not None else endTime.replace(tzinfo=datetime.timezone.utc).timestamp()
+    gridTimes = np.append(np.arange(startUnix, endUnix, step), endUnix)
+    elevations = findSatelliteTargetElevationMatrix(lats, longs, gridTimes, hypsoNr)
+
+    # Interior local maxima of the grid that might reach the minimum elevation. Close to the zenith the elevation
+    # changes by up to about 1 degree per second, so the peak can be that much higher than the grid samples
+    isPeak = (elevations[:, 1:-1] > elevations[:, :-2]) & (elevations[:, 1:-1] >= elevations[:, 2:])
+    isCandidate = isPeak & (elevations[:, 1:-1] >= minElevations[:, None] - step * 1.0)
+    targetIndices, peakIndices = np.nonzero(isCandidate)
+    peakIndices = peakIndices + 1
+    if len(targetIndices) == 0:
+        return passes
+
+    # Refine the culminations with a golden section search between the neighbouring grid points
+    peakTimes, peakElevations = _findMaxima(lats[targetIndices], longs[targetIndices],
+                                            gridTimes[peakIndices - 1], gridTimes[peakIndices + 1], hypsoNr)
+    keep = peakElevations >= minElevations[targetIndices]
+    targetIndices, peakIndices, peakTimes = targetIndices[keep], peakIndices[keep], peakTimes[keep]
+
+    # The rise is between the last grid point below the minimum elevation before the culmination and the culmination,
+    # and the set between the culmination and the next grid point below the minimum elevation
+    below = elevations < minElevations[:, None]
+    gridIndex = np.arange(len(gridTimes))
+    lastBelow = np.maximum.accumulate(np.where(below, gridIndex, -1), axis=1)
+    nextBelow = np.minimum.accumulate(np.where(below, gridIndex, len(gridTimes))[:, ::-1], axis=1)[:, ::-1]
+    leftIndices = np.searchsorted(gridTimes, peakTimes, side='right') - 1
+    riseIndices = lastBelow[targetIndices, leftIndices]
+    setIndices = nextBelow[targetIndices, np.minimum(leftIndices + 1, len(gridTimes) - 1)]
+
+    # Two culminations without setting in between share the same rise and set
+    hasRise = riseIndices >= 0
+    riseKeys = np.unique(np.stack([targetIndices[hasRise], riseIndices[hasRise]]), axis=1)
+    hasSet = setIndices < len(gridTimes)
+    setKeys = np.unique(np.stack([targetIndices[hasSet], setIndices[hasSet]]), axis=1)
+
+    riseTimes = _findCrossings(lats[riseKeys[0]], longs[riseKeys[0]], minElevations[riseKeys[0]],
+                               gridTimes[riseKeys[1]], _getPeakTimeAfter(riseKeys, targetIndices, riseIndices, peakTimes),
+                               hypsoNr)
+    setTimes = _findCrossings(lats[setKeys[0]], longs[setKeys[0]], minElevations[setKeys[0]],
+                              gridTimes[setKeys[1]], _getPeakTimeAfter(setKeys, targetIndices, setIndices, peakTimes),
+                              hypsoNr)
+
+    events = ([(i, t, 0) for i, t in zip(riseKeys[0], riseTimes)]
+              + [(i, t, 1) for i, t in zip(targetIndices, peakTimes)]
+              + [(i, t, 2) for i, t in zip(setKeys[0], setTimes)])
+    for i, t, event in sorted(events, key=lambda e: (e[1], e[2])):
+        name = ('rise', 'culminate', 'set')[event]
+        passes[i].append((datetime.datetime.fromtimestamp(float(t), tz=datetime.timezone.utc), name))
+
+    return passes
+
+def _getPeakTimeAfter(keys: np.ndarray, targetIndices: np.ndarray, crossingIndices: np.ndarray,
+                      peakTimes: np.ndarray) -> np.ndarray:
+    """ Get a culmination time for each (target, grid index) key, used as the other end of the crossing bracket """
+    peakTimeOfKey = {}
+    for key in zip(targetIndices.tolist(), crossingIndices.tolist(), peakTimes.tolist()):
+        peakTimeOfKey.setdefault(key[:2], key[2])
+    return np.array([peakTimeOfKey[key] for key in zip(keys[0].tolist(), keys[1].tolist())])
+
+def _findMaxima(lats: np.ndarray, longs: np.ndarray, lowerTimes: np.ndarray, upperTimes: np.ndarray,
+                hypsoNr: int, tolerance: float = 1e-3) -> tuple[np.ndarray, np.ndarray]:
+    """ Golden section search for the maximum elevation of each target between the lower and upper times """
+    invPhi = (np.sqrt(5) - 1) / 2
+    a, b = lowerTimes.astype(float), upperTimes.astype(float)
+    c = b - invPhi * (b - a)
+    d = a + invPhi * (b - a)
+    elevationC = findSatelliteTargetElevations(lats, longs, c, hypsoNr)
+    elevationD = findSatelliteTargetElevations(lats, longs, d, hypsoNr)
+    while np.max(b - a) > tolerance:
+        moveUpper = elevationC > elevationD
+        b = np.where(moveUpper, d, b)
+        a = np.where(moveUpper, a, c)
+        # One of the two inner points is reused, the other one is evaluated
+        newC = np.where(moveUpper, b - invPhi * (b - a), d)
+        newD = np.where(moveUpper, c, a + invPhi * (b - a))
+        newTimes = np.where(moveUpper, newC, newD)
+        newElevations = findSatelliteTargetElevations(lats, longs, newTimes, hypsoNr)
+        elevationC, elevationD = (np.where(moveUpper, newElevations, elevationD),
+                                  np.where(moveUpper, elevationC, newElevations))
+        c, d = newC, newD
+    peakTimes = (a + b) / 2
+    return peakTimes, findSatelliteTargetElevations(lats, longs, peakTimes, hypsoNr)
+
+def _findCrossings(lats: np.ndarray, longs: np.ndarray, minElevations: np.ndarray, belowTimes: np.ndarray,
+                   aboveTimes: np.ndarray, hypsoNr: int, tolerance: float = 1e-3) -> np.ndarray:
+    """ Bisection for the time each target crosses its minimum elevation, between a time below and a time above """
+    below, above = belowTimes.astype(float), aboveTimes.astype(float)
+    if len(below) == 0:
+        return below
+    while np.max(np.abs(above - below)) > tolerance:
+        middle = (below + above) / 2
+        isBelow = findSatelliteTargetElevations(lats, longs, middle, hypsoNr) < minElevations
+        below = np.where(isBelow, middle, below)
+        above = np.where(isBelow, above, middle)
+    return (below + above) / 2
+
+def findSunElevations(targetLats, targetLongs, unixTimes) -> np.ndarray:
+    """ Find the apparent elevation of the center of the sun at many target locations and times in one vectorized evaluation.
+    Element i of the output is the elevation seen from (targetLats[i], targetLongs[i]) at unixTimes[i].
+    Output:
+    - Array of elevations in degrees
+    """
+    lats, longs, times = np.broadcast_arrays(np.asarray(targetLats, dtype=float),
+                                             np.asarray(targetLongs, dtype=float),
+                                             np.asarray(unixTimes, dtype=float))
+    if times.size == 0:
+        return np.empty(0)
+
+    eph = getEphemeris()
+    days, secondsOfDay = np.divmod(times, 86400)
+    t = ts.utc(1970, 1, 1 + days, 0, 0, secondsOfDay)
+
+    # Apparent position of the sun seen from the center of the earth, in the earth fixed frame
+    sunPositions = eph['earth'].at(t).observe(eph['sun']).apparent().frame_xyz(itrs).km
+
+    # Targets at sea level, as in findIllumminationPeriods
+    targetPositions = skf.wgs84.latlon(lats, longs).itrs_xyz.km
+    _, normals = getTargetPositions(lats, longs)
+    lineOfSight = sunPositions - targetPositions
+    sinElevation = np.sum(lineOfSight * normals, axis=0) / np.linalg.norm(lineOfSight, axis=0)
+
+    return np.degrees(np.arcsin(np.clip(sinElevation, -1.0, 1.0)))
+
 def findIllumminationPeriods(targetLat: float, targetLong: float, startTime: datetime.datetime, endTime: datetime.datetime) -> list:
     """ Find the periods where the target is illuminated by the sun within the timeinterval of startTime and endTime
     Output:
     - List of tuples (sunsetStartTime, sunsetEndTime)
     """
 
-    # Load skyfield timescale 
-    ts = skf.load.timescale()
-    # Load planetary ephemeris
-    eph = skf.load('de421.bsp')   
+    # Planetary ephemeris
+    eph = getEphemeris()
     # Define the location of the target
     location = skf.wgs84.latlon(targetLat, targetLong)
 
@@ -1,4 +1,5 @@
 import datetime
+import warnings
 import data_postprocessing.algorithmData_api as algDataApi
 
 from pathlib import Path
@@ -144,6 +145,11 @@ def createCmdLinesForCaptureAndBuffering(observationSchedule: list, bufferSchedu
     downlinkschedule_dtSorted = sorted(downlinkschedule_dt, key=lambda x: x.start, reverse = True)
     combinedSchedule = algDataApi.CombineCaptureAndBufferSchedules(schedule_dt, bufferschedule_dt)
 
+    # The task IDs can only be recreated from the command lines when the OH starts at a whole second and the capture
+    # duration is even, see generateTaskID
+    captureDuration = int(inputParameters.captureDuration)
+    checkTaskIDs = oh.utcStart.microsecond == 0 and captureDuration % 2 == 0
+
     cmdLines = []
     scheduledOTs = {} 
     for task, taskType in combinedSchedule:
@@ -153,12 +159,33 @@ def createCmdLinesForCaptureAndBuffering(observationSchedule: list, bufferSchedu
             newCaptureCommandLine = createCaptureCmdLine(task, int(inputParameters.hypsoNr), quaternions)
             cmdLines.append(newCaptureCommandLine)
             scheduledOTs[task.taskID] = [quaternions, task]  # Store quaternions and task for buffer use
+            if checkTaskIDs and not taskIDRoundTrips(task, newCaptureCommandLine, oh, captureDuration):
+                warnings.warn(
+                    f"Task ID {task.taskID} of {task.GT.id} can not be recreated from its command line",
+                    UserWarning,
+                    stacklevel=2
+                )
         elif taskType == "Buffer":
             quaternions, ot = scheduledOTs.get(task.OTTaskID)
             downlinkTask = next((dt for dt in downlinkschedule_dtSorted if dt.OTTaskID == task.OTTaskID), None)
             newBufferCommandLine = createBufferCmdLine(task, downlinkTask, ot, int(inputParameters.hypsoNr), quaternions)
             cmdLines.append(newBufferCommandLine)
     return cmdLines
+def taskIDRoundTrips(observationTask_dt: OT, captureCmdLine: str, oh: OH, captureDurationSec: int = 60) -> bool:
+    """ Check if the task ID of an observation task is recreated when its capture command line is parsed.
+    Observation tasks that have been shifted keep the ID of their original start time, these are not checked.
+    The check only holds when the OH starts at a whole second and the capture duration is even.
+    Output:
+    - False if the ID generated from the command line differs from the ID of the task, True otherwise
+    """
+    relativeStart = (observationTask_dt.start - oh.utcStart).total_seconds()
+    if observationTask_dt.taskID != generateTaskID(observationTask_dt.GT.id, relativeStart):
+        # The ID is not based on the current start time of the task
+        return True
+
+    cmdDict = getCmdDictFromCmdLine(captureCmdLine)
+    parsedRelativeStart = getRelativeCaptureStart(int(cmdDict['-u']), oh, captureDurationSec)
+    return generateTaskID(cmdDict['-n'], parsedRelativeStart) == observationTask_dt.taskID
 def createCmdFile(txtFilepath, cmdLines):
     """ Each element in the cmdLines list is written to the txt file as a command line """
 
@@ -180,25 +207,7 @@ def getScheduleFromCmdLine(targetFilePath: str,cmdLine: str, oh: OH, bufferDurat
     - observationTask: OT object created from the command line
     - commandType: 'Capture', 'Buffer' or 'Unknown'
     """
-    cmds = cmdLine.split(" ")
-    cmds = [cmd for cmd in cmds if cmd != '']
-
-    cmdDict = {}
-    for i, cmd in enumerate(cmds[:-1]):
-
-        cmdNext = cmds[i+1]
-        
-        # If cmd is a flag it starts with "-"
-        if cmd.startswith("-"):
-
-            if cmdNext.startswith("-"):
-                try:
-                    float(cmdNext)
-                except ValueError:
-                    # If the next command is not a number, skip it
-                    continue
-
-            cmdDict[cmd] = cmdNext
+    cmdDict = getCmdDictFromCmdLine(cmdLine)
     
     # Recreate target data object to find objectiveValue
     targetIdPriorityDict = getTargetIdPriorityDictFromJson(targetFilePath)
@@ -213,9 +222,8 @@ def getScheduleFromCmdLine(targetFilePath: str,cmdLine: str, oh: OH, bufferDurat
         )
     if '--capture' in cmdDict:
         # convert start and end time to relative time
-        startDateTime = algDataApi.convertFromUnixTime(int(cmdDict['-u'])) - timedelta(seconds=captureDurationSec//2)
         endDateTime = algDataApi.convertFromUnixTime(int(cmdDict['-u'])) + timedelta(seconds=captureDurationSec//2)
-        relativeStart = int((startDateTime - oh.utcStart).total_seconds())
+        relativeStart = getRelativeCaptureStart(int(cmdDict['-u']), oh, captureDurationSec)
         relativeEnd = int((endDateTime - oh.utcStart).total_seconds())
 
         
@@ -229,8 +237,7 @@ def getScheduleFromCmdLine(targetFilePath: str,cmdLine: str, oh: OH, bufferDurat
     elif '--buffer' in cmdDict:
         startDateTime = datetime.datetime.fromisoformat(cmdDict['-t'].replace('Z', '+00:00')) - timedelta(seconds=bufferDurationSec//2)
         endDateTime = datetime.datetime.fromisoformat(cmdDict['-t'].replace('Z', '+00:00')) + timedelta(seconds=bufferDurationSec//2)
-        startDateTimeOT = algDataApi.convertFromUnixTime(int(cmdDict['-u'])) - timedelta(seconds=captureDurationSec//2)
-        relativeStartOT = int((startDateTimeOT - oh.utcStart).total_seconds())
+        relativeStartOT = getRelativeCaptureStart(int(cmdDict['-u']), oh, captureDurationSec)
 
         relativeStart = int((startDateTime - oh.utcStart).total_seconds())
         relativeEnd = int((endDateTime - oh.utcStart).total_seconds())
@@ -244,6 +251,34 @@ def getScheduleFromCmdLine(targetFilePath: str,cmdLine: str, oh: OH, bufferDurat
     else:
         raise Exception("Unknown command type in command line")
 
+def getCmdDictFromCmdLine(cmdLine: str) -> dict:
+    """ Split a command line into a dictionary with the flags as keys and the values following the flags as values """
+    cmds = cmdLine.split(" ")
+    cmds = [cmd for cmd in cmds if cmd != '']
+
+    cmdDict = {}
+    for i, cmd in enumerate(cmds[:-1]):
+
+        cmdNext = cmds[i+1]
+        
+        # If cmd is a flag it starts with "-"
+        if cmd.startswith("-"):
+
+            if cmdNext.startswith("-"):
+                try:
+                    float(cmdNext)
+                except ValueError:
+                    # If the next command is not a number, skip it
+                    continue
+
+            cmdDict[cmd] = cmdNext
+    return cmdDict
+def getRelativeCaptureStart(captureTimeUnix: int, oh: OH, captureDurationSec: int = 60) -> int:
+    """ Get the start of a capture in whole seconds relative to the start of the OH, from the unix time of the middle
+    of the capture in a command line
+    """
+    startDateTime = algDataApi.convertFromUnixTime(captureTimeUnix) - timedelta(seconds=captureDurationSec//2)
+    return int((startDateTime - oh.utcStart).total_seconds())
 def recreateOTListFromCmdFile(targetFilePath: str, cmdFilePath: str, oh: OH, bufferDurationSec: int, captureDurationSec: int = 60):
     """ Reads a command file and recreates the list of OT objects from the command lines
     Output:
@@ -8,6 +8,8 @@ import math as m
 import skyfield.api as skf
 from scipy import linalg
 
+from data_input.satellite_positioning_calculations import ts
+
 
 def quaternion_from_axisangle(axis, angle):
     '''
@@ -142,7 +144,7 @@ def get_pointing_quat(location_skf, sat_skf, scandir, timestamp_skf):
 
 
 def generate_quaternions(skf_satellite: skf.EarthSatellite, timestamp: datetime, lat: float, lon: float, ele: float, forward_tilt=False, backwards_tilt=False):
-    tc = skf.load.timescale().from_datetime(timestamp)
+    tc = ts.from_datetime(timestamp)
     loc_skf = skf.wgs84.latlon(lat * skf.N, lon * skf.E, ele)
 
     #satpos_skf = skf_satellite.at(tc)
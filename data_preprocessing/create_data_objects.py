@@ -1,5 +1,5 @@
 import csv
-from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone, timedelta
 import os
 
@@ -8,34 +8,52 @@ from dotenv import load_dotenv
 import requests
 from requests.auth import HTTPBasicAuth
 
-from data_input.extract_cloud_data import getCloudData
-from data_input.satellite_positioning_calculations import findSatelliteTargetPasses, findIllumminationPeriods, updateTLE
+from data_input.extract_cloud_data import CloudTileLayer
+from data_input.satellite_positioning_calculations import findSatelliteTargetPasses, findSatelliteTargetPassesBatch, findSunElevations, updateTLE, PassBackend, getTLEFilePath
 from data_postprocessing.algorithmData_api import getTTWListFromFile, saveTTWListInJsonFile
-from scheduling_model import OH, GT, TW, TTW, GSTW, GS
+from scheduling_model import OH, GT, TW, TTW, GSTW, GS, TTW_toDict, dict_toTTW, GSTW_toDict, dict_toGSTW
 from data_preprocessing.parseTargetsFile import getTargetDataFromJsonFile
+from data_preprocessing.elevation_table import ElevationTableIndex, elevationTableIndex
+from data_preprocessing.input_cache import getCacheKey, readFileBytes, getCachedList, saveCachedList
    
 
 def getAllTargetPasses(captureTimeSeconds: int, startTimeOH: datetime, endTimeOH: datetime, targetsFilePath: str,
-                       hypsoNr: int) -> list:
+                       hypsoNr: int, workers: int = 1, backend: PassBackend = PassBackend.SKYFIELD) -> list:
     """ Get the TTW for each time the satellite passes the every requested target
+    With the SKYFIELD backend the passes of the targets are independent, if workers > 1 they are calculated in a
+    process pool. The result is the same as for a serial calculation, the targets are kept in the order of the
+    target request file. The BATCHED backend calculates the passes of all targets at once and ignores workers.
     Output:
     - allTargetPasses: list of TTWs for each target in the target request file
     """
 
     # Read data from targets.json into the array targets
     allTargetPasses = []
+    targetIds = set()
     targetData = getTargetDataFromJsonFile(targetsFilePath)
 
+    # Find the time windows when satellite is passing the targets. Each element in pass is a tuple : [utc_time, type('rise', 'culiminate', 'set')]
+    passArguments = [(float(target.lat), float(target.lon), float(target.elev), startTimeOH, endTimeOH, hypsoNr)
+                     for target in targetData]
+    if backend == PassBackend.BATCHED:
+        allPasses = findSatelliteTargetPassesBatch([target.lat for target in targetData], [target.lon for target in targetData],
+                                                   [target.elev for target in targetData], startTimeOH, endTimeOH, hypsoNr)
+    elif workers > 1 and len(passArguments) > 1:
+        chunkSize = max(1, len(passArguments) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            allPasses = list(executor.map(findSatelliteTargetPasses, *zip(*passArguments), chunksize=chunkSize))
+    else:
+        allPasses = [findSatelliteTargetPasses(*arguments) for arguments in passArguments]
+
     #Loop through the targets and calculate earliest start time and latest start time for capturing
-    for index, target in enumerate(targetData):
+    for index, (target, passes) in enumerate(zip(targetData, allPasses)):
 
         targetId = target.name.rstrip()
         latitude = target.lat
         longitude = target.lon
-        elevation = target.elev
 
         # Verify that the target is not already in list of targets
-        if targetId in [t['groundTarget'].id for t in allTargetPasses]:
+        if targetId in targetIds:
             print(f"Target id {targetId} is duplicated in target request list, only first entry is used")
             continue
 
@@ -43,9 +61,6 @@ def getAllTargetPasses(captureTimeSeconds: int, startTimeOH: datetime, endTimeOH
         priority = len(targetData) - index
         #target.append(priority)
 
-        # Find the time windows when satellite is passing the targets. Each element in pass is a tuple : [utc_time, type('rise', 'culiminate', 'set')]
-        passes = findSatelliteTargetPasses(float(latitude), float(longitude), float(elevation), startTimeOH, endTimeOH, hypsoNr)
-
         # Skip iteration if no passes are found
         if not passes:
             continue
@@ -101,48 +116,47 @@ def getAllTargetPasses(captureTimeSeconds: int, startTimeOH: datetime, endTimeOH
         targetPass['endTimes'] = endTimes
 
         allTargetPasses.append(targetPass)
+        targetIds.add(targetId)
 
     return allTargetPasses
 
 def removeNonIlluminatedPasses(allTargetPasses: list, startTimeOH: datetime, endTimeOH: datetime)-> list:
     """ Remove time windows where the target is not illuminated by the sun
+    The elevation of the sun at the start of every time window of all targets is found in one vectorized calculation.
     Output:
     - targetPassesWithIllumination: list of TTWs that have sufficient illumination
     """
-    targetPassesWithIllumination = []    
-    
+    # Same definition of sunrise and sunset as skyfield.almanac.sunrise_sunset
+    minSunElevation = -0.8333
+
+    lats, longs, unixTimes = [], [], []
     for targetPass in allTargetPasses:
         gt = targetPass['groundTarget']
-        latitude = float(gt.lat)
-        longitude = float(gt.long)
-        startTimes = targetPass['startTimes'].copy()
-
-        illuminatedPeriods = findIllumminationPeriods(float(latitude), float(longitude), startTimeOH, endTimeOH)
-
-        for st in startTimes:
-            # Loop through all TWs of the target
-            illuminated = False
-            
-            # Check that the TW is within an illuminated period
-            for sunRise, sunSet in illuminatedPeriods:
-                if sunRise <= st <= sunSet:
-                    # This TW is illuminated, go next TW
-                    illuminated = True
-                    break
-
-            if not illuminated:
-                # TW is not illuminated, remove it
-                index = targetPass['startTimes'].index(st)
-                targetPass['startTimes'].pop(index)
-                targetPass['endTimes'].pop(index)
-
-        if len(targetPass['startTimes']) > 0:        
+        for st in targetPass['startTimes']:
+            lats.append(float(gt.lat))
+            longs.append(float(gt.long))
+            unixTimes.append(st.timestamp())
+    illuminated = findSunElevations(lats, longs, unixTimes) >= minSunElevation
+
+    targetPassesWithIllumination = []
+    index = 0
+    for targetPass in allTargetPasses:
+        twCount = len(targetPass['startTimes'])
+        keep = illuminated[index:index + twCount]
+        index += twCount
+
+        # Remove the TWs that are not illuminated
+        targetPass['startTimes'] = [st for st, k in zip(targetPass['startTimes'], keep) if k]
+        targetPass['endTimes'] = [et for et, k in zip(targetPass['endTimes'], keep) if k]
+
+        if len(targetPass['startTimes']) > 0:
             targetPassesWithIllumination.append(targetPass)
 
     return targetPassesWithIllumination
   
 def createGSTWList(startTimeOH: datetime, endTimeOH: datetime, minWindowLength: float,
-                                hypsoNr: int, groundStationsFilePath: str = None, commInterface: str = "xband") -> list[GSTW]:
+                                hypsoNr: int, groundStationsFilePath: str = None, commInterface: str = "xband",
+                                useCache: bool = True, cacheDirectory: str = None) -> list[GSTW]:
     """
     Get the time windows when the satellite passes over one of the ground stations.
 
@@ -153,6 +167,8 @@ def createGSTWList(startTimeOH: datetime, endTimeOH: datetime, minWindowLength:
         groundStationsFilePath (str): Path to the ground stations file.
         hypsoNr (int): HYPSO satellite number.
         commInterface (str): Type of communication that is used with ground station.
+        useCache (bool): Reuse ground station passes calculated earlier with the same inputs. Booked passes are never cached.
+        cacheDirectory (str): Directory of the cache, defaults to data_input/cache.
 
     Returns:
         list[GSTW]: List of ground stations and their time windows.
@@ -165,7 +181,8 @@ def createGSTWList(startTimeOH: datetime, endTimeOH: datetime, minWindowLength:
 
         return getBookedGSTWList(startTimeOH, endTimeOH, hypsoNr, commInterface)
 
-    return createGSTWListFromFile(startTimeOH, endTimeOH, minWindowLength, hypsoNr, groundStationsFilePath)
+    return createGSTWListFromFile(startTimeOH, endTimeOH, minWindowLength, hypsoNr, groundStationsFilePath,
+                                  useCache, cacheDirectory)
 
 
 def getBookedGSTWList(startTimeOH: datetime, endTimeOH: datetime, hypsoNr: int, commInterface: str = "xband") -> list[GSTW]:
@@ -205,16 +222,25 @@ def getBookedGSTWList(startTimeOH: datetime, endTimeOH: datetime, hypsoNr: int,
     return gstwList
 
 def createGSTWListFromFile(startTimeOH: datetime, endTimeOH: datetime, minWindowLength: float,
-                                hypsoNr: int, groundStationsFilePath: str = None) -> list[GSTW]:
+                                hypsoNr: int, groundStationsFilePath: str = None,
+                                useCache: bool = True, cacheDirectory: str = None) -> list[GSTW]:
     """
     Get the passes over the ground stations defined in the ground station file.
     Determine the time windows of the passes using orbital information.
+    If useCache is True, the result is reused when the TLE, ground station file, OH and window length are unchanged.
     """
 
     # If no file path is provided, use default path
     if groundStationsFilePath is None:
         groundStationsFilePath = os.path.join(os.path.dirname(__file__), "../data_input/HYPSO_data/ground_stations.csv")
 
+    if useCache:
+        cacheKey = getCacheKey(readFileBytes(getTLEFilePath(hypsoNr)), readFileBytes(groundStationsFilePath),
+                               startTimeOH.isoformat(), endTimeOH.isoformat(), minWindowLength, hypsoNr)
+        gstwList = getCachedList("gstw", cacheKey, dict_toGSTW, cacheDirectory)
+        if gstwList is not None:
+            return gstwList
+
     # Read data from the provided csv
     try:
         with open(groundStationsFilePath, mode='r') as file:
@@ -265,6 +291,9 @@ def createGSTWListFromFile(startTimeOH: datetime, endTimeOH: datetime, minWindow
     if len(gstwList) == 0:
         raise ValueError("No ground station passes found")
 
+    if useCache:
+        saveCachedList("gstw", cacheKey, gstwList, GSTW_toDict, cacheDirectory)
+
     return gstwList
 
 def removeCloudObscuredPasses(allTargetPasses: list, startTimeOH: datetime, endTimeOH: datetime)-> list:
@@ -275,43 +304,24 @@ def removeCloudObscuredPasses(allTargetPasses: list, startTimeOH: datetime, endT
 
     targetPassesWithoutClouds = []
 
-    for targetPass in allTargetPasses:
+    # Get the cloud data for all targets in the given OH, targets in the same forecast tile share the forecast
+    locations = [(float(targetPass['groundTarget'].lat), float(targetPass['groundTarget'].long)) for targetPass in allTargetPasses]
+    allCloudSeries = CloudTileLayer().getCloudSeries(locations)
 
-        gt = targetPass['groundTarget']
+    for targetPass, cloudSeries in zip(allTargetPasses, allCloudSeries):
 
-        latitude = float(gt.lat)
-        longitude = float(gt.long)
-        startTimes = targetPass['startTimes'].copy()
-        maxCloudCoverage = gt.cloudCoverage
+        gt = targetPass['groundTarget']
+        maxCloudCoverage = float(gt.cloudCoverage)
 
-        # Get the cloud data for the target in the given OH
-        cloudData = getCloudData(latitude, longitude, startTimeOH, endTimeOH)
-        assert cloudData is not None
-        if len(cloudData) == 0:
+        # Find the closest cloud data prediction for every time the target is passed
+        cloudCoverages = cloudSeries.getNearest([st.timestamp() for st in targetPass['startTimes']], startTimeOH, endTimeOH)
+        if len(cloudCoverages) == 0:
             targetPassesWithoutClouds.append(targetPass)
             continue
 
-        predictionTimes = sorted(cloudData.keys())
-        # Loop over timestamps when target is passed and find the closest cloud data prediction
-        for startTime in startTimes:
-            # Find the closest prediction time to the start time of the target pass
-            pos = bisect_left(predictionTimes, startTime)
-            if pos == 0:
-                closestTime = predictionTimes[0]
-            elif pos == len(predictionTimes):
-                closestTime = predictionTimes[-1]
-            else:
-                before = predictionTimes[pos - 1]
-                after = predictionTimes[pos]
-                if abs((after - startTime).total_seconds()) < abs((startTime - before).total_seconds()):
-                    closestTime = after
-                else:
-                    closestTime = before
-
-            if cloudData[closestTime] > float(maxCloudCoverage):
-                index = targetPass['startTimes'].index(startTime)
-                targetPass['startTimes'].pop(index)
-                targetPass['endTimes'].pop(index)
+        keep = cloudCoverages <= maxCloudCoverage
+        targetPass['startTimes'] = [st for st, k in zip(targetPass['startTimes'], keep) if k]
+        targetPass['endTimes'] = [et for et, k in zip(targetPass['endTimes'], keep) if k]
 
         # If target has observation windows left, add it to the list of targets without clouds
         if len(targetPass['startTimes']) > 0:
@@ -336,7 +346,9 @@ def createOH(startTimeOH: datetime, ohDurationInDays: int) -> OH:
     return oh
 
 
-def createTTWList(captureDuration: int, oh: OH, hypsoNr: int, ttwFilePathRead: str = None, ttwFilePathWrite: str = None) -> list:
+def createTTWList(captureDuration: int, oh: OH, hypsoNr: int, ttwFilePathRead: str = None, ttwFilePathWrite: str = None,
+                  workers: int = 1, passBackend: PassBackend = PassBackend.SKYFIELD,
+                  useCache: bool = True, cacheDirectory: str = None) -> list:
     """ Calculate the satellite passes and store in data objects defined in scheduling_model.py
 
     Args:
@@ -345,6 +357,10 @@ def createTTWList(captureDuration: int, oh: OH, hypsoNr: int, ttwFilePathRead: s
         hypsoNr (int): HYPSO satellite number.
         ttwFilePathRead (str, optional): File path to read pre-calculated TTW data. If provided, TTW data will be read from this file instead of being calculated. Defaults to None.
         ttwFilePathWrite (str, optional): File path to write calculated TTW data. If provided, calculated TTW data will be saved to this file. Defaults to None.
+        workers (int, optional): Number of processes used to calculate the target passes. Defaults to 1.
+        passBackend (PassBackend, optional): Method used to find the target passes. Defaults to PassBackend.SKYFIELD.
+        useCache (bool, optional): Reuse the illuminated passes calculated earlier with the same TLE, targets, OH and capture duration. The cloud filter is always applied with the latest forecast. The elevation tables of the time windows are cached in the same way. Defaults to True.
+        cacheDirectory (str, optional): Directory of the cache. Defaults to data_input/cache.
 
     Returns:
         tuple: A tuple containing two elements:
@@ -356,6 +372,11 @@ def createTTWList(captureDuration: int, oh: OH, hypsoNr: int, ttwFilePathRead: s
     if ttwFilePathRead is not None:
         ttwList = getTTWListFromFile(ttwFilePathRead)
         if ttwList is not None:
+            cacheKey = None
+            if useCache:
+                cacheKey = getCacheKey(readFileBytes(getTLEFilePath(hypsoNr)), readFileBytes(ttwFilePathRead),
+                                       oh.utcStart.isoformat(), hypsoNr)
+            addElevationTables(ttwList, oh, hypsoNr, cacheKey, cacheDirectory)
             return ttwList
         else:
             print("Error reading TTW data from file, calculating TTW data instead")
@@ -366,21 +387,71 @@ def createTTWList(captureDuration: int, oh: OH, hypsoNr: int, ttwFilePathRead: s
     # Path to the file containing the ground targets data
     targetsFilePath = os.path.join(os.path.dirname(__file__),"../data_input/HYPSO_data/targets.json")
 
-    # Get the target passes
-    allTargetPasses = getAllTargetPasses(captureDuration, oh.utcStart, oh.utcEnd, targetsFilePath, hypsoNr)
-    print(f"Without filtering, targets: {len(allTargetPasses)}, captures: {howManyPasses(allTargetPasses)}")
-    
-    # Filter out night passes that are not illuminated by the sun
-    illuminatedPasses = removeNonIlluminatedPasses(allTargetPasses, oh.utcStart, oh.utcEnd)
-    print(f"After filtering out non-illuminated passes, targets: {len(illuminatedPasses)}, captures: {howManyPasses(illuminatedPasses)}")
+    illuminatedPasses = None
+    cacheKey = None
+    if useCache:
+        # The passes are cached before the cloud filter, which depends on the latest forecast and is always applied
+        cacheKey = getCacheKey(readFileBytes(getTLEFilePath(hypsoNr)), readFileBytes(targetsFilePath),
+                               oh.utcStart.isoformat(), oh.utcEnd.isoformat(), captureDuration, hypsoNr,
+                               ["illumination"], passBackend.name)
+        illuminatedTTWList = getCachedList("illuminated_ttw", cacheKey, dict_toTTW, cacheDirectory)
+        if illuminatedTTWList is not None:
+            illuminatedPasses = ttwListToTargetPasses(illuminatedTTWList, oh)
+
+    if illuminatedPasses is None:
+        # Get the target passes
+        allTargetPasses = getAllTargetPasses(captureDuration, oh.utcStart, oh.utcEnd, targetsFilePath, hypsoNr, workers, passBackend)
+        print(f"Without filtering, targets: {len(allTargetPasses)}, captures: {howManyPasses(allTargetPasses)}")
+
+        # Filter out night passes that are not illuminated by the sun
+        illuminatedPasses = removeNonIlluminatedPasses(allTargetPasses, oh.utcStart, oh.utcEnd)
+        print(f"After filtering out non-illuminated passes, targets: {len(illuminatedPasses)}, captures: {howManyPasses(illuminatedPasses)}")
+
+        if useCache:
+            saveCachedList("illuminated_ttw", cacheKey, targetPassesToTTWList(illuminatedPasses, oh), TTW_toDict,
+                           cacheDirectory)
     
     # Filter out targets that are obscured by clouds
     cloudlessTargetpasses = removeCloudObscuredPasses(illuminatedPasses, oh.utcStart, oh.utcEnd)
     print(f"After filtering out cloud-obscured passes, targets: {len(cloudlessTargetpasses)}, captures: {howManyPasses(cloudlessTargetpasses)}")
 
     # Create objects from the ground targets data
+    ttwList = targetPassesToTTWList(cloudlessTargetpasses, oh)
+
+    if ttwFilePathWrite is not None:
+        saveTTWListInJsonFile(ttwFilePathWrite, ttwList)
+
+    addElevationTables(ttwList, oh, hypsoNr, cacheKey, cacheDirectory)
+
+    return ttwList
+
+def addElevationTables(ttwList: list[TTW], oh: OH, hypsoNr: int, cacheKey: str = None, cacheDirectory: str = None):
+    """ Sample the elevation over all time windows, used when calculating the image quality.
+    If a cache key is given, the tables are read from the cache first and only the time windows they do not cover
+    are sampled. The cache entry is updated when new windows have been sampled.
+    """
+    cachedEntries = None
+    if cacheKey is not None:
+        cachedEntries = getCachedList("elevation_tables", cacheKey, ElevationTableIndex.dictToEntry, cacheDirectory)
+        if cachedEntries is not None:
+            elevationTableIndex.addEntries(cachedEntries)
+
+    sampledCount = elevationTableIndex.addTTWList(ttwList, oh, hypsoNr)
+
+    if cacheKey is not None and (cachedEntries is None or sampledCount > 0):
+        # Keep the cached tables of targets that are not in this list, e.g. because they are obscured by clouds now
+        entries = elevationTableIndex.getEntries(ttwList, hypsoNr)
+        keys = {key for key, _ in entries}
+        entries += [entry for entry in cachedEntries or [] if entry[0] not in keys]
+        saveCachedList("elevation_tables", cacheKey, entries, ElevationTableIndex.entryToDict, cacheDirectory)
+
+def targetPassesToTTWList(targetPasses: list, oh: OH) -> list[TTW]:
+    """ Create TTW objects from target passes, the times are converted to seconds relative to the start of the OH
+    Output:
+    - ttwList: list of TTW objects
+    """
     ttwList = []
-    for targetPass in cloudlessTargetpasses:
+    for targetPass in targetPasses:
         twList = []
 
         # Create List of Time Window objects
@@ -399,12 +470,19 @@ def createTTWList(captureDuration: int, oh: OH, hypsoNr: int, ttwFilePathRead: s
             TWs = twList
         )
         ttwList.append(ttw)
-
-    if ttwFilePathWrite is not None:
-        saveTTWListInJsonFile(ttwFilePathWrite, ttwList)
-
     return ttwList
 
+def ttwListToTargetPasses(ttwList: list[TTW], oh: OH) -> list:
+    """ Create target passes from TTW objects, the inverse of targetPassesToTTWList
+    Output:
+    - targetPasses: list of target pass dictionaries with datetime start and end times
+    """
+    return [{
+        'groundTarget': ttw.GT,
+        'startTimes': [oh.utcStart + timedelta(seconds=tw.start) for tw in ttw.TWs],
+        'endTimes': [oh.utcStart + timedelta(seconds=tw.end) for tw in ttw.TWs]
+    } for ttw in ttwList]
+
 def howManyPasses(targetPassList: list) -> tuple[int, int]:
     """ Return the total number of target passes in the OH """
     count = 0
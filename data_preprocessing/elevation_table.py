@@ -0,0 +1,263 @@
+import calendar
+import json
+import math
+import os
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from data_input.satellite_positioning_calculations import findSatelliteTargetElevations, getTLEEpoch
+from scheduling_model import OH, GT, TTW
+
+
+@dataclass
+class ElevationTable:
+    """ Elevation of the satellite seen from a ground target, sampled with a fixed time step.
+    Times are stored as unix time, so a table does not depend on the OH it was created for.
+    """
+    startUnixTime: float
+    step: float
+    elevations: np.ndarray
+
+    @property
+    def endUnixTime(self) -> float:
+        return self.startUnixTime + self.step * (len(self.elevations) - 1)
+
+    def covers(self, unixTime: float) -> bool:
+        return self.startUnixTime <= unixTime <= self.endUnixTime
+
+    def elevationAt(self, unixTime: float) -> float:
+        """ Linearly interpolated elevation in degrees at the given unix time """
+        position = (unixTime - self.startUnixTime) / self.step
+        index = min(max(int(position), 0), len(self.elevations) - 2)
+        if index < 0:
+            # Table with a single sample
+            return float(self.elevations[0])
+        fraction = position - index
+        return float(self.elevations[index] + (self.elevations[index + 1] - self.elevations[index]) * fraction)
+
+
+@dataclass
+class CacheStats:
+    """ Counters of the elevation table lookups """
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class ElevationTableIndex:
+    """ Side index of elevation tables, keyed by satellite and ground target.
+    Tables are created for the full span of every time window in createTTWList, so the image quality of an observation
+    task can be found by interpolation instead of propagating the satellite orbit. The elevation at a time that is
+    not covered by a table, e.g. of an observation task recreated from a command file, is calculated directly.
+    Tables are never created during a lookup.
+    All tables are sampled at whole multiples of the step in unix time, so the elevation at a time is the same no
+    matter which table covers it or in which order the tables were created.
+
+    The tables are namespaced by the epoch of the TLE they were calculated with, so a TLE update never serves
+    stale elevations. The epoch is read once in addTTWList and used for the lookups until the next addTTWList of the
+    satellite. The number of ground targets with tables is bounded, the least recently used ground target
+    is evicted first.
+    """
+
+    def __init__(self, step: float = 1.0, maxTargets: int = 5000):
+        """
+        Args:
+            step (float): Time between two elevation samples in seconds.
+            maxTargets (int): Maximum number of (satellite, TLE epoch, ground target) entries kept in memory.
+        """
+        self.step = step
+        self.maxTargets = maxTargets
+        self.stats = CacheStats()
+        self._tables: OrderedDict[tuple, list[ElevationTable]] = OrderedDict()
+        self._tleEpochs: dict[int, float] = {}
+
+    @staticmethod
+    def getKey(gt: GT, hypsoNr: int, tleEpoch: float) -> tuple:
+        return hypsoNr, tleEpoch, gt.id, float(gt.lat), float(gt.long)
+
+    def addTTWList(self, ttwList: list[TTW], oh: OH, hypsoNr: int) -> int:
+        """ Sample the elevation of every time window in the list, all windows are sampled in one batch
+        Output:
+        - Number of windows that were not covered by a table yet and have been sampled
+        """
+        ohStartUnix = getUnixTimeOH(oh)
+        tleEpoch = getTLEEpoch(hypsoNr)
+        self._tleEpochs[hypsoNr] = tleEpoch
+        windows = []
+        for ttw in ttwList:
+            key = self.getKey(ttw.GT, hypsoNr, tleEpoch)
+            for tw in ttw.TWs:
+                windows.append((key, ohStartUnix + tw.start, ohStartUnix + tw.end))
+        sampledCount = self._sampleWindows(windows, hypsoNr)
+        self._evict()
+        return sampledCount
+
+    def getElevations(self, gtList: list[GT], unixTimes, hypsoNr: int) -> np.ndarray:
+        """ Get the elevation of the satellite seen from each ground target at the corresponding unix time.
+        Times within the time windows added with addTTWList are interpolated from the tables, other times are
+        calculated directly.
+        Output:
+        - Array of elevations in degrees
+        """
+        if len(gtList) != len(unixTimes):
+            raise ValueError(f"Got {len(gtList)} ground targets but {len(unixTimes)} times")
+
+        elevations = np.empty(len(gtList))
+        missing = []
+        tleEpoch = self._tleEpochs.get(hypsoNr)
+        if tleEpoch is None:
+            # No tables have been added for this satellite
+            missing = list(range(len(gtList)))
+        else:
+            for i, (gt, unixTime) in enumerate(zip(gtList, unixTimes)):
+                table = self.findTable(self.getKey(gt, hypsoNr, tleEpoch), unixTime)
+                if table is None:
+                    missing.append(i)
+                else:
+                    elevations[i] = table.elevationAt(unixTime)
+        self.stats.hits += len(gtList) - len(missing)
+        self.stats.misses += len(missing)
+
+        if missing:
+            elevations[missing] = findSatelliteTargetElevations([float(gtList[i].lat) for i in missing],
+                                                                [float(gtList[i].long) for i in missing],
+                                                                np.array([unixTimes[i] for i in missing], dtype=float),
+                                                                hypsoNr)
+        return elevations
+
+    def findTable(self, key: tuple, unixTime: float) -> ElevationTable | None:
+        """ Find a table of the given key that covers the unix time, tables are sorted by start time """
+        tables = self._tables.get(key)
+        if not tables:
+            return None
+        self._tables.move_to_end(key)
+        index = bisect_right(tables, unixTime, key=lambda table: table.startUnixTime) - 1
+        # Tables can overlap, so also check the earlier tables
+        for table in reversed(tables[:index + 1]):
+            if table.covers(unixTime):
+                return table
+        return None
+
+    def clear(self):
+        self._tables.clear()
+        self._tleEpochs.clear()
+        self.stats = CacheStats()
+
+    def getEntries(self, ttwList: list[TTW], hypsoNr: int) -> list[tuple[tuple, list[ElevationTable]]]:
+        """ Get the tables of the ground targets in the list as (key, tables) entries, used to cache the tables """
+        tleEpoch = self._tleEpochs.get(hypsoNr)
+        if tleEpoch is None:
+            return []
+        keys = dict.fromkeys(self.getKey(ttw.GT, hypsoNr, tleEpoch) for ttw in ttwList)
+        return [(key, self._tables[key]) for key in keys if key in self._tables]
+
+    def addEntries(self, entries: list[tuple[tuple, list[ElevationTable]]]):
+        """ Add (key, tables) entries, e.g. read from the cache, tables of outdated TLEs are added but never looked up """
+        for key, tables in entries:
+            self._tables[key] = sorted(tables, key=lambda t: t.startUnixTime)
+            self._tables.move_to_end(key)
+        self._evict()
+
+    @staticmethod
+    def entryToDict(entry: tuple[tuple, list[ElevationTable]]) -> dict:
+        key, tables = entry
+        return {
+            "key": list(key),
+            "tables": [{
+                "startUnixTime": table.startUnixTime,
+                "step": table.step,
+                "elevations": np.round(table.elevations.astype(float), 4).tolist()
+            } for table in tables]
+        }
+
+    @staticmethod
+    def dictToEntry(entryDict: dict) -> tuple[tuple, list[ElevationTable]]:
+        tables = [ElevationTable(table["startUnixTime"], table["step"], np.array(table["elevations"], dtype=np.float32))
+                  for table in entryDict["tables"]]
+        return tuple(entryDict["key"]), tables
+
+    def save(self, filePath: str):
+        """ Save all elevation tables in a json file, so a later run can start with the tables loaded """
+        with open(filePath, "w") as f:
+            json.dump({"entries": [self.entryToDict(entry) for entry in self._tables.items()]}, f)
+
+    def load(self, filePath: str) -> bool:
+        """ Load elevation tables saved with save(), tables of outdated TLEs are loaded but never looked up
+        Output:
+        - True if the file was loaded, False if it does not exist or could not be read
+        """
+        if not os.path.exists(filePath):
+            return False
+        try:
+            with open(filePath, "r") as f:
+                data = json.load(f)
+            entries = [self.dictToEntry(entry) for entry in data["entries"]]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error reading elevation tables from {filePath}: {e}")
+            return False
+        self.addEntries(entries)
+        return True
+
+    def _sampleWindows(self, windows: list[tuple[tuple, float, float]], hypsoNr: int) -> int:
+        """ Create an elevation table for each window (key, start, end) that is not covered yet, returns the number
+        of tables created """
+        # Extend the windows to the sample grid, so all tables share the same sample times
+        windows = [(key, math.floor(start / self.step) * self.step, math.ceil(end / self.step) * self.step)
+                   for key, start, end in windows]
+        windows = [(key, start, end) for key, start, end in self._mergeWindows(windows)
+                   if not self._isCovered(key, start, end)]
+        if not windows:
+            return 0
+
+        # Concatenate the sample times of all windows, so the orbit is only propagated once
+        sampleCounts = [int(round((end - start) / self.step)) + 1 for _, start, end in windows]
+        lats = np.repeat([key[3] for key, _, _ in windows], sampleCounts)
+        longs = np.repeat([key[4] for key, _, _ in windows], sampleCounts)
+        unixTimes = np.concatenate([start + self.step * np.arange(count)
+                                    for (_, start, _), count in zip(windows, sampleCounts)])
+        elevations = findSatelliteTargetElevations(lats, longs, unixTimes, hypsoNr).astype(np.float32)
+
+        offset = 0
+        for (key, start, _), count in zip(windows, sampleCounts):
+            table = ElevationTable(start, self.step, elevations[offset:offset + count])
+            offset += count
+            tables = self._tables.setdefault(key, [])
+            tables.append(table)
+            tables.sort(key=lambda t: t.startUnixTime)
+            self._tables.move_to_end(key)
+        return len(windows)
+
+    def _evict(self):
+        """ Remove the least recently used ground targets until the size limit is met """
+        while len(self._tables) > self.maxTargets:
+            self._tables.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _isCovered(self, key: tuple, start: float, end: float) -> bool:
+        table = self.findTable(key, start)
+        return table is not None and table.covers(end)
+
+    @staticmethod
+    def _mergeWindows(windows: list[tuple[tuple, float, float]]) -> list[tuple[tuple, float, float]]:
+        """ Merge overlapping windows with the same key, so each pass is only sampled once """
+        merged = []
+        for key, start, end in sorted(windows, key=lambda w: (w[0], w[1])):
+            if merged and merged[-1][0] == key and start <= merged[-1][2]:
+                merged[-1] = (key, merged[-1][1], max(merged[-1][2], end))
+            else:
+                merged.append((key, start, end))
+        return merged
+
+
+def getUnixTimeOH(oh: OH) -> float:
+    """ Get the start of the OH as seconds since 1970-01-01 UTC, a naive start time is assumed to be in UTC """
+    if oh.utcStart.tzinfo is None:
+        return calendar.timegm(oh.utcStart.utctimetuple()) + oh.utcStart.microsecond / 1e6
+    return oh.utcStart.timestamp()
+
+
+# Elevation tables shared by all schedules in this process
+elevationTableIndex = ElevationTableIndex()
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+
+# Bump when the content of the cached lists changes, so old entries are not reused
+CACHE_FORMAT_VERSION = 1
+
+defaultCacheDirectory = os.path.join(os.path.dirname(__file__), "../data_input/cache")
+
+
+def getCacheKey(*inputs) -> str:
+    """ Hash all inputs that the cached data depends on into a key
+    Input:
+    - inputs: strings, bytes or json serializable values, e.g. the contents of the input files and the OH
+    Output:
+    - Hex digest that identifies the inputs
+    """
+    digest = hashlib.sha256(str(CACHE_FORMAT_VERSION).encode())
+    for value in inputs:
+        if isinstance(value, str):
+            value = value.encode()
+        elif not isinstance(value, bytes):
+            value = json.dumps(value, sort_keys=True, default=str).encode()
+        # Prefix each input with its length, so inputs cannot run into each other
+        digest.update(len(value).to_bytes(8, "little"))
+        digest.update(value)
+    return digest.hexdigest()
+
+
+def readFileBytes(filePath: str) -> bytes:
+    """ Read the content of an input file that is part of a cache key, a missing file gives an empty content """
+    if filePath is None or not os.path.exists(filePath):
+        return b""
+    with open(filePath, "rb") as file:
+        return file.read()
+
+
+def getCachedList(kind: str, key: str, fromDict, cacheDirectory: str = None) -> list | None:
+    """ Get a list of data objects from the cache
+    Input:
+    - kind: name of the type of data, e.g. "ttw"
+    - fromDict: function converting a dictionary back to a data object
+    Output:
+    - List of data objects, or None if the key is not in the cache
+    """
+    filePath = _getCacheFilePath(kind, key, cacheDirectory)
+    if not os.path.exists(filePath):
+        return None
+    try:
+        with open(filePath, "r") as file:
+            return [fromDict(element) for element in json.load(file)]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error reading cache entry {filePath}, it will be recalculated: {e}")
+        return None
+
+
+def saveCachedList(kind: str, key: str, items: list, toDict, cacheDirectory: str = None):
+    """ Save a list of data objects in the cache, the file is replaced atomically so readers never see a partial file """
+    filePath = _getCacheFilePath(kind, key, cacheDirectory)
+    os.makedirs(os.path.dirname(filePath), exist_ok=True)
+    temporaryFilePath = f"{filePath}.{os.getpid()}.tmp"
+    with open(temporaryFilePath, "w") as file:
+        json.dump([toDict(item) for item in items], file)
+    os.replace(temporaryFilePath, filePath)
+
+
+def _getCacheFilePath(kind: str, key: str, cacheDirectory: str = None) -> str:
+    if cacheDirectory is None:
+        cacheDirectory = defaultCacheDirectory
+    return os.path.join(cacheDirectory, f"{kind}_{key}.json")
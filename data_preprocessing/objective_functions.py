@@ -1,11 +1,9 @@
-import calendar
+import numpy as np
 
 from scheduling_model import  OH
-import datetime 
 
-from data_input.satellite_positioning_calculations import findSatelliteTargetElevation
-
-imageQualityDict = {}
+from data_input.satellite_positioning_calculations import findSatelliteTargetElevations
+from data_preprocessing.elevation_table import elevationTableIndex, getUnixTimeOH
 
 def objectiveFunctionPriority(otList: list) -> int:
     """ Calculates the sum of the priority objective for a list of observation tasks
@@ -19,66 +17,47 @@ def objectiveFunctionPriority(otList: list) -> int:
 
 def getIQFromOT(ot, oh: OH, hypsoNr: int) -> float:
     """ Given an OT, calculate the image quality based on the elevation of the satellite at capture time"""
-    
-    captureTimeMiddel = ot.start + (ot.end - ot.start) / 2
-    utcTime = oh.utcStart + datetime.timedelta(seconds=captureTimeMiddel)
-
 
+    captureTimeMiddel = ot.start + (ot.end - ot.start) / 2
+    unixTime = getUnixTimeOH(oh) + captureTimeMiddel
 
-    elevation = findSatelliteTargetElevation(float(ot.GT.lat), float(ot.GT.long), utcTime, hypsoNr)
+    elevation = float(findSatelliteTargetElevations([float(ot.GT.lat)], [float(ot.GT.long)], [unixTime], hypsoNr)[0])
 
     if elevation < 0:
         # This should not happen
-        print(f"Elevation value: {elevation} for {ot.GT.id} at {utcTime}")
+        print(f"Elevation value: {elevation} for {ot.GT.id} at unix time {unixTime}")
         elevation = 0
-    
+
     return elevation
 
+def getElevationsFromOTList(otList: list, oh: OH, hypsoNr: int) -> np.ndarray:
+    """ Get the elevation of the satellite at the middle of each observation task.
+    The elevations are interpolated from the elevation tables created for the time windows in createTTWList, the
+    elevations of tasks outside these time windows are calculated directly.
+    Output:
+    - Array with the elevation in degrees for each observation task, negative elevations are set to 0
+    """
+    ohStartUnix = getUnixTimeOH(oh)
+    unixTimes = [ohStartUnix + ot.start + (ot.end - ot.start) / 2 for ot in otList]
+    elevations = elevationTableIndex.getElevations([ot.GT for ot in otList], unixTimes, hypsoNr)
+
+    for ot, elevation in zip(otList, elevations):
+        if elevation < 0:
+            # This should not happen
+            print(f"Elevation value: {elevation} for {ot.GT.id} at {ot.start} seconds into the OH")
+
+    return np.maximum(elevations, 0)
+
 def objectiveFunctionImageQuality(otList:list, oh: OH, hypsoNr: int) -> float:
-    """ Objective function representing the angle between satellite and target when capturing 
-    Output: 
+    """ Objective function representing the angle between satellite and target when capturing
+    Output:
     - Image quality score (0 = min, 90 = max)
     """
-    elevationAverage = 0
     maxElevation = 90
 
     # For each observation task, calculate the image quality score based on the elevation of the satellite
-    for ot in otList:
-        captureTimeMiddel = ot.start + (ot.end - ot.start) / 2
-        utcTime = oh.utcStart + datetime.timedelta(seconds=captureTimeMiddel)
-        # Round the utcTime down to 10 seconds to estimate the elevation more efficiently
-        if utcTime.tzinfo is None:
-            unixTime = calendar.timegm(utcTime.utctimetuple()) + utcTime.microsecond / 1e6
-        else:
-            unixTime = utcTime.timestamp()
-        # round down to nearest 10 seconds deterministically
-        unixTimeRounded = (int(unixTime) // 10) * 10
-
-        # quantize latitude/longitude to 0.1 degrees, giving about 10 km resolution
-        latRounded = int(float(ot.GT.lat) * 10) / 10.0
-        longRounded = int(float(ot.GT.long) * 10) / 10.0
-
-        # Image quality key
-        iqKey = (latRounded, longRounded, unixTimeRounded, hypsoNr)
-
-        if iqKey not in imageQualityDict:
-            imageQualityDict[iqKey] = findSatelliteTargetElevation(
-                float(ot.GT.lat),
-                float(ot.GT.long),
-                utcTime,
-                hypsoNr
-            )
-
-        elevation = imageQualityDict[iqKey]
-
-        if elevation < 0:
-            # This should not happen
-            print(f"Elevation value: {elevation} for {ot.GT.id} at {utcTime}")
-            elevation = 0
-    
-        elevationAverage += elevation
+    elevationAverage = float(np.sum(getElevationsFromOTList(otList, oh, hypsoNr))) / len(otList)
 
-    elevationAverage = elevationAverage / len(otList)
     # Make sure the angle is within the limits of 0 to 90 degrees
     if elevationAverage < 0:
         elevationAverage = 0
@@ -8,6 +8,7 @@ from data_preprocessing.create_data_objects import createTTWList, createOH, crea
 from data_postprocessing.generate_cmdLine import createCmdFile, createCmdLinesForCaptureAndBuffering, recreateOTListFromCmdFile
 
 from transmission_scheduling.clean_schedule import cleanUpSchedule, OrderType
+from transmission_scheduling.gs_timeline import GSTimeline
 from transmission_scheduling.input_parameters import getTransmissionInputParams
 from transmission_scheduling.util import plotSchedule, plotCompareSchedule
 from data_input.utility_functions import InputParameters
@@ -15,96 +16,99 @@ from data_input.utility_functions import InputParameters
 
 
 
-### Create the image schedule ####
-
-inputParametersFilePath = os.path.join(os.path.dirname(__file__),"data_input/input_parameters.csv")
-ttwListFilePath = os.path.join(os.path.dirname(__file__),"data_input/HYPSO_data/ttw_list_2025_10_09_1600.json")
-
-inputParameters = InputParameters.from_csv(inputParametersFilePath)
-
-# # Check if start time is now
-if inputParameters.startTimeOH == "now":
-    inputParameters.startTimeOH = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-
-# Create model parameters
-schedulingParameters = SP(
-    int(inputParameters.maxCaptures),
-    int(inputParameters.captureDuration),
-    int(inputParameters.transitionTime),
-    int(inputParameters.hypsoNr))
-oh = createOH(datetime.datetime.fromisoformat(inputParameters.startTimeOH), int(inputParameters.durationInDaysOH))
-transmissionParameters = getTransmissionInputParams(inputParametersFilePath)
-
-# Create data Objects
-ttwList = createTTWList( int(inputParameters.captureDuration), oh, int(inputParameters.hypsoNr))
-gstwList = createGSTWList(oh.utcStart, oh.utcEnd, transmissionParameters.minGSWindowTime, int(inputParameters.hypsoNr))
-
-# Create observation schedule
-observationSchedule, bufferSchedule, downlinkSchedule, _, _, _, _ = runNSGA(
-    int(inputParameters.populationSize),
-    int(inputParameters.nsga2Runs),
-    ttwList,
-    gstwList,
-    schedulingParameters,
-    transmissionParameters,
-    oh, 
-    int(inputParameters.alnsRuns),
-    bool(inputParameters.isTabooBankFIFO),
-    bool(inputParameters.iqNonLinear),
-    int(inputParameters.desNumber),
-    int(inputParameters.maxTabBank)
-)
-
-bufferSchedule, downlinkSchedule = cleanUpSchedule(
-    observationSchedule,
-    bufferSchedule,
-    downlinkSchedule,
-    gstwList,
-    transmissionParameters,
-    OrderType.FIFO,
-    OrderType.FIFO
-)
-saveplotPathCompare = os.path.join(os.path.dirname(__file__), f"output/{inputParameters.testName}_schedule")
-plotSchedule(
-    observationSchedule,
-    bufferSchedule,
-    downlinkSchedule,
-    gstwList,
-    ttwList,
-    transmissionParameters,
-    savePlotPath=saveplotPathCompare
-)
-
-print(f"Priority objective value: {objectiveFunctionPriority(observationSchedule)}")
-print(f"Image quality objective value: {objectiveFunctionImageQuality(observationSchedule, oh, schedulingParameters.hypsoNr)}")
-
-### CREATE COMMAND LINES FOR SATELLITE CAPTURE AND BUFFERING ###
-
-cmdLines = createCmdLinesForCaptureAndBuffering(observationSchedule, bufferSchedule, downlinkSchedule, inputParameters, oh)
-outputFolderPath = os.path.join(os.path.dirname(__file__), f"output/")
-createCmdFile(f"{outputFolderPath}{inputParameters.testName}_cmdLines.txt", cmdLines)
-
-
-
-### COMPARE SCRIPTS ###
-pathScript = os.path.join(os.path.dirname(__file__), "output/cp_test.txt")
-pathTargetFile = os.path.join(os.path.dirname(__file__),"data_input/HYPSO_data/targets.json")
-otList = recreateOTListFromCmdFile(pathTargetFile, pathScript, oh, inputParameters.bufferingTime, inputParameters.captureDuration)
-for ot in otList:
-    print(f"Target ID: {ot.GT.id:10}, Start: {ot.start}")
-print(f"Total number of observation tasks: {len(otList)}")  
-for ot in observationSchedule:
-    print(f"Target ID: {ot.GT.id:10}, Start: {ot.start}")
-print(f"Total number of observation tasks: {len(observationSchedule)}")
-saveplotPathCompare = os.path.join(os.path.dirname(__file__), f"output/{inputParameters.testName}_compare_schedule")
-
-plotCompareSchedule(
-    otList,
-    observationSchedule,
-    bufferSchedule,
-    downlinkSchedule,
-    gstwList,
-    ttwList,
-    transmissionParameters,
-    savePlotPath=saveplotPathCompare
-)
\ No newline at end of file
+# The NSGA-II offsprings can be created in worker processes, these import this module again
+if __name__ == "__main__":
+    ### Create the image schedule ####
+
+    inputParametersFilePath = os.path.join(os.path.dirname(__file__),"data_input/input_parameters.csv")
+    ttwListFilePath = os.path.join(os.path.dirname(__file__),"data_input/HYPSO_data/ttw_list_2025_10_09_1600.json")
+
+    inputParameters = InputParameters.from_csv(inputParametersFilePath)
+
+    # # Check if start time is now
+    if inputParameters.startTimeOH == "now":
+        inputParameters.startTimeOH = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    # Create model parameters
+    schedulingParameters = SP(
+        int(inputParameters.maxCaptures),
+        int(inputParameters.captureDuration),
+        int(inputParameters.transitionTime),
+        int(inputParameters.hypsoNr))
+    oh = createOH(datetime.datetime.fromisoformat(inputParameters.startTimeOH), int(inputParameters.durationInDaysOH))
+    transmissionParameters = getTransmissionInputParams(inputParametersFilePath)
+
+    # Create data Objects
+    ttwList = createTTWList( int(inputParameters.captureDuration), oh, int(inputParameters.hypsoNr))
+    gstwList = createGSTWList(oh.utcStart, oh.utcEnd, transmissionParameters.minGSWindowTime, int(inputParameters.hypsoNr))
+    gsTimeline = GSTimeline(gstwList)
+
+    # Create observation schedule
+    observationSchedule, bufferSchedule, downlinkSchedule, _, _, _, _ = runNSGA(
+        int(inputParameters.populationSize),
+        int(inputParameters.nsga2Runs),
+        ttwList,
+        gsTimeline,
+        schedulingParameters,
+        transmissionParameters,
+        oh, 
+        int(inputParameters.alnsRuns),
+        bool(inputParameters.isTabooBankFIFO),
+        bool(inputParameters.iqNonLinear),
+        int(inputParameters.desNumber),
+        int(inputParameters.maxTabBank)
+    )
+
+    bufferSchedule, downlinkSchedule = cleanUpSchedule(
+        observationSchedule,
+        bufferSchedule,
+        downlinkSchedule,
+        gsTimeline,
+        transmissionParameters,
+        OrderType.FIFO,
+        OrderType.FIFO
+    )
+    saveplotPathCompare = os.path.join(os.path.dirname(__file__), f"output/{inputParameters.testName}_schedule")
+    plotSchedule(
+        observationSchedule,
+        bufferSchedule,
+        downlinkSchedule,
+        gstwList,
+        ttwList,
+        transmissionParameters,
+        savePlotPath=saveplotPathCompare
+    )
+
+    print(f"Priority objective value: {objectiveFunctionPriority(observationSchedule)}")
+    print(f"Image quality objective value: {objectiveFunctionImageQuality(observationSchedule, oh, schedulingParameters.hypsoNr)}")
+
+    ### CREATE COMMAND LINES FOR SATELLITE CAPTURE AND BUFFERING ###
+
+    cmdLines = createCmdLinesForCaptureAndBuffering(observationSchedule, bufferSchedule, downlinkSchedule, inputParameters, oh)
+    outputFolderPath = os.path.join(os.path.dirname(__file__), f"output/")
+    createCmdFile(f"{outputFolderPath}{inputParameters.testName}_cmdLines.txt", cmdLines)
+
+
+
+    ### COMPARE SCRIPTS ###
+    pathScript = os.path.join(os.path.dirname(__file__), "output/cp_test.txt")
+    pathTargetFile = os.path.join(os.path.dirname(__file__),"data_input/HYPSO_data/targets.json")
+    otList = recreateOTListFromCmdFile(pathTargetFile, pathScript, oh, inputParameters.bufferingTime, inputParameters.captureDuration)
+    for ot in otList:
+        print(f"Target ID: {ot.GT.id:10}, Start: {ot.start}")
+    print(f"Total number of observation tasks: {len(otList)}")  
+    for ot in observationSchedule:
+        print(f"Target ID: {ot.GT.id:10}, Start: {ot.start}")
+    print(f"Total number of observation tasks: {len(observationSchedule)}")
+    saveplotPathCompare = os.path.join(os.path.dirname(__file__), f"output/{inputParameters.testName}_compare_schedule")
+
+    plotCompareSchedule(
+        otList,
+        observationSchedule,
+        bufferSchedule,
+        downlinkSchedule,
+        gstwList,
+        ttwList,
+        transmissionParameters,
+        savePlotPath=saveplotPathCompare
+    )
\ No newline at end of file
@@ -1,4 +1,9 @@
 from collections import namedtuple
+from collections.abc import Sequence
+import hashlib
+import math
+
+import numpy as np
 """
 namedtuple is immutable, meaning that once it is created, it cannot be changed
 dataclass could be used if flexibility is needed
@@ -150,10 +155,20 @@ def dict_toDT(dt_dict):
     return DT(OTTaskID=dt_dict['OTTaskID'], GS=gs, start=dt_dict['start'], end=dt_dict['end'])
 
 
+# Key of the task ID digest, changing it changes all task IDs
+TASK_ID_KEY = b"HYPSO task ID v1"
+
 def generateTaskID(gtName: str, startTime: float) -> int:
     """
     Generate a unique task ID for observation tasks based on the ground target name and start time.
-    ID is generated using hash, so the same gtName and startTime will always produce the same ID.
+    ID is generated using a keyed digest, so the same gtName and startTime will always produce the same ID,
+    also in other processes and in later runs.
+    The start time is rounded down to whole seconds, which is the resolution of the command lines,
+    so the ID of a task can be generated again from its command line. This has some limits:
+    - Tasks of the same target that start within the same second get the same ID. Observations of a target in one
+      schedule can not overlap, so this only happens when IDs of different schedules are compared.
+    - The command lines hold the unix time of the middle of a capture in whole seconds, so the start is only
+      recreated when the OH starts at a whole second and the capture duration is an even number of seconds.
 
     Args:
         gtName (str): The name of the ground target.
@@ -162,5 +177,156 @@ def generateTaskID(gtName: str, startTime: float) -> int:
     Returns:
         int: A unique task ID of 15 digits long.
     """
+    digest = hashlib.blake2b(f"{gtName}\x00{math.floor(startTime)}".encode(), digest_size=8, key=TASK_ID_KEY)
+    return int.from_bytes(digest.digest(), "big") % 10**14 + 10**14
+
+
+class TargetTable:
+    """
+    Table of the ground targets and ground stations of a problem, so tasks can refer to them by an int index
+    instead of holding the namedtuples. A target or ground station is added the first time it is looked up.
+    """
+
+    def __init__(self, gtList: list[GT] = (), gsList: list[GS] = ()):
+        self.gtList: list[GT] = []
+        self.gsList: list[GS] = []
+        self._gtIndices: dict[GT, int] = {}
+        self._gsIndices: dict[GS, int] = {}
+        for gt in gtList:
+            self.getGTIndex(gt)
+        for gs in gsList:
+            self.getGSIndex(gs)
+
+    @classmethod
+    def fromTTWList(cls, ttwList: list[TTW], gstwList: list[GSTW] = ()) -> "TargetTable":
+        return cls([ttw.GT for ttw in ttwList], [gstw.GS for gstw in gstwList])
+
+    def getGTIndex(self, gt: GT) -> int:
+        index = self._gtIndices.get(gt)
+        if index is None:
+            index = len(self.gtList)
+            self._gtIndices[gt] = index
+            self.gtList.append(gt)
+        return index
+
+    def getGSIndex(self, gs: GS) -> int:
+        index = self._gsIndices.get(gs)
+        if index is None:
+            index = len(self.gsList)
+            self._gsIndices[gs] = index
+            self.gsList.append(gs)
+        return index
+
+    @property
+    def priorities(self) -> np.ndarray:
+        return np.array([gt.priority for gt in self.gtList], dtype=float)
+
+
+class TaskView(Sequence):
+    """
+    Read only sequence of the tasks of one kind in a ScheduleArrays, the namedtuples are created when they are accessed.
+    The view can be passed to the existing functions that read a list of tasks.
+    """
+
+    def __init__(self, length: int, createTask):
+        self._length = length
+        self._createTask = createTask
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._createTask(i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("task index out of range")
+        return self._createTask(index)
+
+
+class ScheduleArrays:
+    """
+    Schedule stored as NumPy columns instead of lists of namedtuples, one set of columns per kind of task.
+    Targets and ground stations are stored as an index in the TargetTable, times are in seconds relative to the
+    start of the OH. The columns should not be changed, a changed schedule is a new ScheduleArrays.
+
+    Columns:
+        otTaskIDs, otTargetIndices, otStarts, otEnds: the observation tasks
+        btTaskIDs, btFileIDs, btStarts, btEnds: the buffering tasks, btTaskIDs holds the OTTaskID of each task
+        dtTaskIDs, dtGSIndices, dtStarts, dtEnds: the downlink tasks, dtTaskIDs holds the OTTaskID of each task
+    """
 
-    return int(hash((gtName, startTime)) % 1e14 + 1e14)
+    def __init__(self, targetTable: TargetTable,
+                 otTaskIDs: np.ndarray, otTargetIndices: np.ndarray, otStarts: np.ndarray, otEnds: np.ndarray,
+                 btTaskIDs: np.ndarray, btFileIDs: np.ndarray, btStarts: np.ndarray, btEnds: np.ndarray,
+                 dtTaskIDs: np.ndarray, dtGSIndices: np.ndarray, dtStarts: np.ndarray, dtEnds: np.ndarray):
+        self.targetTable = targetTable
+        self.otTaskIDs = np.asarray(otTaskIDs, dtype=np.int64)
+        self.otTargetIndices = np.asarray(otTargetIndices, dtype=np.int32)
+        self.otStarts = np.asarray(otStarts, dtype=np.float64)
+        self.otEnds = np.asarray(otEnds, dtype=np.float64)
+        self.btTaskIDs = np.asarray(btTaskIDs, dtype=np.int64)
+        self.btFileIDs = np.asarray(btFileIDs, dtype=np.int32)
+        self.btStarts = np.asarray(btStarts, dtype=np.float64)
+        self.btEnds = np.asarray(btEnds, dtype=np.float64)
+        self.dtTaskIDs = np.asarray(dtTaskIDs, dtype=np.int64)
+        self.dtGSIndices = np.asarray(dtGSIndices, dtype=np.int32)
+        self.dtStarts = np.asarray(dtStarts, dtype=np.float64)
+        self.dtEnds = np.asarray(dtEnds, dtype=np.float64)
+
+    @classmethod
+    def fromLists(cls, otList: list[OT], btList: list[BT], dtList: list[DT],
+                  targetTable: TargetTable = None) -> "ScheduleArrays":
+        """
+        Create the arrays of a schedule given as lists of tasks.
+
+        Args:
+            otList (list[OT]): List of observation tasks.
+            btList (list[BT]): List of buffering tasks.
+            dtList (list[DT]): List of downlink tasks.
+            targetTable (TargetTable, optional): Table to look up the targets and ground stations in, targets that
+                are not in the table are added. A new table is created if not given.
+
+        Returns:
+            ScheduleArrays: The schedule, the tasks keep the order of the lists.
+        """
+        if targetTable is None:
+            targetTable = TargetTable()
+        return cls(
+            targetTable,
+            [ot.taskID for ot in otList], [targetTable.getGTIndex(ot.GT) for ot in otList],
+            [ot.start for ot in otList], [ot.end for ot in otList],
+            [bt.OTTaskID for bt in btList], [bt.fileID for bt in btList],
+            [bt.start for bt in btList], [bt.end for bt in btList],
+            [dt.OTTaskID for dt in dtList], [targetTable.getGSIndex(dt.GS) for dt in dtList],
+            [dt.start for dt in dtList], [dt.end for dt in dtList]
+        )
+
+    def getOT(self, index: int) -> OT:
+        return OT(int(self.otTaskIDs[index]), self.targetTable.gtList[self.otTargetIndices[index]],
+                  float(self.otStarts[index]), float(self.otEnds[index]))
+
+    def getBT(self, index: int) -> BT:
+        return BT(int(self.btTaskIDs[index]), int(self.btFileIDs[index]),
+                  float(self.btStarts[index]), float(self.btEnds[index]))
+
+    def getDT(self, index: int) -> DT:
+        return DT(int(self.dtTaskIDs[index]), self.targetTable.gsList[self.dtGSIndices[index]],
+                  float(self.dtStarts[index]), float(self.dtEnds[index]))
+
+    @property
+    def otView(self) -> TaskView:
+        return TaskView(len(self.otTaskIDs), self.getOT)
+
+    @property
+    def btView(self) -> TaskView:
+        return TaskView(len(self.btTaskIDs), self.getBT)
+
+    @property
+    def dtView(self) -> TaskView:
+        return TaskView(len(self.dtTaskIDs), self.getDT)
+
+    def toLists(self) -> tuple[list[OT], list[BT], list[DT]]:
+        """Convert the schedule back to lists of namedtuples, equal to the lists it was created from"""
+        return list(self.otView), list(self.btView), list(self.dtView)
@@ -0,0 +1,82 @@
+import sys
+import os
+import random
+
+import pytest
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scheduling_model import GT, TW, TTW
+from algorithm.congestion import CongestionIndex
+from algorithm.operators import congestionSort, SortKeyCache
+
+SEEDS = range(100)
+
+
+def getTTWList(r: random.Random) -> list[TTW]:
+    ttwList = []
+    for i in range(r.randint(0, 12)):
+        gt = GT(f"t{i}", 0.0, 0.0, 1, 0, 0, "wide")
+        # Whole seconds, so the sums of the differences are exact and equal congestion levels are equal
+        tws = []
+        for _ in range(r.randint(0, 4)):
+            start = float(r.randrange(0, 20000, 10))
+            tws.append(TW(start, start + r.choice([60.0, 90.0, 120.0])))
+        ttwList.append(TTW(gt, tws))
+    if ttwList and r.random() < 0.3:
+        # Targets with the same time windows have the same congestion level
+        ttwList.append(TTW(ttwList[0].GT._replace(id="copy"), list(ttwList[0].TWs)))
+    return ttwList
+
+
+def getCongestionLevelsReference(ttwList: list[TTW]) -> list[float]:
+    """ The pairwise sum that congestionSort calculated before CongestionIndex """
+    congestionLevels = []
+    for i, ttw in enumerate(ttwList):
+        congestionLevel = 0
+        for tw_i in ttw.TWs:
+            middleTime_i = tw_i.start + (tw_i.end - tw_i.start) / 2
+            for j, otherTTW in enumerate(ttwList):
+                if i == j:
+                    continue
+                for tw_j in otherTTW.TWs:
+                    congestionLevel += abs(middleTime_i - (tw_j.start + (tw_j.end - tw_j.start) / 2))
+        congestionLevels.append(congestionLevel)
+    return congestionLevels
+
+
+def congestionSortReference(ttwList: list[TTW]) -> list[TTW]:
+    """ Selection of the TTW with the lowest congestion, the first of equal TTWs is selected first """
+    congestionLevels = getCongestionLevelsReference(ttwList)
+    return [ttwList[j] for j in sorted(range(len(ttwList)), key=lambda j: congestionLevels[j])]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_congestion_levels(seed):
+    ttwList = getTTWList(random.Random(seed))
+    assert CongestionIndex(ttwList).getCongestionLevels(ttwList) == getCongestionLevelsReference(ttwList)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_congestion_levels_after_remove(seed):
+    r = random.Random(seed)
+    ttwList = getTTWList(r)
+    index = CongestionIndex(ttwList)
+    for ttw in r.sample(ttwList, len(ttwList) // 2):
+        ttwList.remove(ttw)
+        index.remove(ttw)
+        assert index.getCongestionLevels(ttwList) == getCongestionLevelsReference(ttwList)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_congestion_sort(seed):
+    r = random.Random(seed)
+    ttwList = getTTWList(r)
+    sortKeyCache = SortKeyCache()
+    assert congestionSort(ttwList) == congestionSortReference(ttwList)
+    assert congestionSort(ttwList, sortKeyCache) == congestionSortReference(ttwList)
+
+    # The cached index is reused for a subset of the TTWs
+    subset = r.sample(ttwList, len(ttwList) // 2)
+    assert congestionSort(subset, sortKeyCache) == congestionSortReference(subset)
@@ -0,0 +1,96 @@
+import sys
+import os
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from data_input.extract_cloud_data import ForecastFetcher
+
+
+class StubForecastServer:
+    """ Local stand-in for the MET location forecast endpoint, the forecasts expire right away so every call
+    of getForecast makes a request """
+
+    def __init__(self):
+        self.issueTime = "2025-11-11T10:00:00Z"
+        self.notModified = False  # Answer conditional requests with 304
+        self.notModifiedCount = 0  # Number of following requests answered with 304, conditional or not
+        self.requestHeaders = []
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requestHeaders.append(dict(self.headers))
+                expires = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=1), usegmt=True)
+                if stub.notModifiedCount > 0 or (stub.notModified and self.headers.get('If-Modified-Since')):
+                    stub.notModifiedCount -= 1
+                    self.send_response(304)
+                    self.send_header('Expires', expires)
+                    self.end_headers()
+                    return
+                body = json.dumps({"properties": {"meta": {"updated_at": stub.issueTime}, "timeseries": []}}).encode()
+                self.send_response(200)
+                self.send_header('Expires', expires)
+                self.send_header('Last-Modified', 'Tue, 11 Nov 2025 10:00:00 GMT')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+
+@pytest.fixture
+def stub():
+    server = StubForecastServer()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+def getIssueTime(forecast: dict) -> str:
+    return forecast["properties"]["meta"]["updated_at"]
+
+
+def test_revalidates_only_with_cached_forecast(stub):
+    fetcher = ForecastFetcher(baseUrl=stub.url)
+    fetcher.getForecast(63.4, 10.4)
+    assert 'If-Modified-Since' not in stub.requestHeaders[0]
+
+    stub.notModified = True
+    assert getIssueTime(fetcher.getForecast(63.4, 10.4)) == "2025-11-11T10:00:00Z"
+    assert 'If-Modified-Since' in stub.requestHeaders[1]
+
+
+def test_not_modified_without_cached_forecast_is_fetched_again(stub):
+    fetcher = ForecastFetcher(baseUrl=stub.url)
+    stub.notModifiedCount = 1
+    assert getIssueTime(fetcher.getForecast(63.4, 10.4)) == "2025-11-11T10:00:00Z"
+    assert len(stub.requestHeaders) == 2
+    assert 'If-Modified-Since' not in stub.requestHeaders[1]
+
+    fetcher.clear()
+    stub.notModifiedCount = 2
+    with pytest.raises(requests.HTTPError):
+        fetcher.getForecast(63.4, 10.4)
+
+
+def test_older_forecast_does_not_replace_cached_forecast(stub):
+    fetcher = ForecastFetcher(baseUrl=stub.url)
+    stub.issueTime = "2025-11-11T12:00:00Z"
+    fetcher.getForecast(63.4, 10.4)
+    stub.issueTime = "2025-11-11T11:00:00Z"
+    assert getIssueTime(fetcher.getForecast(63.4, 10.4)) == "2025-11-11T12:00:00Z"
@@ -13,6 +13,7 @@ from algorithm.NSGA2 import runNSGA
 from data_preprocessing.create_data_objects import createTTWList, createOH, createGSTWList
 from data_postprocessing.generate_cmdLine import createCmdFile, createCmdLinesForCaptureAndBuffering, recreateOTListFromCmdFile, recreateBTListFromCmdFile
 from data_postprocessing.algorithmData_api import convertOTListToDateTime, convertBTListToDateTime, convertDTListToDateTime, getAlgorithmDatafromJsonFile, saveAlgorithmDataInJsonFile
+from data_preprocessing.elevation_table import elevationTableIndex
 from data_preprocessing.objective_functions import getIQFromOT, objectiveFunctionImageQuality, objectiveFunctionPriority
 from transmission_scheduling.clean_schedule import cleanUpSchedule, OrderType
 from transmission_scheduling.input_parameters import getTransmissionInputParams, getTransmissionInputParamsFromJsonFile
@@ -131,6 +132,7 @@ class TestScenario:
             json.dump(list_toDict(self._gstwList, GSTW_toDict), f, indent=4)
         with open(os.path.join(folderPathTestScenario, "oh.json"), "w") as f:
             json.dump(OH_toDict(self._oh), f, indent=4)
+        elevationTableIndex.save(os.path.join(folderPathTestScenario, "elevation_tables.json"))
     def recreateInputAttributes(self):
         """ Recreate input attributes from existing input files """
         folderPathOutput = os.path.join(os.path.dirname(__file__), f"testing_results/OH{self.senarioID}")
@@ -167,6 +169,11 @@ class TestScenario:
         self._gstwList = []
         for gstwElement in gstwData:
             self._gstwList.append(dict_toGSTW(gstwElement))
+
+        # Load the elevation tables of the previous run, so the image quality is not recalculated, and sample the time
+        # windows that are not covered by them
+        elevationTableIndex.load(os.path.join(folderPathOutput, "elevation_tables.json"))
+        elevationTableIndex.addTTWList(self._ttwList, self._oh, int(self._inputParameters.hypsoNr))
     
 
     # Run test: create output attributes and cmd-files for each run of the algorithm
@@ -0,0 +1,62 @@
+import sys
+import os
+import random
+
+import pytest
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scheduling_model import OT, BT, DT, GS, GT, GSTW, TW, TTW, TargetTable, ScheduleArrays, generateTaskID
+from data_preprocessing.objective_functions import objectiveFunctionPriority
+
+SEEDS = range(50)
+
+GS_LIST = [GS("a", 63.4, 10.4, 0), GS("b", 78.2, 15.4, 0)]
+
+
+def getSchedule(r: random.Random) -> tuple[list[TTW], list[OT], list[BT], list[DT]]:
+    ttwList = [TTW(GT(f"t{i}", r.uniform(-90, 90), r.uniform(-180, 180), r.randint(0, 5), 0, 0, "wide"), [])
+               for i in range(r.randint(1, 6))]
+    otList, btList, dtList = [], [], []
+    for fileID in range(r.randint(0, 10)):
+        gt = r.choice(ttwList).GT
+        start = r.uniform(0, 172800)
+        ot = OT(generateTaskID(gt.id, start), gt, start, start + 60.0)
+        otList.append(ot)
+        btList.append(BT(ot.taskID, fileID, ot.end + 100.0, ot.end + 400.0))
+        dtList.append(DT(ot.taskID, r.choice(GS_LIST), ot.end + 1000.0, ot.end + 1200.0))
+    return ttwList, otList, btList, dtList
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_schedule_arrays_round_trip(seed):
+    ttwList, otList, btList, dtList = getSchedule(random.Random(seed))
+    targetTable = TargetTable.fromTTWList(ttwList, [GSTW(gs, []) for gs in GS_LIST])
+    scheduleArrays = ScheduleArrays.fromLists(otList, btList, dtList, targetTable)
+
+    assert scheduleArrays.toLists() == (otList, btList, dtList)
+
+    # The views can be used in place of the lists
+    assert objectiveFunctionPriority(scheduleArrays.otView) == objectiveFunctionPriority(otList)
+    assert scheduleArrays.targetTable.priorities[scheduleArrays.otTargetIndices].sum() == objectiveFunctionPriority(otList)
+    if otList:
+        assert scheduleArrays.otView[-1] == otList[-1]
+        assert scheduleArrays.btView[1:3] == btList[1:3]
+    with pytest.raises(IndexError):
+        scheduleArrays.dtView[len(dtList)]
+
+
+def test_target_table_indices():
+    gtA = GT("a", 0.0, 0.0, 1, 0, 0, "wide")
+    gtB = GT("b", 1.0, 1.0, 2, 0, 0, "wide")
+    targetTable = TargetTable([gtA, gtB, gtA])
+    assert targetTable.gtList == [gtA, gtB]
+    assert targetTable.getGTIndex(gtB) == 1
+
+    # Targets that are not in the table are added when a schedule is converted
+    gtC = GT("c", 2.0, 2.0, 3, 0, 0, "wide")
+    scheduleArrays = ScheduleArrays.fromLists([OT(1, gtC, 0.0, 60.0)], [], [], targetTable)
+    assert targetTable.gtList == [gtA, gtB, gtC]
+    assert scheduleArrays.otTargetIndices.tolist() == [2]
+    assert list(targetTable.priorities) == [1.0, 2.0, 3.0]
@@ -0,0 +1,204 @@
+import sys
+import os
+import random
+
+import pytest
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scheduling_model import OT, BT, DT, GS, GT, GSTW, TW
+from transmission_scheduling.input_parameters import TransmissionParams
+from transmission_scheduling.interval_index import TaskIntervalIndex
+from transmission_scheduling.gs_timeline import GSTimeline
+from transmission_scheduling.downlink_capacity import DownlinkCapacityLedger
+from transmission_scheduling.buffer_occupancy import BufferOccupancyTracker
+from transmission_scheduling.conflict_checks import getConflictingTasks, observationTaskConflicting, \
+    hypso2BufferLimitConflicting
+from transmission_scheduling.util import gstwToSortedTupleList, getAvailableDownlinkTime
+
+# The new structures are compared with the list based functions they replace, on random schedules
+SEEDS = range(200)
+HORIZON = 20000.0
+
+GS_A = GS("a", 63.4, 10.4, 0)
+GS_B = GS("b", 78.2, 15.4, 0)
+GT_1 = GT("t1", 0.0, 0.0, 1, 0, 0, "wide")
+GT_2 = GT("t2", 1.0, 1.0, 2, 0, 0, "wide")
+
+
+def getParams(r: random.Random) -> TransmissionParams:
+    return TransmissionParams(preBufferTime=r.choice([0.0, 30.0]), preCaptureTime=r.choice([0.0, 20.0]),
+                              postCaptureTime=r.choice([0.0, 40.0]), transmissionStartTime=r.choice([0.0, 60.0]),
+                              overLappingWithCaptureSetback=r.choice([0.0, 100.0]), maxBufferFiles=r.randint(1, 3))
+
+
+def getIntervals(r: random.Random, count: int, minDuration: float, maxDuration: float) -> list[tuple[float, float]]:
+    intervals = []
+    for _ in range(count):
+        # Round the times, so some intervals touch or start at the same time
+        start = float(round(r.uniform(0.0, HORIZON), -1))
+        intervals.append((start, start + float(round(r.uniform(minDuration, maxDuration), -1))))
+    return intervals
+
+
+def getGSTWList(r: random.Random) -> list[GSTW]:
+    return [GSTW(gs, [TW(start, end) for start, end in sorted(getIntervals(r, r.randint(1, 8), 300, 700))])
+            for gs in (GS_A, GS_B)]
+
+
+def getOTList(r: random.Random, count: int) -> list[OT]:
+    return [OT(r.randint(0, 5), r.choice([GT_1, GT_2]), start, end)
+            for start, end in getIntervals(r, count, 60, 60)]
+
+
+def getBTList(r: random.Random, count: int) -> list[BT]:
+    return [BT(r.randint(0, 5), fileID, start, end)
+            for fileID, (start, end) in enumerate(getIntervals(r, count, 100, 2000))]
+
+
+def getDTList(r: random.Random, count: int) -> list[DT]:
+    return [DT(r.randint(0, 5), r.choice([GS_A, GS_B]), start, end) for start, end in getIntervals(r, count, 50, 500)]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_task_interval_index(seed):
+    r = random.Random(seed)
+    p = getParams(r)
+    gstwList = getGSTWList(r)
+    otList = getOTList(r, r.randint(0, 10))
+    btList = getBTList(r, r.randint(0, 8))
+    dtList = getDTList(r, r.randint(0, 8))
+    index = TaskIntervalIndex(otList, btList, gstwList, p)
+
+    for start, end in getIntervals(r, 10, 0, 1500):
+        tw = TW(start, end)
+        assert index.getConflictingTasks(tw) == getConflictingTasks(tw, btList, otList, gstwList, p)
+        conflictsFound = any(index.getConflictingTasks(tw, True))
+        assert conflictsFound == any(getConflictingTasks(tw, btList, otList, gstwList, p, True))
+
+    for ot in getOTList(r, 5) + otList[:2]:
+        assert (observationTaskConflicting(ot, btList, dtList, otList, [], p, intervalIndex=index)
+                == observationTaskConflicting(ot, btList, dtList, otList, [], p))
+
+    # The index follows the lists when tasks are removed and added
+    for ot in otList[:3]:
+        otList.remove(ot)
+        index.removeOT(ot)
+    for bt in getBTList(r, 3):
+        btList.append(bt)
+        index.addBT(bt)
+    for start, end in getIntervals(r, 10, 0, 1500):
+        tw = TW(start, end)
+        assert index.getConflictingTasks(tw) == getConflictingTasks(tw, btList, otList, gstwList, p)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_gs_timeline(seed):
+    r = random.Random(seed)
+    gstwList = getGSTWList(r)
+    timeline = GSTimeline(gstwList)
+
+    assert timeline.getSortedPasses() == gstwToSortedTupleList(gstwList)
+    assert list(timeline) == [GSTW(gstw.GS, tuple(gstw.TWs)) for gstw in gstwList]
+
+    for _ in range(10):
+        taskEndTime = r.uniform(-1000.0, HORIZON)
+        maxLatency = r.choice([float("Infinity"), 3600.0, 0.0])
+        assert timeline.getClosestGSTW(taskEndTime, maxLatency) == getClosestGSTWReference(taskEndTime, gstwList,
+                                                                                            maxLatency)
+
+
+def getClosestGSTWReference(taskEndTime: float, gstwList: list[GSTW], maxLatency: float) -> list[GSTW]:
+    """ The list based util.getClosestGSTW that GSTimeline.getClosestGSTW replaces """
+    groupedList: list[GSTW] = []
+    for gs, tw in gstwToSortedTupleList(gstwList):
+        if not taskEndTime <= tw.start <= taskEndTime + maxLatency:
+            continue
+        gstw = next((gstw for gstw in groupedList if gstw.GS == gs), None)
+        if gstw is None:
+            groupedList.append(GSTW(gs, [tw]))
+        else:
+            gstw.TWs.append(tw)
+    return groupedList
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_downlink_capacity_ledger(seed):
+    r = random.Random(seed)
+    p = getParams(r)
+    gstwList = getGSTWList(r)
+    otList = getOTList(r, r.randint(0, 10))
+    dtList = getDTList(r, r.randint(0, 8))
+    ledger = DownlinkCapacityLedger(gstwList, otList, dtList, p)
+
+    for _ in range(12):
+        operation = r.randrange(4)
+        if operation == 0:
+            ot = getOTList(r, 1)[0]
+            otList.append(ot)
+            ledger.addOT(ot)
+        elif operation == 1 and otList:
+            ot = r.choice(otList)
+            otList.remove(ot)
+            ledger.removeOT(ot)
+        elif operation == 2:
+            dt = getDTList(r, 1)[0]
+            dtList.append(dt)
+            ledger.addDT(dt)
+        elif operation == 3 and dtList:
+            dt = r.choice(dtList)
+            dtList.remove(dt)
+            ledger.removeDT(dt)
+
+        passes = gstwToSortedTupleList(gstwList)
+        assert ledger.getAvailableDownlinkTimes() == [getAvailableDownlinkTime(tw, dtList, otList, p)
+                                                      for _, tw in passes]
+        for ot in getOTList(r, 2):
+            assert (observationTaskConflicting(ot, [], dtList, otList, gstwList, p, capacityLedger=ledger)
+                    == observationTaskConflicting(ot, [], dtList, otList, gstwList, p))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_buffer_occupancy_tracker(seed):
+    r = random.Random(seed)
+    p = getParams(r)
+    gstwList = getGSTWList(r)
+    otList = getOTList(r, r.randint(0, 10))
+    btList = getBTList(r, r.randint(0, 8))
+    dtList = getDTList(r, r.randint(0, 8))
+    if btList and r.random() < 0.3:
+        # A buffering task can be in the list twice
+        btList.append(btList[0])
+    tracker = BufferOccupancyTracker(otList, btList, dtList, gstwList, p)
+
+    for step in range(12):
+        operation = r.randrange(7)
+        if operation == 0:
+            ot = getOTList(r, 1)[0]
+            otList.append(ot)
+            tracker.addOT(ot)
+        elif operation == 1 and otList:
+            ot = r.choice(otList)
+            otList.remove(ot)
+            tracker.removeOT(ot)
+        elif operation == 2:
+            bt = getBTList(r, 1)[0]._replace(fileID=100 + step)
+            btList.append(bt)
+            tracker.addBT(bt)
+        elif operation == 3 and btList:
+            bt = r.choice(btList)
+            btList.remove(bt)
+            tracker.removeBT(bt)
+        elif operation == 4:
+            dt = getDTList(r, 1)[0]
+            dtList.append(dt)
+            tracker.addDT(dt)
+        elif operation == 5 and dtList:
+            dt = r.choice(dtList)
+            dtList.remove(dt)
+            tracker.removeDT(dt)
+
+        for candidate in getBTList(r, 3):
+            assert (tracker.wouldViolate(candidate)
+                    == hypso2BufferLimitConflicting(otList, btList + [candidate], dtList, gstwList, p))
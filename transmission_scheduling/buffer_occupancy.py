@@ -0,0 +1,231 @@
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+
+from scheduling_model import OT, GSTW, BT, DT
+from transmission_scheduling.input_parameters import TransmissionParams
+from transmission_scheduling.util import gstwToSortedTupleList
+
+
+class BufferOccupancyTracker:
+    """
+    Keeps track of the buffer cleared timestamps and the number of buffer files between them for a schedule,
+    so the HYPSO-2 buffer limit of many candidate buffering tasks can be checked without recalculating everything.
+
+    The state is derived from the scheduled tasks in the same way as getBufferClearedTimestamps. For every pair of
+    consecutive ground station passes (a gap, see getFreeGSGaps) it holds the buffering task that occupies the gap,
+    the number of files in the buffer before the gap and the number of observation tasks during the two passes.
+    Adding or removing a task only updates the gaps that the task overlaps.
+    A candidate buffering task is checked with wouldViolate, which gives the same result as
+    hypso2BufferLimitConflicting with the candidate appended to the buffering tasks.
+    """
+
+    def __init__(self, otList: list[OT], btList: list[BT], dtList: list[DT], gstwList: list[GSTW],
+                 p: TransmissionParams):
+        """
+        Args:
+            otList (list[OT]): List of all observation tasks.
+            btList (list[BT]): List of all already scheduled buffering tasks.
+            dtList (list[DT]): List of all already scheduled downlink tasks plus the candidate downlink tasks.
+            gstwList (list[GSTW]): List of all ground station time windows.
+            p (TransmissionParams): Input parameters containing the buffer file limit.
+        """
+        self.p = p
+        self._gstwSortedTupleList = gstwToSortedTupleList(gstwList)
+        passStarts = np.array([tw.start for _, tw in self._gstwSortedTupleList], dtype=float)
+        passEnds = np.array([tw.end for _, tw in self._gstwSortedTupleList], dtype=float)
+
+        # Gap i lies between the start of pass i and the end of pass i + 1. The times are also kept as lists,
+        # because bisect is faster than NumPy for a single lookup
+        self._gapStarts = passStarts[:-1]
+        self._gapEnds = passEnds[1:]
+        self._passStartList = passStarts.tolist()
+        self._passEndList = passEnds.tolist()
+        self._passEndMaxList = np.maximum.accumulate(passEnds).tolist() if len(passEnds) > 0 else []
+        self._gapStartList = self._passStartList[:-1]
+        self._gapEndList = self._passEndList[1:]
+        self._gapEndMaxList = np.maximum.accumulate(self._gapEnds).tolist() if len(self._gapEnds) > 0 else []
+        gapCount = len(self._gapStarts)
+
+        # Buffering task occupying each gap, as the sequence number of the task in the buffering task list, or -1
+        self._gapOccupant = np.full(gapCount, -1, dtype=int)
+        self._gapOTCounts = np.zeros(gapCount, dtype=int)
+
+        # The buffering tasks in list order, as sequence numbers, with the gap each of them occupies
+        self._nextSequence = 0
+        self._btOfSequence: dict[int, BT] = {}
+        self._sequencesOfBT: dict[BT, list[int]] = {}
+        self._gapOfSequence: dict[int, int] = {}
+        self._btStartsSorted: list[float] = []
+        self._btEndsSorted: list[float] = []
+        self._btArrays = None
+
+        # Downlink tasks per observation task, only the last part of each downlink removes a file from the buffer
+        self._dtsOfTask: dict[int, list[DT]] = {}
+        self._lastDTEndOfTask: dict[int, float] = {}
+        self._dtCountInLastGSTW = 0
+
+        np.add.at(self._gapOTCounts, [gap for ot in otList for gap in self._getGapsOfOT(ot)], 1)
+        for bt in btList:
+            self._insertBT(bt)
+        for dt in dtList:
+            self._dtsOfTask.setdefault(dt.OTTaskID, []).append(dt)
+            if dt.start >= self._gstwSortedTupleList[-1][1].start:
+                self._dtCountInLastGSTW += 1
+        for taskID, dts in self._dtsOfTask.items():
+            self._lastDTEndOfTask[taskID] = self._getLastDT(dts).end
+
+        # Files in the buffer before each gap, the file counts are updated in place when tasks are added or removed
+        lastDTEnds = np.sort(np.array(list(self._lastDTEndOfTask.values()), dtype=float))
+        self._gapFileCounts = (np.searchsorted(np.array(self._btStartsSorted, dtype=float), self._gapStarts, side='left')
+                               - np.searchsorted(lastDTEnds, self._gapStarts, side='left'))
+
+    def addOT(self, ot: OT):
+        self._gapOTCounts[self._getGapsOfOT(ot)] += 1
+
+    def removeOT(self, ot: OT):
+        self._gapOTCounts[self._getGapsOfOT(ot)] -= 1
+
+    def addBT(self, bt: BT):
+        self._insertBT(bt)
+        self._gapFileCounts[bisect_right(self._gapStartList, bt.start):] += 1
+
+    def _insertBT(self, bt: BT):
+        """ Append the buffering task to the list and let it occupy a gap, the file counts are not updated """
+        sequence = self._nextSequence
+        self._nextSequence += 1
+        self._btOfSequence[sequence] = bt
+        self._sequencesOfBT.setdefault(bt, []).append(sequence)
+        insort(self._btStartsSorted, bt.start)
+        insort(self._btEndsSorted, bt.end)
+        self._btArrays = None
+
+        # The task is the last in the list, so it occupies the first free gap it overlaps
+        for gap in self._getOverlappingGaps(bt.start, bt.end):
+            if self._gapOccupant[gap] < 0:
+                self._gapOccupant[gap] = sequence
+                self._gapOfSequence[sequence] = gap
+                break
+
+    def removeBT(self, bt: BT):
+        # Like list.remove, the first occurrence of the task in the list is removed
+        sequences = self._sequencesOfBT[bt]
+        sequence = sequences.pop(0)
+        if not sequences:
+            del self._sequencesOfBT[bt]
+        del self._btOfSequence[sequence]
+        del self._btStartsSorted[bisect_left(self._btStartsSorted, bt.start)]
+        del self._btEndsSorted[bisect_left(self._btEndsSorted, bt.end)]
+        self._btArrays = None
+
+        gap = self._gapOfSequence.pop(sequence, None)
+        while gap is not None:
+            # The gap goes to the first task in the list that overlaps it and does not occupy an earlier gap.
+            # If that task occupied a later gap, the later gap is given away in the same way.
+            self._gapOccupant[gap] = -1
+            candidate = min((otherSequence for otherSequence, other in self._btOfSequence.items()
+                             if self._gapOfSequence.get(otherSequence, gap + 1) > gap
+                             and not (other.end <= self._gapStartList[gap] or other.start >= self._gapEndList[gap])),
+                            default=None)
+            if candidate is None:
+                break
+            self._gapOccupant[gap] = candidate
+            gap, self._gapOfSequence[candidate] = self._gapOfSequence.get(candidate), gap
+
+        self._gapFileCounts[bisect_right(self._gapStartList, bt.start):] -= 1
+
+    def addDT(self, dt: DT):
+        self._dtsOfTask.setdefault(dt.OTTaskID, []).append(dt)
+        self._updateLastDT(dt.OTTaskID)
+        if dt.start >= self._gstwSortedTupleList[-1][1].start:
+            self._dtCountInLastGSTW += 1
+
+    def removeDT(self, dt: DT):
+        dts = self._dtsOfTask[dt.OTTaskID]
+        dts.remove(dt)
+        if not dts:
+            del self._dtsOfTask[dt.OTTaskID]
+        self._updateLastDT(dt.OTTaskID)
+        if dt.start >= self._gstwSortedTupleList[-1][1].start:
+            self._dtCountInLastGSTW -= 1
+
+    def wouldViolate(self, bt: BT) -> bool:
+        """
+        Check if adding the buffering task to the schedule would result in a conflict with the buffer size limit.
+
+        Args:
+            bt (BT): The candidate buffering task.
+
+        Returns:
+            bool: True if the buffer limit would be violated, False otherwise.
+        """
+        # The candidate is the last buffering task in the list, so it only occupies the first free gap that
+        # it overlaps, the gaps occupied by the other buffering tasks do not change
+        free = self._gapOccupant < 0
+        for gap in self._getOverlappingGaps(bt.start, bt.end):
+            if free[gap]:
+                free[gap] = False
+                break
+
+        # Files in the buffer before each gap, and whether the buffer can be cleared during the gap
+        fileCounts = self._gapFileCounts + (bt.start < self._gapStarts)
+        maxOTDuringGS = np.where(fileCounts == 2, 0, 1)
+        cleared = free & ((fileCounts == 0) | ((fileCounts <= 2) & (self._gapOTCounts <= maxOTDuringGS)))
+
+        # One file can be left to be cleaned up in the last GS pass, when the next schedule starts
+        lastClearedTimestamp = [self._gstwSortedTupleList[-1][1].end] if self._dtCountInLastGSTW <= 1 else []
+        bufferClearedTimestamps = np.concatenate(([0.0], self._gapEnds[cleared], lastClearedTimestamp))
+
+        # The buffer should be cleared at the end of the schedule
+        if not bufferClearedTimestamps[-1] >= self._gstwSortedTupleList[-1][1].start:
+            return True
+
+        # The amount of buffers that are stored between two clearings cannot be too large
+        if self._btArrays is None:
+            self._btArrays = (np.array(self._btStartsSorted, dtype=float), np.array(self._btEndsSorted, dtype=float))
+        btStarts, btEnds = self._btArrays
+        clearedStarts = bufferClearedTimestamps[:-1]
+        clearedEnds = bufferClearedTimestamps[1:]
+        endedBefore = np.searchsorted(btEnds, clearedStarts, side='left')
+        startedAfter = len(btStarts) - np.searchsorted(btStarts, clearedEnds, side='right')
+        bufferCounts = len(btStarts) - endedBefore - startedAfter
+        bufferCounts += (bt.end >= clearedStarts) & (bt.start <= clearedEnds)
+
+        return bool(np.any(bufferCounts > self.p.maxBufferFiles))
+
+    def _updateLastDT(self, taskID: int):
+        """ Update the file counts when the last downlink task of an observation task changes """
+        dts = self._dtsOfTask.get(taskID)
+        lastDT = self._getLastDT(dts) if dts else None
+        oldEnd = self._lastDTEndOfTask.pop(taskID, None)
+        if oldEnd is not None:
+            self._gapFileCounts[bisect_right(self._gapStartList, oldEnd):] += 1
+        if lastDT is not None:
+            self._lastDTEndOfTask[taskID] = lastDT.end
+            self._gapFileCounts[bisect_right(self._gapStartList, lastDT.end):] -= 1
+
+    @staticmethod
+    def _getLastDT(dts: list[DT]) -> DT:
+        """ Get the downlink task that starts last, of tasks with the same start the first in the list """
+        lastDT = dts[0]
+        for dt in dts[1:]:
+            if dt.start > lastDT.start:
+                lastDT = dt
+        return lastDT
+
+    def _getOverlappingGaps(self, start: float, end: float) -> list[int]:
+        """ Get the gaps that overlap with (start, end), in ascending order """
+        first = bisect_right(self._gapEndMaxList, start)
+        last = bisect_left(self._gapStartList, end)
+        return [gap for gap in range(first, last) if self._gapEndList[gap] > start]
+
+    def _getGapsOfOT(self, ot: OT) -> list[int]:
+        """ Get the gaps with a ground station pass before or after the gap that overlaps with the observation task """
+        first = bisect_right(self._passEndMaxList, ot.start)
+        last = bisect_left(self._passStartList, ot.end)
+        gaps = set()
+        for gsPass in range(first, last):
+            if self._passEndList[gsPass] > ot.start:
+                # The pass is the pass after gap gsPass - 1 and the pass before gap gsPass
+                gaps.update(gap for gap in (gsPass - 1, gsPass) if 0 <= gap < len(self._gapStarts))
+        return sorted(gaps)
@@ -1,7 +1,8 @@
 from scheduling_model import BT, OT, DT, GSTW, GS, TW
 from transmission_scheduling.generate_downlink import generateDownlinkTask
 from transmission_scheduling.input_parameters import TransmissionParams
-from transmission_scheduling.util import gstwToSortedTupleList, getBufferClearedTimestamps, getClosestGSTW
+from transmission_scheduling.util import gstwToSortedTupleList, getBufferClearedTimestamps
+from transmission_scheduling.gs_timeline import GSTimeline, getGSTimeline
 
 from enum import Enum
 
@@ -10,7 +11,7 @@ class OrderType(Enum):
     PRIORITY = 2
 
 
-def cleanUpSchedule(otList: list[OT], btList: list[BT], dtList: list[DT], gstwList: list[GSTW],
+def cleanUpSchedule(otList: list[OT], btList: list[BT], dtList: list[DT], gstwList: list[GSTW] | GSTimeline,
                     parameters: TransmissionParams, bufferOrder: OrderType, downlinkOrder: OrderType) \
         -> tuple[list[BT], list[DT]]:
     """
@@ -21,7 +22,7 @@ def cleanUpSchedule(otList: list[OT], btList: list[BT], dtList: list[DT], gstwLi
         otList (list[OT]): List of observation tasks.
         btList (list[BT]): List of buffering tasks.
         dtList (list[DT]): List of downlink tasks.
-        gstwList (list[GSTW]): List of ground station time windows.
+        gstwList (list[GSTW] | GSTimeline): Ground station time windows, preferably as a timeline created once per run.
         parameters (TransmissionParams): Input parameters containing timing configurations.
         bufferOrder (OrderType): The order in which to re-assign buffer tasks to observation tasks (FIFO or PRIORITY).
         downlinkOrder (OrderType): The order in which to re-assign downlink tasks to observation tasks (FIFO or PRIORITY).
@@ -30,6 +31,7 @@ def cleanUpSchedule(otList: list[OT], btList: list[BT], dtList: list[DT], gstwLi
             tuple[list[BT], list[DT]]: The cleaned up lists of buffering tasks and downlink tasks.
     """
     p = parameters
+    gstwList = getGSTimeline(gstwList)
 
     btListCleaned = btList.copy()
     if bufferOrder == OrderType.PRIORITY:
@@ -101,18 +103,18 @@ def assignBufferIDs(otList: list[OT], btList: list[BT], dtList: list[DT], gstwLi
     return btListIDAssigned
 
 
-def regenerateDownlinkSchedule(otList: list[OT], btList: list[BT], gstwList: list[GSTW], p: TransmissionParams)\
+def regenerateDownlinkSchedule(otList: list[OT], btList: list[BT], gstwList: list[GSTW] | GSTimeline, p: TransmissionParams)\
         -> list[DT]:
     """
     Regenerate the downlink schedule based on the cleaned buffer schedule.
     HYPSO automatically downlinks the highest priority file form the buffer first, and this function simulates that.
     """
+    gsTimeline = getGSTimeline(gstwList)
     dtListCleaned: list[DT] = []
     # Sort the buffer tasks by file ID, then by start time
     btListSorted = sorted(btList, key=lambda x: (x.fileID, x.start))
     for bt in btListSorted:
-        closestGSTW = getClosestGSTW(bt.end, gstwList)
-        closestGSTWSorted = gstwToSortedTupleList(closestGSTW)
+        closestGSTWSorted = gsTimeline.getPassesWithin(bt.end, float("Infinity"))
 
         for i, entry in enumerate(closestGSTWSorted):
             gstw = GSTW(entry[0], [entry[1]])
@@ -1,9 +1,13 @@
 from scheduling_model import OT, BT, GSTW, TW, DT
 from transmission_scheduling.input_parameters import TransmissionParams
+from transmission_scheduling.interval_index import TaskIntervalIndex
+from transmission_scheduling.buffer_occupancy import BufferOccupancyTracker
+from transmission_scheduling.downlink_capacity import DownlinkCapacityLedger
 from transmission_scheduling.util import getBufferClearedTimestamps, gstwToSortedTupleList, getAvailableDownlinkTime
 
 
-def getConflictingTasks(tw: TW, btList: list[BT], otList: list[OT], gstwList: list[GSTW], p: TransmissionParams, cancelEarly: bool = False):
+def getConflictingTasks(tw: TW, btList: list[BT], otList: list[OT], gstwList: list[GSTW], p: TransmissionParams, cancelEarly: bool = False,
+                        intervalIndex: TaskIntervalIndex = None):
     """
     Get the list of tasks that conflict with the given time window.
 
@@ -14,6 +18,8 @@ def getConflictingTasks(tw: TW, btList: list[BT], otList: list[OT], gstwList: li
         gstwList (list[GSTW]): List of all ground station time windows.
         p (TransmissionParams): Input parameters containing timing configurations.
         cancelEarly (bool, optional): If True, the function will return as soon as a single conflict is found.
+        intervalIndex (TaskIntervalIndex, optional): Index of the tasks in btList, otList and gstwList.
+            If given, the conflicts are found with the index instead of scanning the lists.
 
     Returns:
         tuple[list[OT], list[BT], list[GSTW]]: A tuple containing:
@@ -22,6 +28,9 @@ def getConflictingTasks(tw: TW, btList: list[BT], otList: list[OT], gstwList: li
             - list[BT]: List of conflicting buffering tasks.
             - list[GSTW]: List of conflicting ground station time windows.
     """
+    if intervalIndex is not None:
+        return intervalIndex.getConflictingTasks(tw, cancelEarly)
+
     conflictingOTs: list[OT] = []
     conflictingBTs: list[BT] = []
     conflictingGSTWs: list[GSTW] = []
@@ -52,7 +61,8 @@ def getConflictingTasks(tw: TW, btList: list[BT], otList: list[OT], gstwList: li
 
 
 def bufferTaskConflicting(bt: BT, btList: list[BT], otList: list[OT], dtList: list[DT], gstwList: list[GSTW],
-                          p: TransmissionParams, checkHypso2BufferLimit: bool = True):
+                          p: TransmissionParams, checkHypso2BufferLimit: bool = True,
+                          intervalIndex: TaskIntervalIndex = None, bufferTracker: BufferOccupancyTracker = None):
     """
     Check if the buffering task overlaps with any other scheduled tasks.
 
@@ -64,14 +74,20 @@ def bufferTaskConflicting(bt: BT, btList: list[BT], otList: list[OT], dtList: li
         gstwList (list[GSTW]): List of all ground station time windows.
         p (TransmissionParams): Input parameters containing timing configurations.
         checkHypso2BufferLimit (bool, optional): If True, also check for conflicts with the HYPSO-2 buffer size limit.
+        intervalIndex (TaskIntervalIndex, optional): Index of the tasks in btList, otList and gstwList, used to find overlaps.
+        bufferTracker (BufferOccupancyTracker, optional): Tracker of the tasks in the lists, used to check the buffer size limit.
 
     Returns:
         bool: True if the buffering task conflicts with any other task, False otherwise.
     """
     bufferTimeWindow = TW(bt.start - p.preBufferTime, bt.end)
-    # Remove the buffer task from the list to prevent self conflict
-    btListOther = [otherBT for otherBT in btList if otherBT != bt]
-    conflictOTs, conflictBTs, conflictGSTWs = getConflictingTasks(bufferTimeWindow, btListOther, otList, gstwList, p, True)
+    if intervalIndex is not None:
+        # The buffer task itself is excluded to prevent self conflict
+        conflictOTs, conflictBTs, conflictGSTWs = intervalIndex.getConflictingTasks(bufferTimeWindow, True, excludeBT=bt)
+    else:
+        # Remove the buffer task from the list to prevent self conflict
+        btListOther = [otherBT for otherBT in btList if otherBT != bt]
+        conflictOTs, conflictBTs, conflictGSTWs = getConflictingTasks(bufferTimeWindow, btListOther, otList, gstwList, p, True)
     conflict =  bool(conflictOTs or conflictBTs or conflictGSTWs)
     if conflict:
         return True
@@ -80,13 +96,16 @@ def bufferTaskConflicting(bt: BT, btList: list[BT], otList: list[OT], dtList: li
         return False
 
     # Also check for the buffer file limit
+    if bufferTracker is not None:
+        return bufferTracker.wouldViolate(bt)
     newBTList = btList.copy()
     newBTList.append(bt)
     return hypso2BufferLimitConflicting(otList, newBTList, dtList, gstwList, p)
 
 
 def observationTaskConflicting(ot: OT, btList: list[BT], dtList: list[DT], otList: list[OT], gstwList: list[GSTW],
-                               p: TransmissionParams) -> bool:
+                               p: TransmissionParams, intervalIndex: TaskIntervalIndex = None,
+                               capacityLedger: DownlinkCapacityLedger = None) -> bool:
     """
     Check if the observation task overlaps with any other scheduled tasks.
     It is possible for observation tasks to be during ground station passes, but no transmission is possible during capturing.
@@ -99,6 +118,9 @@ def observationTaskConflicting(ot: OT, btList: list[BT], dtList: list[DT], otLis
         otList (list[OT]): List of all observation tasks.
         gstwList (list[GSTW]): List of all ground station time windows.
         p (TransmissionParams): Input parameters containing timing configurations.
+        intervalIndex (TaskIntervalIndex, optional): Index of the tasks in btList and otList, used to find overlaps.
+        capacityLedger (DownlinkCapacityLedger, optional): Ledger of the tasks in otList and dtList,
+            used to check the available downlink time of the ground station passes.
 
     Returns:
         bool: True if the observation task conflicts with any other task, False otherwise.
@@ -107,12 +129,18 @@ def observationTaskConflicting(ot: OT, btList: list[BT], dtList: list[DT], otLis
     observationTimeWindow = TW(ot.start - p.preCaptureTime, ot.end + p.postCaptureTime)
     # Remove instances of the observation task itself from the list
     otListOther = [otherOT for otherOT in otList if otherOT != ot]
-    conflictOTs, conflictBTs, conflictGSTWs = getConflictingTasks(observationTimeWindow, btList, otListOther, [],
-                                                                  p, True)
+    if intervalIndex is not None:
+        conflictOTs, conflictBTs, conflictGSTWs = intervalIndex.getConflictingTasks(observationTimeWindow, True,
+                                                                                   excludeOT=ot, includeGSTWs=False)
+    else:
+        conflictOTs, conflictBTs, conflictGSTWs = getConflictingTasks(observationTimeWindow, btList, otListOther, [],
+                                                                      p, True)
     if bool(conflictOTs or conflictBTs or conflictGSTWs):
         return True
 
     # Check if there is still enough time in the ground station passes for all downlink tasks
+    if capacityLedger is not None:
+        return capacityLedger.wouldExceed(ot)
     candidateOtList = otListOther.copy()
     candidateOtList.append(ot)
     for gstw in gstwList:
@@ -0,0 +1,124 @@
+from collections import Counter
+
+from scheduling_model import OT, DT, GSTW
+from transmission_scheduling.gs_timeline import GSTimeline, getGSTimeline
+from transmission_scheduling.input_parameters import TransmissionParams
+
+
+class DownlinkCapacityLedger:
+    """
+    Ledger of the downlink time that is left in every ground station pass, see util.getAvailableDownlinkTime.
+
+    The observation and downlink tasks are registered with the passes they overlap, so adding or removing a task
+    only updates those passes. The number of passes with a negative downlink time is kept up to date, so checking
+    if an observation task breaks the downlink budget of any pass only looks at the passes the task overlaps.
+    """
+
+    def __init__(self, gstwList: list[GSTW] | GSTimeline, otList: list[OT], dtList: list[DT],
+                 p: TransmissionParams):
+        """
+        Args:
+            gstwList (list[GSTW] | GSTimeline): All ground station time windows.
+            otList (list[OT]): List of all scheduled observation tasks.
+            dtList (list[DT]): List of all scheduled downlink tasks.
+            p (TransmissionParams): Input parameters containing timing configurations.
+        """
+        self.p = p
+        self.gsTimeline = getGSTimeline(gstwList)
+        passes = self.gsTimeline.getSortedPasses()
+        self._durations = [tw.end - tw.start for _, tw in passes]
+        self._otCounts = [0] * len(passes)
+        # The downlink tasks of each pass are kept in the order they were added, so the available time is
+        # calculated with the same floating point operations as getAvailableDownlinkTime
+        self._dtsPerPass: list[list[DT]] = [[] for _ in passes]
+        self._availableTimes = [self._calculateAvailableTime(i, 0) for i in range(len(passes))]
+        self._negativePassCount = sum(1 for availableTime in self._availableTimes if availableTime < 0.0)
+        self._otCounter: Counter[OT] = Counter()
+
+        for ot in otList:
+            self.addOT(ot)
+        for dt in dtList:
+            self.addDT(dt)
+
+    def addOT(self, ot: OT):
+        self._otCounter[ot] += 1
+        for i in self.gsTimeline.getPassIndicesOverlapping(ot.start, ot.end):
+            self._otCounts[i] += 1
+            self._updatePass(i)
+
+    def removeOT(self, ot: OT):
+        if self._otCounter[ot] <= 0:
+            raise ValueError(f"Observation task {ot.taskID} is not in the downlink capacity ledger")
+        self._otCounter[ot] -= 1
+        for i in self.gsTimeline.getPassIndicesOverlapping(ot.start, ot.end):
+            self._otCounts[i] -= 1
+            self._updatePass(i)
+
+    def updateOTList(self, otListBefore: list[OT], otListAfter: list[OT]):
+        """
+        Update the ledger after the list of observation tasks has been changed, e.g. by shifting or deleting tasks.
+        """
+        if otListBefore is otListAfter:
+            return
+        countsBefore = Counter(otListBefore)
+        countsAfter = Counter(otListAfter)
+        for ot, count in (countsBefore - countsAfter).items():
+            for _ in range(count):
+                self.removeOT(ot)
+        for ot, count in (countsAfter - countsBefore).items():
+            for _ in range(count):
+                self.addOT(ot)
+
+    def addDT(self, dt: DT):
+        for i in self.gsTimeline.getPassIndicesOverlapping(dt.start, dt.end):
+            self._dtsPerPass[i].append(dt)
+            self._updatePass(i)
+
+    def removeDT(self, dt: DT):
+        for i in self.gsTimeline.getPassIndicesOverlapping(dt.start, dt.end):
+            self._dtsPerPass[i].remove(dt)
+            self._updatePass(i)
+
+    def getAvailableDownlinkTimes(self) -> list[float]:
+        """
+        Returns:
+            list[float]: The available downlink time of each pass, in the order of the sorted timeline.
+        """
+        return list(self._availableTimes)
+
+    def wouldExceed(self, ot: OT) -> bool:
+        """
+        Check if there would be too little time in any ground station pass for the scheduled downlink tasks,
+        if the observation task is scheduled. Instances of the task that are already in the ledger are replaced,
+        in the same way as observationTaskConflicting.
+
+        Args:
+            ot (OT): The candidate observation task.
+
+        Returns:
+            bool: True if the downlink time of any pass becomes negative, False otherwise.
+        """
+        negativePassCount = self._negativePassCount
+        scheduledCount = self._otCounter[ot]
+        for i in self.gsTimeline.getPassIndicesOverlapping(ot.start, ot.end):
+            if self._availableTimes[i] < 0.0:
+                negativePassCount -= 1
+            if self._calculateAvailableTime(i, self._otCounts[i] - scheduledCount + 1) < 0.0:
+                negativePassCount += 1
+        return negativePassCount > 0
+
+    def _updatePass(self, i: int):
+        wasNegative = self._availableTimes[i] < 0.0
+        self._availableTimes[i] = self._calculateAvailableTime(i, self._otCounts[i])
+        self._negativePassCount += (self._availableTimes[i] < 0.0) - wasNegative
+
+    def _calculateAvailableTime(self, i: int, otCount: int) -> float:
+        availableTime = self._durations[i]
+        # Subtract time for telemetry downlinking
+        availableTime -= self.p.transmissionStartTime
+        # Subtract time for observation tasks during the GS pass
+        availableTime -= self.p.overLappingWithCaptureSetback * otCount
+        # Subtract time for already scheduled downlink tasks
+        for dt in self._dtsPerPass[i]:
+            availableTime -= dt.end - dt.start
+        return availableTime
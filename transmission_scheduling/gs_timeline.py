@@ -0,0 +1,183 @@
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from scheduling_model import GS, GSTW, TW
+
+
+class GSTimeline:
+    """
+    Immutable timeline of all ground station passes, created once per run from the output of createGSTWList.
+
+    The passes are stored as one list of (GS, TW) tuples sorted by start time, together with the start and end
+    times and the index of the ground station of each pass, so the passes around a time can be found with a
+    binary search instead of flattening and sorting the GSTW list again.
+
+    Iterating over the timeline gives the GSTW elements it was created from, so it can be passed to any
+    function that expects a list[GSTW]. The time windows of these elements are tuples, so a caller can not change
+    the timeline that is shared by all schedules. The lists returned by the methods are new for every call.
+    """
+
+    def __init__(self, gstwList: list[GSTW]):
+        """
+        Args:
+            gstwList (list[GSTW]): List of ground station time windows with time windows corresponding to each GS.
+        """
+        self._gstwList = tuple(GSTW(gstw.GS, tuple(gstw.TWs)) for gstw in gstwList)
+
+        self._gsList: list[GS] = []
+        gsIndexOf: dict[GS, int] = {}
+        passes = []
+        for gstw in self._gstwList:
+            if gstw.GS not in gsIndexOf:
+                gsIndexOf[gstw.GS] = len(self._gsList)
+                self._gsList.append(gstw.GS)
+            for tw in gstw.TWs:
+                passes.append((gstw.GS, tw, gsIndexOf[gstw.GS]))
+        # Stable sort, so passes with the same start keep the order of the GSTW list
+        passes.sort(key=lambda x: x[1].start)
+
+        self._passes: tuple[tuple[GS, TW], ...] = tuple((gs, tw) for gs, tw, _ in passes)
+        self._starts: list[float] = [tw.start for _, tw, _ in passes]
+        self._ends: list[float] = [tw.end for _, tw, _ in passes]
+        self._gsIndices: list[int] = [gsIndex for _, _, gsIndex in passes]
+        self._maxDuration = max((end - start for start, end in zip(self._starts, self._ends)), default=0.0)
+
+    def __iter__(self):
+        return iter(self._gstwList)
+
+    def __len__(self):
+        return len(self._gstwList)
+
+    def __getitem__(self, index):
+        return self._gstwList[index]
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # The timeline is never changed, so copies of a schedule can share it
+        return self
+
+    @property
+    def passCount(self) -> int:
+        return len(self._passes)
+
+    @property
+    def gsList(self) -> list[GS]:
+        return list(self._gsList)
+
+    @property
+    def starts(self) -> np.ndarray:
+        return np.array(self._starts, dtype=float)
+
+    @property
+    def ends(self) -> np.ndarray:
+        return np.array(self._ends, dtype=float)
+
+    @property
+    def gsIndices(self) -> np.ndarray:
+        return np.array(self._gsIndices, dtype=int)
+
+    def getSortedPasses(self) -> list[tuple[GS, TW]]:
+        """
+        Returns:
+            list[tuple[GS, TW]]: All ground station passes sorted by start time, in the same order as gstwToSortedTupleList.
+        """
+        return list(self._passes)
+
+    def getPassesWithin(self, startTime: float, endTime: float) -> list[tuple[GS, TW]]:
+        """
+        Get the passes that start within [startTime, endTime].
+
+        Returns:
+            list[tuple[GS, TW]]: The passes sorted by start time.
+        """
+        return list(self._passes[bisect_left(self._starts, startTime):bisect_right(self._starts, endTime)])
+
+    def getPassAfter(self, time: float) -> tuple[GS, TW] | None:
+        """
+        Get the first pass that starts at or after the given time.
+
+        Returns:
+            tuple[GS, TW] | None: The pass, or None if no pass starts after the time.
+        """
+        i = bisect_left(self._starts, time)
+        return self._passes[i] if i < len(self._passes) else None
+
+    def getPassBefore(self, time: float) -> tuple[GS, TW] | None:
+        """
+        Get the pass with the latest start time that has ended at or before the given time.
+        Of passes with the same start time, the first in the timeline is returned.
+
+        Returns:
+            tuple[GS, TW] | None: The pass, or None if no pass ends before the time.
+        """
+        i = bisect_right(self._starts, time) - 1
+        # Passes of different ground stations can overlap, so the pass right before the time might not have ended yet
+        while i >= 0 and self._ends[i] > time:
+            i -= 1
+        if i < 0:
+            return None
+        while i > 0 and self._starts[i - 1] == self._starts[i] and self._ends[i - 1] <= time:
+            i -= 1
+        return self._passes[i]
+
+    def getPassContaining(self, time: float) -> tuple[GS, TW] | None:
+        """
+        Get the pass that is ongoing at the given time, i.e. start <= time < end.
+        If passes of several ground stations are ongoing, the one that started first is returned.
+
+        Returns:
+            tuple[GS, TW] | None: The pass, or None if there is no pass at the time.
+        """
+        containing = None
+        i = bisect_right(self._starts, time) - 1
+        while i >= 0 and self._starts[i] > time - self._maxDuration:
+            if self._ends[i] > time:
+                containing = self._passes[i]
+            i -= 1
+        return containing
+
+    def getPassIndicesOverlapping(self, startTime: float, endTime: float) -> list[int]:
+        """
+        Get the indices of the passes that overlap with (startTime, endTime), passes that only touch do not overlap.
+
+        Returns:
+            list[int]: Indices of the passes in the sorted timeline, in ascending order.
+        """
+        indices = []
+        i = bisect_left(self._starts, endTime) - 1
+        while i >= 0 and self._starts[i] > startTime - self._maxDuration:
+            if self._ends[i] > startTime:
+                indices.append(i)
+            i -= 1
+        indices.reverse()
+        return indices
+
+    def getClosestGSTW(self, taskEndTime: float, maxLatency=float("Infinity")) -> list[GSTW]:
+        """
+        Get the passes that start within maxLatency after the task, grouped per ground station,
+        see util.getClosestGSTW.
+        """
+        groupedList: list[GSTW] = []
+        groupOfGS: dict[int, GSTW] = {}
+        first = bisect_left(self._starts, taskEndTime)
+        last = bisect_right(self._starts, taskEndTime + maxLatency)
+        for i in range(first, last):
+            gstw = groupOfGS.get(self._gsIndices[i])
+            if gstw is None:
+                gstw = GSTW(self._passes[i][0], [])
+                groupOfGS[self._gsIndices[i]] = gstw
+                groupedList.append(gstw)
+            gstw.TWs.append(self._passes[i][1])
+        return groupedList
+
+
+def getGSTimeline(gstwList: list[GSTW] | GSTimeline) -> GSTimeline:
+    """
+    Get the timeline of the ground station passes, a timeline is returned as is so it is only created once.
+    """
+    if isinstance(gstwList, GSTimeline):
+        return gstwList
+    return GSTimeline(gstwList)
@@ -3,6 +3,8 @@ from transmission_scheduling.conflict_checks import getConflictingTasks
 from transmission_scheduling.input_parameters import TransmissionParams
 from transmission_scheduling.insertion.insertion_interface import InsertionInterface
 from transmission_scheduling.insertion.direct_insertion import DirectInsertion
+from transmission_scheduling.interval_index import TaskIntervalIndex
+from transmission_scheduling.buffer_occupancy import BufferOccupancyTracker
 
 
 class DeleteInsertion(InsertionInterface):
@@ -49,12 +51,18 @@ class DeleteInsertion(InsertionInterface):
         otListLowerPrio.reverse()
 
         otListLowPrioRemoved = otListPrioritySorted.copy()
+        # The index and tracker are updated together with the list, instead of being recreated for every attempt
+        intervalIndex = TaskIntervalIndex(otListLowPrioRemoved, btList, gstwList, p)
+        bufferTracker = BufferOccupancyTracker(otListLowPrioRemoved, btList, dtList, gstwList, p)
         found = False
         bt = None
         for i in range(len(otListLowerPrio)):
             otListLowPrioRemoved.remove(otListLowerPrio[i])
+            intervalIndex.removeOT(otListLowerPrio[i])
+            bufferTracker.removeOT(otListLowerPrio[i])
             bt, _, _ = self.direct_insert.generateBuffer(otToBuffer, gstwToDownlink, otListLowPrioRemoved, btList,
-                                                         dtList, gstwList)
+                                                         dtList, gstwList, intervalIndex=intervalIndex,
+                                                         bufferTracker=bufferTracker)
             if bt is not None:
                 found = True
                 break
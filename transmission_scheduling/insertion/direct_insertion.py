@@ -2,6 +2,8 @@ from scheduling_model import OT, GSTW, BT, TTW
 from transmission_scheduling.conflict_checks import bufferTaskConflicting
 from transmission_scheduling.input_parameters import TransmissionParams
 from transmission_scheduling.insertion.insertion_interface import InsertionInterface
+from transmission_scheduling.interval_index import TaskIntervalIndex
+from transmission_scheduling.buffer_occupancy import BufferOccupancyTracker
 
 
 class DirectInsertion(InsertionInterface):
@@ -13,7 +15,9 @@ class DirectInsertion(InsertionInterface):
         self.p = parameters
 
     def generateBuffer(self, otToBuffer: OT, gstwToDownlink: GSTW, otList: list[OT], btList: list[BT],
-                       dtList, gstwList: list[GSTW], ttwList: list[TTW] = None) -> tuple[BT | None, list[OT], list[BT]]:
+                       dtList, gstwList: list[GSTW], ttwList: list[TTW] = None,
+                       intervalIndex: TaskIntervalIndex = None,
+                       bufferTracker: BufferOccupancyTracker = None) -> tuple[BT | None, list[OT], list[BT]]:
         """
         Try to insert the buffering of an observed target directly into the schedule.
         Insertion is tried at the end of other tasks, so all tasks neatly follow each other.
@@ -27,6 +31,10 @@ class DirectInsertion(InsertionInterface):
             dtList (list[DT]): List of all already scheduled downlinking tasks plus the candidate downlink tasks.
             gstwList (list[GSTW]): List of all ground station time windows.
             ttwList (list[TTW]): List of all target time windows.
+            intervalIndex (TaskIntervalIndex, optional): Index of the tasks in otList, btList and gstwList.
+                If not given, it is created from the lists.
+            bufferTracker (BufferOccupancyTracker, optional): Buffer occupancy of the tasks in the lists.
+                If not given, it is created from the lists.
 
         Returns:
             tuple[BT | None, list[OT], list[BT]]: A tuple containing:
@@ -38,6 +46,12 @@ class DirectInsertion(InsertionInterface):
 
         p = self.p
 
+        # All candidates are checked against the same schedule, so the index and tracker are only created once
+        if intervalIndex is None:
+            intervalIndex = TaskIntervalIndex(otList, btList, gstwList, p)
+        if bufferTracker is None:
+            bufferTracker = BufferOccupancyTracker(otList, btList, dtList, gstwList, p)
+
         # We will save the latest possible candidate we find, i.e. closest to the ground station pass
         # This makes sure that as little captures as possible are in the buffer at the same time
         latestBTStartTime = -1
@@ -49,7 +63,8 @@ class DirectInsertion(InsertionInterface):
         btEnd = btStart + p.bufferingTime
         candidateBT = BT(otToBuffer.taskID, -1, btStart, btEnd)
         if  btEnd < gstwToDownlink.TWs[0].start and btStart > latestBTStartTime:
-            if not bufferTaskConflicting(candidateBT, btList, otList, dtList, gstwList, p):
+            if not bufferTaskConflicting(candidateBT, btList, otList, dtList, gstwList, p,
+                                     intervalIndex=intervalIndex, bufferTracker=bufferTracker):
                 latestBT = candidateBT
                 latestBTStartTime = btStart
 
@@ -69,7 +84,8 @@ class DirectInsertion(InsertionInterface):
                 continue
 
             candidateBT = BT(otToBuffer.taskID, -1, btStart, btEnd)
-            if not bufferTaskConflicting(candidateBT, btList, otList, dtList, gstwList, p):
+            if not bufferTaskConflicting(candidateBT, btList, otList, dtList, gstwList, p,
+                                     intervalIndex=intervalIndex, bufferTracker=bufferTracker):
                 latestBT = candidateBT
                 latestBTStartTime = btStart
 
@@ -86,7 +102,8 @@ class DirectInsertion(InsertionInterface):
                 continue
 
             candidateBT = BT(otToBuffer.taskID, -1, btStart, btEnd)
-            if not bufferTaskConflicting(candidateBT, btList, otList, dtList, gstwList, p):
+            if not bufferTaskConflicting(candidateBT, btList, otList, dtList, gstwList, p,
+                                     intervalIndex=intervalIndex, bufferTracker=bufferTracker):
                 latestBT = candidateBT
                 latestBTStartTime = btStart
 
@@ -104,7 +121,8 @@ class DirectInsertion(InsertionInterface):
                     continue
 
                 candidateBT = BT(otToBuffer.taskID, -1, btStart, btEnd)
-                if not bufferTaskConflicting(candidateBT, btList, otList, dtList, gstwList, p):
+                if not bufferTaskConflicting(candidateBT, btList, otList, dtList, gstwList, p,
+                                     intervalIndex=intervalIndex, bufferTracker=bufferTracker):
                     latestBT = candidateBT
                     latestBTStartTime = btStart
 
@@ -2,8 +2,9 @@ from scheduling_model import OT, GSTW, BT, TTW, TW, DT
 from transmission_scheduling.conflict_checks import bufferTaskConflicting, observationTaskConflicting
 from transmission_scheduling.insertion.insertion_interface import InsertionInterface
 from transmission_scheduling.insertion.direct_insertion import DirectInsertion
-from transmission_scheduling.util import gstwToSortedTupleList
+from transmission_scheduling.gs_timeline import getGSTimeline
 from transmission_scheduling.input_parameters import TransmissionParams
+from transmission_scheduling.interval_index import TaskIntervalIndex
 
 
 class SlideInsertion(InsertionInterface):
@@ -76,11 +77,11 @@ class SlideInsertion(InsertionInterface):
             shiftForwardPossible = False
 
         # Get the closest GSTW before the gap window
+        gsTimeline = getGSTimeline(gstwList)
         closestGSTWBeforeGap = None
-        for gstw in sorted(gstwToSortedTupleList(gstwList), key=lambda x: x[1].start, reverse=True):
-            if gstw[1].end <= gapTW.start:
-                closestGSTWBeforeGap = GSTW(gstw[0], [gstw[1]])
-                break
+        passBeforeGap = gsTimeline.getPassBefore(gapTW.start)
+        if passBeforeGap is not None:
+            closestGSTWBeforeGap = GSTW(passBeforeGap[0], [passBeforeGap[1]])
 
         # A ground station time window cannot be shifted,
         # so if that is the first non-buffer task after the gap, we cannot shift in that direction
@@ -90,10 +91,9 @@ class SlideInsertion(InsertionInterface):
 
         # Get the closest GSTW after the gap window
         closestGSTWAfterGap = None
-        for gstw in sorted(gstwToSortedTupleList(gstwList), key=lambda x: x[1].start):
-            if gstw[1].start >= gapTW.end:
-                closestGSTWAfterGap = GSTW(gstw[0], [gstw[1]])
-                break
+        passAfterGap = gsTimeline.getPassAfter(gapTW.end)
+        if passAfterGap is not None:
+            closestGSTWAfterGap = GSTW(passAfterGap[0], [passAfterGap[1]])
 
         if closestGSTWAfterGap is not None and shiftForwardPossible:
             if closestGSTWAfterGap.TWs[0].start < closestOTAfterGap.start:
@@ -219,14 +219,15 @@ class SlideInsertion(InsertionInterface):
                 btListCandidate[i] = BT(bt.OTTaskID, -1, bt.start - backwardShift, bt.end - backwardShift)
 
         # Check all buffers for conflict
+        intervalIndex = TaskIntervalIndex(otListCandidate, btListCandidate, gstwList, p)
         conflictingBuffer = False
         for bt in btListCandidate:
-            if bufferTaskConflicting(bt, btListCandidate, otListCandidate, dtList, gstwList, p, False):
+            if bufferTaskConflicting(bt, btListCandidate, otListCandidate, dtList, gstwList, p, False, intervalIndex):
                 conflictingBuffer = True
                 break
 
         if not conflictingBuffer and not observationTaskConflicting(shiftedOTBeforeGap, btListCandidate, dtList,
-                                                                    otListCandidate, gstwList, p):
+                                                                    otListCandidate, gstwList, p, intervalIndex):
             # The backward shift did not result in conflicts, so we can save the results
             otListModified = otListCandidate.copy()
             btListModified = btListCandidate.copy()
@@ -306,14 +307,15 @@ class SlideInsertion(InsertionInterface):
             previousBT = btListTimeSorted[i]
 
         # Check all buffers for conflict
+        intervalIndex = TaskIntervalIndex(otListCandidate, btListCandidate, gstwList, p)
         conflictingBuffer = False
         for bt in btListCandidate:
-            if bufferTaskConflicting(bt, btListCandidate, otListCandidate, dtList, gstwList, p, False):
+            if bufferTaskConflicting(bt, btListCandidate, otListCandidate, dtList, gstwList, p, False, intervalIndex):
                 conflictingBuffer = True
                 break
 
         if not conflictingBuffer and not observationTaskConflicting(shiftedOTAfterGap, btListCandidate, dtList,
-                                                                    otListCandidate, gstwList, p):
+                                                                    otListCandidate, gstwList, p, intervalIndex):
             # Forward shift has been successful, so we can save the results
             return otListCandidate, btListCandidate, forwardShift
         else:
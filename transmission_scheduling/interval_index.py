@@ -0,0 +1,133 @@
+from bisect import bisect_left, bisect_right
+
+from scheduling_model import OT, BT, GSTW, TW
+from transmission_scheduling.input_parameters import TransmissionParams
+
+
+class IntervalIndex:
+    """
+    Index of half open intervals [start, end), each holding an item, sorted on the start of the interval.
+    Overlap queries use a binary search on the start times and only scan back over the intervals that could still
+    reach the query window, which is bounded by the longest interval in the index.
+    Every item gets a sequence number in the order it is added, query results are returned in that order.
+    """
+
+    def __init__(self):
+        self._starts: list[float] = []
+        self._entries: list[tuple[float, float, int, object]] = []  # (start, end, sequence number, item)
+        self._maxLength = 0.0
+        self._nextSequence = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, item, start: float, end: float):
+        """
+        Add an item with the interval [start, end) to the index.
+        """
+        position = bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._entries.insert(position, (start, end, self._nextSequence, item))
+        self._nextSequence += 1
+        self._maxLength = max(self._maxLength, end - start)
+
+    def remove(self, item, start: float) -> bool:
+        """
+        Remove the first added instance of the item, the start of its interval is used to find it.
+
+        Returns:
+            bool: True if the item was found and removed, False otherwise.
+        """
+        position = bisect_left(self._starts, start)
+        while position < len(self._starts) and self._starts[position] == start:
+            if self._entries[position][3] == item:
+                del self._starts[position]
+                del self._entries[position]
+                return True
+            position += 1
+        return False
+
+    def overlapping(self, start: float, end: float, exclude=None) -> list:
+        """
+        Get the items whose interval overlaps with [start, end), intervals that only touch do not overlap.
+
+        Args:
+            start (float): Start of the query window.
+            end (float): End of the query window.
+            exclude (optional): Items equal to this item are left out of the result.
+
+        Returns:
+            list: The overlapping items, in the order they were added to the index.
+        """
+        overlaps = []
+        i = bisect_left(self._starts, end) - 1
+        earliestStart = start - self._maxLength
+        while i >= 0 and self._starts[i] > earliestStart:
+            entryStart, entryEnd, sequence, item = self._entries[i]
+            if entryEnd > start and (exclude is None or item != exclude):
+                overlaps.append((sequence, item))
+            i -= 1
+
+        overlaps.sort(key=lambda overlap: overlap[0])
+        return [item for _, item in overlaps]
+
+
+class TaskIntervalIndex:
+    """
+    Interval indexes of the scheduled observation tasks, buffering tasks and ground station time windows.
+    The intervals include the processing time before and after each task, in the same way as getConflictingTasks.
+    """
+
+    def __init__(self, otList: list[OT], btList: list[BT], gstwList: list[GSTW], p: TransmissionParams):
+        self.p = p
+        self.otIndex = IntervalIndex()
+        self.btIndex = IntervalIndex()
+        self.gstwIndex = IntervalIndex()
+        for ot in otList:
+            self.addOT(ot)
+        for bt in btList:
+            self.addBT(bt)
+        for gstw in gstwList:
+            for tw in gstw.TWs:
+                self.gstwIndex.add(gstw, tw.start, tw.end)
+
+    def addOT(self, ot: OT):
+        self.otIndex.add(ot, ot.start - self.p.preCaptureTime, ot.end + self.p.postCaptureTime)
+
+    def removeOT(self, ot: OT) -> bool:
+        return self.otIndex.remove(ot, ot.start - self.p.preCaptureTime)
+
+    def addBT(self, bt: BT):
+        self.btIndex.add(bt, bt.start - self.p.preBufferTime, bt.end)
+
+    def removeBT(self, bt: BT) -> bool:
+        return self.btIndex.remove(bt, bt.start - self.p.preBufferTime)
+
+    def getConflictingTasks(self, tw: TW, cancelEarly: bool = False, excludeOT: OT = None, excludeBT: BT = None,
+                            includeGSTWs: bool = True) -> tuple[list[OT], list[BT], list[GSTW]]:
+        """
+        Get the tasks that conflict with the given time window, see conflict_checks.getConflictingTasks.
+
+        Args:
+            tw (TW): The time window to check for conflicts, this window should include any processing time after the task.
+            cancelEarly (bool, optional): If True, the function will return as soon as a single conflict is found.
+            excludeOT (OT, optional): Observation tasks equal to this task are not considered.
+            excludeBT (BT, optional): Buffering tasks equal to this task are not considered.
+            includeGSTWs (bool, optional): If False, conflicts with ground station time windows are not checked.
+
+        Returns:
+            tuple[list[OT], list[BT], list[GSTW]]: The conflicting observation tasks, buffering tasks and ground station time windows.
+        """
+        conflictingOTs = self.otIndex.overlapping(tw.start, tw.end, excludeOT)
+        if cancelEarly and conflictingOTs:
+            return conflictingOTs[:1], [], []
+
+        conflictingBTs = self.btIndex.overlapping(tw.start, tw.end, excludeBT)
+        if cancelEarly and conflictingBTs:
+            return conflictingOTs, conflictingBTs[:1], []
+
+        conflictingGSTWs = self.gstwIndex.overlapping(tw.start, tw.end) if includeGSTWs else []
+        if cancelEarly and conflictingGSTWs:
+            return conflictingOTs, conflictingBTs, conflictingGSTWs[:1]
+
+        return conflictingOTs, conflictingBTs, conflictingGSTWs
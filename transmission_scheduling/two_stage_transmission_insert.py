@@ -1,14 +1,19 @@
 from scheduling_model import OT, TTW, GSTW, BT, DT, GS, TW, generateTaskID
 from transmission_scheduling import insertion
 from transmission_scheduling.conflict_checks import observationTaskConflicting
+from transmission_scheduling.downlink_capacity import DownlinkCapacityLedger
 from transmission_scheduling.generate_downlink import generateDownlinkTask
 from transmission_scheduling.input_parameters import TransmissionParams
-from transmission_scheduling.util import getClosestGSTW, gstwToSortedTupleList, findPossibleTTW
+from transmission_scheduling.util import findPossibleTTW
+from transmission_scheduling.gs_timeline import GSTimeline, getGSTimeline
 
 
-def twoStageTransmissionScheduling(otList: list[OT], ttwList: list[TTW], gstwList: list[GSTW],
+def twoStageTransmissionScheduling(otList: list[OT], ttwList: list[TTW], gstwList: list[GSTW] | GSTimeline,
                                    parameters: TransmissionParams, sortOtList: bool = True,
-                                   fullReinsert: bool = False) -> tuple[list[BT], list[DT], list[OT]]:
+                                   fullReinsert: bool = False, existingOTList: list[OT] = None,
+                                   existingBTList: list[BT] = None,
+                                   existingDTList: list[DT] = None,
+                                   keepExisting: bool = False) -> tuple[list[BT], list[DT], list[OT]]:
     """
     Try to schedule the transmission of each observed target in otList.
     Transmission consists of transmitting to Ground Station and buffering the capture before actually transmitting.
@@ -21,10 +26,17 @@ def twoStageTransmissionScheduling(otList: list[OT], ttwList: list[TTW], gstwLis
     Args:
         otList (list[OT]): List of observation tasks to schedule transmissions for.
         ttwList (list[TTW]): List of target time windows, which will be consulted when shifting observation tasks to fit buffering.
-        gstwList (list[GSTW]): List of ground station time windows with time windows corresponding to each GS.
+        gstwList (list[GSTW] | GSTimeline): Ground station time windows, preferably as a timeline created once per run.
         parameters (TransmissionParams): Parameters for the transmission scheduling.
         sortOtList (bool, optional): Whether the observation tasks should be sorted by priority by this function.
         fullReinsert (bool): Whether to try to re-insert observation tasks which were not included in otList.
+        existingOTList (list[OT], optional): List of already scheduled observation tasks, which already have
+            their buffering and downlink tasks in existingBTList and existingDTList.
+        existingBTList (list[BT], optional): List of already scheduled buffering tasks.
+        existingDTList (list[DT], optional): List of already scheduled downlink tasks.
+        keepExisting (bool, optional): Whether the observation tasks in existingOTList have to keep their
+            transmission. The scheduling stops as soon as one of them is deleted, the returned schedule is then
+            incomplete, see keptTasksLost.
 
     Returns:
         tuple[list[BT], list[DT], list[OT]]: A tuple containing:
@@ -34,14 +46,18 @@ def twoStageTransmissionScheduling(otList: list[OT], ttwList: list[TTW], gstwLis
             - A list of observation tasks, possibly changed to fit the buffering and downlinking tasks.
     """
     otListCopy = sorted(otList, key=lambda x: x.GT.priority, reverse=True) if sortOtList else otList.copy()
+    gstwList = getGSTimeline(gstwList)
 
     """
     Phase 1: Regular insertion phase using several strategies (e.g. direct, sliding, deleting)
     """
     p = parameters
-    fullScheduleFound, btList, dtList, otListScheduled = scheduleTransmissions(otListCopy, ttwList, gstwList, p)
+    keepTaskIDs = {ot.taskID for ot in existingOTList} if keepExisting and existingOTList is not None else None
+    fullScheduleFound, btList, dtList, otListScheduled = scheduleTransmissions(otListCopy, ttwList, gstwList, p,
+                                                                             existingOTList, existingBTList,
+                                                                             existingDTList, keepTaskIDs)
 
-    if fullScheduleFound:
+    if fullScheduleFound or keptTasksLost(keepTaskIDs, otListScheduled):
         return btList, dtList, otListScheduled
 
     """
@@ -53,9 +69,10 @@ def twoStageTransmissionScheduling(otList: list[OT], ttwList: list[TTW], gstwLis
     for i in range(p.reInsertIterations):
 
         _, btList, dtList, otListScheduled = scheduleTransmissions(otListReInsert, ttwList, gstwList, p,
-                                                                                   otListScheduled, btList, dtList)
+                                                                                   otListScheduled, btList, dtList,
+                                                                                   keepTaskIDs)
 
-        if i == p.reInsertIterations - 1:
+        if i == p.reInsertIterations - 1 or keptTasksLost(keepTaskIDs, otListScheduled):
             break  # No need to update for another iteration
 
         # Update the possible TTW list and the OT list to re-insert for the next cycle
@@ -65,9 +82,10 @@ def twoStageTransmissionScheduling(otList: list[OT], ttwList: list[TTW], gstwLis
     return btList, dtList, otListScheduled
 
 
-def scheduleTransmissions(otList: list[OT], ttwList: list[TTW], gstwList: list[GSTW], parameters: TransmissionParams,
+def scheduleTransmissions(otList: list[OT], ttwList: list[TTW], gstwList: list[GSTW] | GSTimeline, parameters: TransmissionParams,
                           existingOTList: list[OT] = None, existingBTList: list[BT] = None,
-                          existingDTList: list[DT] = None) -> tuple[bool, list[BT], list[DT], list[OT]]:
+                          existingDTList: list[DT] = None,
+                          keepTaskIDs: set[int] = None) -> tuple[bool, list[BT], list[DT], list[OT]]:
     """
     Try to schedule the transmission of each observed target in otList.
     Transmission consists of transmitting to Ground Station and buffering the capture before actually transmitting.
@@ -76,11 +94,13 @@ def scheduleTransmissions(otList: list[OT], ttwList: list[TTW], gstwList: list[G
     Args:
         otList (list[OT]): List of observation tasks to schedule transmissions for.
         ttwList (list[TTW]): List of target time windows, which will be consulted when shifting observation tasks to fit buffering.
-        gstwList (list[GSTW]): List of ground station time windows with time windows corresponding to each GS.
+        gstwList (list[GSTW] | GSTimeline): Ground station time windows, preferably as a timeline created once per run.
         parameters (TransmissionParams): Parameters for the transmission scheduling.
         existingOTList (list[OT], optional): List of already scheduled observation tasks.
         existingBTList (list[BT], optional): List of already scheduled buffering tasks.
         existingDTList (list[DT], optional): List of already scheduled downlink tasks.
+        keepTaskIDs (set[int], optional): Task IDs of observation tasks that have to keep their transmission.
+            The scheduling stops as soon as one of them is deleted, the returned schedule is then incomplete.
 
     Returns:
         tuple[bool, list[BT], list[DT], list[OT]]: A tuple containing:
@@ -92,6 +112,7 @@ def scheduleTransmissions(otList: list[OT], ttwList: list[TTW], gstwList: list[G
             - A list of observation tasks, possibly changed to fit the buffering and downlinking tasks.
     """
     p = parameters
+    gstwList = getGSTimeline(gstwList)
 
     directInsert = insertion.DirectInsertion(p)
     slideInsert = insertion.SlideInsertion(p)
@@ -104,45 +125,43 @@ def scheduleTransmissions(otList: list[OT], ttwList: list[TTW], gstwList: list[G
     otListMod = otList.copy()  # This is the list of observation tasks that will be kept updated as tasks are deleted or shifted
 
     if existingOTList is not None:
-        # Check if there are any tasks in the existing OT list that are also in the list to be scheduled
-        for existingOT in existingOTList:
-            for ot in otList:
-                if ot.taskID == existingOT.taskID:
-                    # The observation task in the list of tasks to be scheduled (otList) is already scheduled
-                    otListMod.remove(ot)
+        # Remove the tasks in the list to be scheduled (otList) that are already scheduled
+        existingTaskIDs = {existingOT.taskID for existingOT in existingOTList}
+        otListMod = [ot for ot in otListMod if ot.taskID not in existingTaskIDs]
 
         # We will add the existing OT list as highest priority to the list,
         # making it less likely for them to be modified or deleted
         otListMod = existingOTList.copy() + otListMod
+    otCount = len(otListMod)
+
+    # The ledger and the task ID indexes are kept up to date with otListMod, btList and dtList
+    capacityLedger = DownlinkCapacityLedger(gstwList, otListMod, dtList, p)
+    otModByTaskID = getOTsByTaskID(otListMod)
+    bufferedTaskIDs = {bt.OTTaskID for bt in btList}
 
     for otOriginal in otList:
-        # First check if the observation task already has a corresponding buffering task
-        alreadyBuffered = False
-        for bt in btList:
-            if bt.OTTaskID == otOriginal.taskID:
-                alreadyBuffered = True
-                break
+        if keptTasksLost(keepTaskIDs, otListMod):
+            return False, btList, dtList, otListMod
 
-        if alreadyBuffered: continue
+        # First check if the observation task already has a corresponding buffering task
+        if otOriginal.taskID in bufferedTaskIDs: continue
 
         # Match the original OT to the most recently updated version that has been possibly shifted or deleted
-        otToBuffer = None
-        for ot in otListMod:
-            if ot.taskID == otOriginal.taskID:
-                otToBuffer = ot
-                break
+        otToBuffer = otModByTaskID.get(otOriginal.taskID)
 
         # If we could not find the OT in the modified list, it has been deleted, and we can continue to the next OT
         if otToBuffer is None: continue
 
-        if observationTaskConflicting(otToBuffer, btList, dtList, otListMod, gstwList, p):
+        if observationTaskConflicting(otToBuffer, btList, dtList, otListMod, gstwList, p,
+                                      capacityLedger=capacityLedger):
             # The observation task is conflicting with already scheduled tasks, so we cannot buffer it
             otListMod.remove(otToBuffer)
+            capacityLedger.removeOT(otToBuffer)
+            del otModByTaskID[otToBuffer.taskID]
             continue
 
         validBTFound = False
-        closestGSTW = getClosestGSTW(otToBuffer.end, gstwList, p.maxLatency)
-        closestGSTWSorted = gstwToSortedTupleList(closestGSTW)
+        closestGSTWSorted = gstwList.getPassesWithin(otToBuffer.end, otToBuffer.end + p.maxLatency)
         # TODO check if this \/ is somehow meta, or order the GS passes in different priority than just chronological order
         # closestGSTWSorted = sorted(closestGSTWSorted, key=lambda x: x[1].start, reverse=True)
 
@@ -161,13 +180,23 @@ def scheduleTransmissions(otList: list[OT], ttwList: list[TTW], gstwList: list[G
                 candidateDTList = generateDownlinkTask(candidateOTList, gstw, nextGSTWList, dtList, otToBuffer.taskID, p)
                 if candidateDTList is None: continue  # No valid downlink task could be scheduled in this ground station time window
                 dtListPlusCandidates = dtList + candidateDTList
+                otListBefore = otListMod
+                btListBefore = btList
                 bt, otListMod, btList = insertMethod.generateBuffer(otToBuffer, gstw, otListMod, btList,
                                                                     dtListPlusCandidates, gstwList, ttwList)
+                # The insertion methods return new lists when they shift or delete tasks
+                if otListMod is not otListBefore:
+                    capacityLedger.updateOTList(otListBefore, otListMod)
+                    otModByTaskID = getOTsByTaskID(otListMod)
+                if btList is not btListBefore:
+                    bufferedTaskIDs = {otherBT.OTTaskID for otherBT in btList}
 
                 if bt is not None:
                     btList.append(bt)
+                    bufferedTaskIDs.add(bt.OTTaskID)
                     for candidate in candidateDTList:
                         dtList.append(candidate)
+                        capacityLedger.addDT(candidate)
                     validBTFound = True
                     # We found a buffer task and corresponding GSTW to downlink, so we don't need to consider other GSTW
                     break
@@ -177,11 +206,32 @@ def scheduleTransmissions(otList: list[OT], ttwList: list[TTW], gstwList: list[G
             # print(f"Transmission scheduling failed for {otToBuffer.GT.id} at {otToBuffer.start}")
             # Remove the currently considered observation task by checking if ground target matches
             otListMod.remove(otToBuffer)
+            capacityLedger.removeOT(otToBuffer)
+            del otModByTaskID[otToBuffer.taskID]
 
-    completeScheduleFound = len(otListMod) == len(otList)
+    completeScheduleFound = len(otListMod) == otCount
     return completeScheduleFound, btList, dtList, otListMod
 
 
+def keptTasksLost(keepTaskIDs: set[int] | None, otList: list[OT]) -> bool:
+    """
+    Check if any of the observation tasks that have to keep their transmission has been deleted from otList.
+    """
+    if keepTaskIDs is None:
+        return False
+    return len(keepTaskIDs.intersection(ot.taskID for ot in otList)) < len(keepTaskIDs)
+
+
+def getOTsByTaskID(otList: list[OT]) -> dict[int, OT]:
+    """
+    Index the observation tasks by task ID, if a task ID occurs more than once the first task in the list is used.
+    """
+    otByTaskID: dict[int, OT] = {}
+    for ot in otList:
+        otByTaskID.setdefault(ot.taskID, ot)
+    return otByTaskID
+
+
 def generateNewOTList(possibleTTW: list[TTW], otListScheduled: list[OT], btListScheduled: list[BT],
                       dtListScheduled: list[DT], gstwList: list[GSTW], p: TransmissionParams) -> list[OT]:
     """
@@ -199,6 +249,7 @@ def generateNewOTList(possibleTTW: list[TTW], otListScheduled: list[OT], btListS
         list[OT]: List of observation tasks that could be scheduled during re-insertion in the provided target time windows.
     """
     newOTList: list[OT] = []
+    capacityLedger = DownlinkCapacityLedger(gstwList, otListScheduled, dtListScheduled, p)
     for ttw in possibleTTW:
         for tw in ttw.TWs:
             halfTime = (tw.start + tw.end) / 2
@@ -209,8 +260,10 @@ def generateNewOTList(possibleTTW: list[TTW], otListScheduled: list[OT], btListS
             otCandidate = OT(taskID, ttw.GT, startTime, endTime)
             # Check for a conflict of this OT with the already scheduled tasks and the new ones
             fullOTList = otListScheduled + newOTList
-            if not observationTaskConflicting(otCandidate, btListScheduled, dtListScheduled, fullOTList, gstwList, p):
+            if not observationTaskConflicting(otCandidate, btListScheduled, dtListScheduled, fullOTList, gstwList, p,
+                                              capacityLedger=capacityLedger):
                 newOTList.append(otCandidate)
+                capacityLedger.addOT(otCandidate)
                 break
 
     return newOTList
@@ -2,6 +2,7 @@ import copy
 
 from scheduling_model import OT, GSTW, GS, TW, TTW, BT, DT
 from transmission_scheduling.input_parameters import TransmissionParams
+from transmission_scheduling.gs_timeline import GSTimeline, getGSTimeline
 import matplotlib.pyplot as plt
 
 
@@ -47,55 +48,34 @@ def findPossibleTTW(ttwListToUpdate: list[TTW], otListLastInsertionAttempt: list
     return ttwListUnscheduled
 
 
-def getClosestGSTW(taskEndTime: float, gstwList: list[GSTW], maxLatency=float("Infinity")) -> list[GSTW]:
+def getClosestGSTW(taskEndTime: float, gstwList: list[GSTW] | GSTimeline, maxLatency=float("Infinity")) -> list[GSTW]:
     """
     Get the closest ground station time windows to the observation task.
 
     Args:
         taskEndTime (float): End time of the observation task in seconds.
-        gstwList (list[GSTW]): List of all ground station time windows.
+        gstwList (list[GSTW] | GSTimeline): List or timeline of all ground station time windows.
         maxLatency (float): Maximum duration between the capture and its downlink in seconds
 
     Return:
-        list[GSTW]: List of the closest ground station time windows.
+        list[GSTW]: List of the closest ground station time windows, grouped by GS.
     """
-    # First put the gstwList into a single list of time windows with reference to their ground station
-    # This is not the right output structure, but it is easier to sort and select from
-
-    allGSTWsSorted = gstwToSortedTupleList(gstwList)
-
-    # Remove entries before the observation tasks ended
-    allGSTWsSorted = [entry for entry in allGSTWsSorted if taskEndTime <= entry[1].start <= taskEndTime + maxLatency]
-
-    if not allGSTWsSorted:
-        return []
-
-    # Put list in GSTW format by grouping by GS
-    groupedList: list[GSTW] = []
-    for entry in allGSTWsSorted:
-        # Try to add the time window to a GSTW with the same GS
-        added = False
-        for gstw in groupedList:
-            if gstw.GS == entry[0]:
-                gstw.TWs.append(entry[1])
-                added = True
-                break
-        if not added:
-            groupedList.append(GSTW(entry[0], [entry[1]]))
-
-    return groupedList
+    return getGSTimeline(gstwList).getClosestGSTW(taskEndTime, maxLatency)
 
 
-def gstwToSortedTupleList(gstwList: list[GSTW]) -> list[tuple[GS, TW]]:
+def gstwToSortedTupleList(gstwList: list[GSTW] | GSTimeline) -> list[tuple[GS, TW]]:
     """
     Convert a list of GSTW (GS, [TWs]) to a list of tuples (GS, TW) sorted by TW start time.
 
     Args:
-        gstwList (list[GSTW]): List of GSTW to convert.
+        gstwList (list[GSTW] | GSTimeline): List of GSTW to convert, a timeline is already sorted.
 
     Returns:
         list[tuple[GS, TW]]: List of tuples (GS, TW) sorted
     """
+    if isinstance(gstwList, GSTimeline):
+        return gstwList.getSortedPasses()
+
     allGSTWs: list[tuple[GS, TW]] = []
     for gstw in gstwList:
         for tw in gstw.TWs: